@@ -0,0 +1,105 @@
+"""
+OCR Artifacts
+
+Pass-by-reference artifacts between the OCR pipeline steps. `rasterize_book` writes the
+page images and `ocr_images` streams the Parquet output to their final MinIO locations
+themselves, so the artifacts handed to the next step only record where that data is and
+what it holds; it is never copied into the ZenML artifact store.
+
+Classes:
+    PageStoreReference: Location and summary of a page store prefix in MinIO.
+    PageStoreReferenceMaterializer: Stores a PageStoreReference as a small JSON document.
+    ParquetReference: Location and summary of a Parquet object in MinIO.
+    ParquetReferenceMaterializer: Stores a ParquetReference as a small JSON document.
+"""
+
+import json
+import os
+from dataclasses import asdict, dataclass, field
+from typing import Any, ClassVar
+
+from zenml.enums import ArtifactType
+from zenml.materializers.base_materializer import BaseMaterializer
+from zenml.metadata.metadata_types import MetadataType, StorageSize, Uri
+
+REFERENCE_FILENAME = "reference.json"
+
+
+@dataclass
+class PageStoreReference:
+    """Location and summary of a page store prefix in MinIO, see `PageManifest`."""
+
+    bucket: str
+    prefix: str
+    num_pages: int
+    # The prefix is keyed by content, this is the book it was rendered for
+    book_name: str = ""
+    rendered_pages: int = 0
+    text_layer_pages: int = 0
+
+    @property
+    def uri(self) -> str:
+        return f"s3://{self.bucket}/{self.prefix}"
+
+
+@dataclass
+class ParquetReference:
+    """Location and summary of a Parquet object in MinIO."""
+
+    bucket: str
+    object_name: str
+    num_rows: int
+    size_bytes: int = 0
+    status_counts: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def uri(self) -> str:
+        return f"s3://{self.bucket}/{self.object_name}"
+
+
+class _ReferenceMaterializer(BaseMaterializer):
+    """Saves only the reference dataclass, the data stays where it was written."""
+
+    # Abstract base, only the subclasses are registered for their types
+    SKIP_REGISTRATION: ClassVar[bool] = True
+    ASSOCIATED_ARTIFACT_TYPE: ClassVar[ArtifactType] = ArtifactType.DATA
+
+    def load(self, data_type: type[Any]) -> Any:
+        with self.artifact_store.open(
+            os.path.join(self.uri, REFERENCE_FILENAME), "r"
+        ) as f:
+            return data_type(**json.load(f))
+
+    def save(self, data: Any) -> None:
+        with self.artifact_store.open(
+            os.path.join(self.uri, REFERENCE_FILENAME), "w"
+        ) as f:
+            json.dump(asdict(data), f)
+
+
+class PageStoreReferenceMaterializer(_ReferenceMaterializer):
+    """Saves only the reference, the page images stay in the page store."""
+
+    ASSOCIATED_TYPES: ClassVar[tuple[type[Any], ...]] = (PageStoreReference,)
+
+    def extract_metadata(self, data: PageStoreReference) -> dict[str, MetadataType]:
+        return {
+            "uri": Uri(data.uri),
+            "num_pages": data.num_pages,
+            "rendered_pages": data.rendered_pages,
+            "text_layer_pages": data.text_layer_pages,
+        }
+
+
+class ParquetReferenceMaterializer(_ReferenceMaterializer):
+    """Saves only the reference, the Parquet object itself stays where it was written."""
+
+    ASSOCIATED_TYPES: ClassVar[tuple[type[Any], ...]] = (ParquetReference,)
+
+    def extract_metadata(self, data: ParquetReference) -> dict[str, MetadataType]:
+        return {
+            "uri": Uri(data.uri),
+            "num_rows": data.num_rows,
+            "storage_size": StorageSize(data.size_bytes),
+            "status_counts": data.status_counts,
+        }
@@ -0,0 +1,162 @@
+"""
+Batch OCR Steps
+
+ZenML steps that OCR many books in one pipeline run. Books are listed by name or found
+under a MinIO prefix, rendered into the page store, and then their pages are streamed
+back to back through a single warm dispatcher, so the model is warmed up once and the
+GPU never idles between books. Every book still gets its own results object.
+
+Functions:
+    discover_books(
+        endpoint: str,
+        bucket: str,
+        book_names: list[str] | None,
+        prefix: str,
+        skip_done: bool
+    ) -> list[str]:
+        ZenML step that resolves the books of a batch.
+
+    ocr_book_batch(
+        endpoint: str,
+        bucket: str,
+        pages: list[PageStoreReference],
+        ...
+    ) -> list[ParquetReference]:
+        ZenML step that OCRs every book of a batch through one dispatcher.
+"""
+
+from zenml import get_step_context, step
+from zenml.config.retry_config import StepRetryConfig
+
+from data_collection.artifacts import PageStoreReference, ParquetReference
+from data_collection.book_run import BookRun, ocr_books
+from data_collection.page_store import PageStore
+from data_collection.transport import DEFAULT_TRANSPORT
+from helper.logger import setup_logger
+from helper.minio import get_minio_client, list_object_names
+from helper.minio_paths import (
+    get_book_name,
+    get_books_prefix,
+    get_ocr_results_path,
+    get_ocr_results_prefix,
+)
+
+logger = setup_logger(__name__)
+
+BOOKS_PREFIX = get_books_prefix()
+
+
+@step(name="discover_books", enable_step_logs=True, enable_cache=False)
+def discover_books(
+    endpoint: str,
+    bucket: str,
+    book_names: list[str] | None = None,
+    prefix: str = BOOKS_PREFIX,
+    skip_done: bool = True,
+) -> list[str]:
+    """
+    ZenML step that resolves the books of a batch, either the given names or every PDF
+    under `prefix`.
+
+    Args:
+        endpoint (str): MinIO endpoint URL.
+        bucket (str): MinIO bucket holding the books.
+        book_names (list[str] | None): Books to OCR, None to list `prefix`.
+        prefix (str): Prefix under `raw_data/` to list, e.g. "raw_data/physics/".
+        skip_done (bool): Leave out books that already have OCR results, so an
+            interrupted backfill can simply be started again.
+
+    Returns:
+        list[str]: Book names, sorted.
+
+    Raises:
+        ValueError: If no books are left to OCR.
+    """
+    minio_client = get_minio_client(endpoint)
+    if book_names is None:
+        book_names = [
+            get_book_name(object_name)
+            for object_name in list_object_names(minio_client, bucket, prefix)
+            if object_name.endswith(".pdf")
+        ]
+    book_names = sorted(set(book_names))
+    if skip_done:
+        done = set(list_object_names(minio_client, bucket, get_ocr_results_prefix()))
+        book_names = [
+            book_name
+            for book_name in book_names
+            if get_ocr_results_path(book_name=book_name) not in done
+        ]
+    if not book_names:
+        raise ValueError(f"No books left to OCR under {bucket}/{prefix}")
+    logger.info(f"Batch of {len(book_names)} books: {', '.join(book_names)}")
+    return book_names
+
+
+@step(
+    enable_step_logs=True,
+    enable_cache=False,
+    name="ocr_book_batch",
+    # A retried step resumes every book from its checkpoints
+    retry=StepRetryConfig(max_retries=2, delay=60, backoff=2),
+)
+def ocr_book_batch(
+    endpoint: str,
+    bucket: str,
+    pages: list[PageStoreReference],
+    use_cache: bool = True,
+    resume: bool = True,
+    run_id: str | None = None,
+    image_transport: str = DEFAULT_TRANSPORT,
+    filter_pages: bool = True,
+) -> list[ParquetReference]:
+    """
+    ZenML step that OCRs every book of a batch through one dispatcher and writes one
+    results object per book, each completed as soon as its last page is back.
+
+    Args:
+        endpoint (str): MinIO endpoint URL.
+        bucket (str): MinIO bucket name.
+        pages (list[PageStoreReference]): Page stores written by `rasterize_books`.
+        use_cache (bool): Reuse OCR results of identical pages from earlier runs.
+        resume (bool): Reload checkpointed chunks and only OCR the missing pages.
+        run_id (str | None): Run whose checkpoints to write and resume from,
+            defaults to the current pipeline run.
+        image_transport (str): How pages reach vLLM: "inline" base64, "presigned"
+            MinIO URLs or "shared_volume" file paths.
+        filter_pages (bool): Skip blank pages and near-identical repeats.
+
+    Returns:
+        list[ParquetReference]: Results of every book, in the order of `pages`.
+
+    Raises:
+        ValueError: If a page store has no manifest.
+    """
+    minio_client = get_minio_client(endpoint)
+    run_id = run_id or str(get_step_context().pipeline_run.id)
+    books = []
+    for book_pages in pages:
+        store = PageStore(minio_client, book_pages.bucket)
+        manifest = store.load_manifest(book_pages.prefix)
+        if manifest is None:
+            raise ValueError(f"No page store manifest at {book_pages.uri}")
+        books.append(
+            BookRun(
+                client=minio_client,
+                bucket=bucket,
+                book_name=book_pages.book_name,
+                store=store,
+                manifest=manifest,
+                run_id=run_id,
+                results_path=get_ocr_results_path(book_name=book_pages.book_name),
+                resume=resume,
+                filter_pages=filter_pages,
+            )
+        )
+    return ocr_books(
+        books,
+        client=minio_client,
+        bucket=bucket,
+        use_cache=use_cache,
+        image_transport=image_transport,
+    )
@@ -0,0 +1,104 @@
+import argparse
+
+from zenml import pipeline
+
+from data_collection.batch import BOOKS_PREFIX, discover_books, ocr_book_batch
+from data_collection.rasterize_book import rasterize_books
+from data_collection.upload import store_batch_results_to_minio
+from helper.constants import DefaultConstants
+from helper.logger import setup_logger
+from helper.pipeline_settings.data_collection import (
+    docker_settings,
+    k8s_operator_settings,
+)
+
+logger = setup_logger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run batch OCR ZenML pipeline")
+    parser.add_argument("--bucket", type=str, required=True)
+    books = parser.add_mutually_exclusive_group()
+    books.add_argument(
+        "--book_names",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Books to OCR",
+    )
+    books.add_argument(
+        "--prefix",
+        type=str,
+        default=BOOKS_PREFIX,
+        help="OCR every PDF under this prefix",
+    )
+    parser.add_argument(
+        "--include_done",
+        action="store_true",
+        help="Also OCR books that already have results",
+    )
+    parser.add_argument(
+        "--resume_run_id",
+        type=str,
+        default=None,
+        help="Resume the OCR checkpoints of an earlier pipeline run",
+    )
+    parser.add_argument(
+        "--run_name",
+        type=str,
+        default=None,
+        help="Name of the pipeline run, generated by ZenML when omitted",
+    )
+    return parser.parse_args()
+
+
+@pipeline(
+    settings={
+        "docker": docker_settings,
+        "orchestrator": k8s_operator_settings,
+    },
+    name="batch_ocr_pipeline",
+)
+def batch_ocr_pipeline(
+    bucket: str,
+    book_names: list[str] | None = None,
+    prefix: str = BOOKS_PREFIX,
+    skip_done: bool = True,
+    resume_run_id: str | None = None,
+):
+    """Pipeline that OCRs many books in one run through a single warm dispatcher."""
+    logger.info("Starting batch OCR pipeline")
+    books = discover_books(
+        endpoint=DefaultConstants.minio_endpoint.value,
+        bucket=bucket,
+        book_names=book_names,
+        prefix=prefix,
+        skip_done=skip_done,
+    )
+    pages = rasterize_books(
+        endpoint=DefaultConstants.minio_endpoint.value,
+        bucket=bucket,
+        book_names=books,
+    )
+    results = ocr_book_batch(
+        endpoint=DefaultConstants.minio_endpoint.value,
+        bucket=bucket,
+        pages=pages,
+        run_id=resume_run_id,
+    )
+    store_batch_results_to_minio(
+        results=results,
+        minio_endpoint=DefaultConstants.minio_endpoint.value,
+        book_names=books,
+    )
+
+
+if __name__ == "__main__":
+    parser = parse_args()
+    batch_ocr_pipeline.with_options(run_name=parser.run_name)(
+        bucket=parser.bucket,
+        book_names=parser.book_names,
+        prefix=parser.prefix,
+        skip_done=not parser.include_done,
+        resume_run_id=parser.resume_run_id,
+    )
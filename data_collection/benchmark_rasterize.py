@@ -0,0 +1,136 @@
+"""
+Rasterization Benchmark
+
+Compares pages/sec and peak RSS of every rasterization backend on a local PDF.
+Each backend runs in a fresh interpreter so peak RSS figures do not leak between runs.
+
+Usage:
+    python -m data_collection.benchmark_rasterize --pdf book.pdf --workers 4
+"""
+
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from data_collection.rasterize import (
+    BACKENDS,
+    DEFAULT_DPI,
+    PAGES_PER_RENDER,
+    RASTER_WORKERS,
+    render_pages,
+)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark PDF rasterization")
+    parser.add_argument("--pdf", type=str, required=True)
+    parser.add_argument(
+        "--backends", nargs="+", choices=sorted(BACKENDS), default=sorted(BACKENDS)
+    )
+    parser.add_argument("--workers", type=int, default=RASTER_WORKERS)
+    parser.add_argument("--dpi", type=int, default=DEFAULT_DPI)
+    parser.add_argument("--pages_per_task", type=int, default=PAGES_PER_RENDER)
+    parser.add_argument(
+        "--isolated",
+        action="store_true",
+        help="Run a single backend in this process and print the result as JSON",
+    )
+    return parser.parse_args()
+
+
+def run_backend(
+    pdf_path: str, backend: str, workers: int, dpi: int, pages_per_task: int
+) -> dict:
+    """
+    Renders the whole PDF once with a backend and measures throughput and memory.
+
+    Returns:
+        dict: backend, pages, seconds, pages_per_sec, peak RSS of the parent and of
+        the largest worker process in MiB.
+    """
+    with tempfile.TemporaryDirectory() as extract_to:
+        start = time.perf_counter()
+        pages = sum(
+            1
+            for _ in render_pages(
+                pdf_path=pdf_path,
+                extract_to=extract_to,
+                backend=backend,
+                dpi=dpi,
+                workers=workers,
+                pages_per_task=pages_per_task,
+            )
+        )
+        seconds = time.perf_counter() - start
+    # ru_maxrss is reported in KiB on Linux
+    return {
+        "backend": backend,
+        "pages": pages,
+        "seconds": round(seconds, 2),
+        "pages_per_sec": round(pages / seconds, 2),
+        "peak_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1
+        ),
+        "peak_worker_rss_mb": round(
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1
+        ),
+    }
+
+
+def main():
+    args = parse_args()
+    if args.isolated:
+        print(
+            json.dumps(
+                run_backend(
+                    args.pdf,
+                    args.backends[0],
+                    args.workers,
+                    args.dpi,
+                    args.pages_per_task,
+                )
+            )
+        )
+        return
+
+    results = []
+    for backend in args.backends:
+        completed = subprocess.run(
+            [
+                sys.executable,
+                "-m",
+                "data_collection.benchmark_rasterize",
+                "--pdf",
+                args.pdf,
+                "--backends",
+                backend,
+                "--workers",
+                str(args.workers),
+                "--dpi",
+                str(args.dpi),
+                "--pages_per_task",
+                str(args.pages_per_task),
+                "--isolated",
+            ],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        results.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+
+    header = f"{'backend':<12}{'pages':>8}{'seconds':>10}{'pages/s':>10}{'rss MiB':>10}{'worker MiB':>12}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(
+            f"{r['backend']:<12}{r['pages']:>8}{r['seconds']:>10}{r['pages_per_sec']:>10}"
+            f"{r['peak_rss_mb']:>10}{r['peak_worker_rss_mb']:>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
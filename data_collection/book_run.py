@@ -0,0 +1,358 @@
+"""
+Book Run
+
+OCR state of one book within a step: which pages are still missing, its checkpoints, and
+the Parquet results it streams to MinIO. A step OCRs one or many books by feeding their
+`image_paths` streams through a single `ocr_batch` dispatcher and routing every result
+back to its book with `on_result`, see `ocr_books`.
+
+A book's results object is opened when its pages start streaming and completed as soon
+as its last page has come back, so a multi-book run only keeps the books whose requests
+are in flight open, and every finished book is readable while the others still run.
+Rows are written in page order: a result that comes back before an earlier page waits
+until that page is written, and a results object missing a page is never completed.
+"""
+
+import itertools
+import shutil
+import threading
+from collections.abc import Iterator
+from contextlib import ExitStack, suppress
+from pathlib import Path
+
+from minio import Minio
+
+from data_collection.artifacts import ParquetReference
+from data_collection.cache import OCRResultCache
+from data_collection.checkpoint import ChunkCheckpointer, completed_pages
+from data_collection.ocr import (
+    GENERATION_PARAMS,
+    MODEL_NAME,
+    OCR_PROMPT,
+    chunk_result,
+    ocr_batch,
+    start_model_warmup,
+)
+from data_collection.page_filter import PageFilter
+from data_collection.page_store import PageManifest, PageStore
+from data_collection.rasterize import page_image_path, page_number_from_path
+from data_collection.records import page_records
+from data_collection.result_writer import ParquetResultWriter, upload_stream
+from data_collection.transport import DEFAULT_TRANSPORT, get_transport
+from helper.logger import setup_logger
+from helper.minio_paths import get_checkpoint_path
+
+logger = setup_logger(__name__)
+
+
+class BookRun:
+    """Pages, checkpoints and streamed results of one book in an OCR step."""
+
+    def __init__(
+        self,
+        client: Minio,
+        bucket: str,
+        book_name: str,
+        store: PageStore,
+        manifest: PageManifest,
+        run_id: str,
+        results_path: str,
+        page_range: tuple[int, int] | None = None,
+        resume: bool = True,
+        filter_pages: bool = True,
+    ):
+        """
+        Args:
+            client (Minio): MinIO client.
+            bucket (str): Bucket receiving checkpoints and results.
+            book_name (str): Name of the book.
+            store (PageStore): Page store holding the book's pages.
+            manifest (PageManifest): Manifest of the book's page store prefix.
+            run_id (str): Run whose checkpoints to write and resume from.
+            results_path (str): Object receiving the book's Parquet results.
+            page_range (tuple[int, int] | None): Inclusive pages this run covers, all
+                pages when None.
+            resume (bool): Reload checkpointed chunks and only OCR the missing pages.
+            filter_pages (bool): Skip blank pages and near-identical repeats.
+        """
+        self.client = client
+        self.bucket = bucket
+        self.book_name = book_name
+        self.store = store
+        self.manifest = manifest
+        self.results_path = results_path
+        self.local_image_path = f"/tmp/{book_name}_images"
+        first_page, last_page = page_range or (1, manifest.num_pages)
+
+        self.checkpointer = ChunkCheckpointer(
+            client=client,
+            bucket=bucket,
+            prefix=get_checkpoint_path(book_name=book_name, run_id=run_id),
+        )
+        # Shards share the run's checkpoint prefix, keep only this range's chunks
+        self.checkpointed = [
+            result
+            for result in (self.checkpointer.load() if resume else [])
+            if first_page
+            <= page_number_from_path(result["image_paths"][0])
+            <= last_page
+        ]
+        done_pages = completed_pages(self.checkpointed)
+        missing_pages = [
+            p for p in range(first_page, last_page + 1) if p not in done_pages
+        ]
+        num_pages = last_page - first_page + 1
+        logger.info(
+            f"{book_name}: resuming run {run_id}, "
+            f"{len(done_pages)}/{num_pages} pages already done"
+            if done_pages
+            else f"{book_name}: checkpointing run {run_id}"
+        )
+        self.text_outputs = [
+            chunk_result(
+                [str(page_image_path(self.local_image_path, page_number))],
+                ocr_result=manifest.text_layers[page_number],
+                source="text_layer",
+            )
+            for page_number in missing_pages
+            if page_number in manifest.text_layers
+        ]
+        # Pages that go through OCR
+        self.missing_pages = [p for p in missing_pages if p in manifest.pages]
+        self.page_filter = PageFilter() if filter_pages else None
+        # Every page the results hold a row for, in the order they are written
+        self.pages = sorted(
+            {
+                page_number_from_path(path)
+                for result in self.checkpointed + self.text_outputs
+                for path in result["image_paths"]
+            }
+            | set(self.missing_pages)
+        )
+
+        # Results are routed back from the dispatcher's callback threads
+        self._lock = threading.Lock()
+        self._outstanding = 0
+        self._dispatched = False
+        # Records waiting for an earlier page, by page
+        self._pending: dict[int, dict] = {}
+        self._num_written = 0
+        # Text of the pages written so far, for the duplicates of later pages
+        self._texts: dict[int, str] = {}
+        self._stack: ExitStack | None = None
+        self.writer: ParquetResultWriter | None = None
+        self.reference: ParquetReference | None = None
+
+    def open(self) -> None:
+        """Starts the results upload and writes the already known pages."""
+        with self._lock:
+            if self._stack is not None:
+                return
+            stack = ExitStack()
+            sink = stack.enter_context(
+                upload_stream(self.client, self.bucket, self.results_path)
+            )
+            self.writer = ParquetResultWriter(sink)
+            self._stack = stack
+            for result in self.checkpointed + self.text_outputs:
+                # Nothing is filtered before the pages stream
+                self._write(page_records(result, book=self.book_name))
+
+    def image_paths(self) -> Iterator[str]:
+        """
+        Streams the missing pages from the page store, through the page filter.
+        Every yielded page is expected back in `on_result`.
+
+        Yields:
+            str: Local path of the next page image, in page order.
+        """
+        self.open()
+        image_paths = self.store.fetch_pages(
+            self.manifest, self.missing_pages, self.local_image_path
+        )
+        if self.page_filter is not None:
+            image_paths = self.page_filter(image_paths)
+        for image_path in image_paths:
+            with self._lock:
+                self._outstanding += 1
+            yield image_path
+        with self._lock:
+            self._dispatched = True
+            done = self._outstanding == 0
+        if done:
+            self.finish()
+
+    def _write(self, records: list[dict]) -> list[dict]:
+        """
+        Writes every record whose earlier pages are all written, and keeps the others
+        until they are. Called with the lock held.
+
+        Returns:
+            list[dict]: Checkpoints of the filtered pages just written, to save once
+            the lock is released.
+        """
+        for record in records:
+            self._pending[record["page"]] = record
+        ready, filtered = [], []
+        while self._num_written < len(self.pages):
+            page = self.pages[self._num_written]
+            if page in self._pending:
+                record = self._pending.pop(page)
+            elif self.page_filter is not None and page in self.page_filter.skipped:
+                # The original of a duplicate is an earlier page, already written
+                record = self.page_filter.record(page, self.book_name, self._texts)
+                # A duplicate of a failed page is redone with its original
+                if record["text"] is not None:
+                    filtered.append(
+                        chunk_result(
+                            [self.page_filter.skipped[page]],
+                            ocr_result=record["text"],
+                            status=record["status"],
+                            source=record["source"],
+                            duplicate_of=record["duplicate_of"],
+                        )
+                    )
+            else:
+                break
+            if record["status"] == "success":
+                self._texts[page] = record["text"]
+            ready.append(record)
+            self._num_written += 1
+        self.writer.write(ready)
+        return filtered
+
+    def on_result(self, result: dict) -> None:
+        """
+        Writes and checkpoints a chunk result, completing the book on its last page.
+
+        Raises:
+            Exception: Whatever writing the records raised, the book cannot complete.
+        """
+        records = page_records(result, book=self.book_name)
+        with self._lock:
+            filtered = self._write(records)
+            self._outstanding -= len(result["image_paths"])
+            done = self._dispatched and self._outstanding == 0
+        # Checkpoint once the records are in the results, a page that could not be
+        # written is OCR'd again on resume
+        for checkpoint in [result] + filtered:
+            self.checkpointer.save(checkpoint)
+        if done:
+            self.finish()
+
+    def finish(self) -> ParquetReference:
+        """
+        Writes the filtered pages and completes the results upload, once.
+
+        Returns:
+            ParquetReference: Location and summary of the book's results.
+
+        Raises:
+            ValueError: If a page has no result, the upload is left open for `abort`.
+        """
+        # A book with nothing left to OCR never streamed any pages
+        self.open()
+        with self._lock:
+            if self.reference is not None:
+                return self.reference
+            # Filtered pages after the last OCR'd one
+            filtered = self._write([])
+            if self._num_written < len(self.pages):
+                raise ValueError(
+                    f"{self.book_name}: {len(self.pages) - self._num_written} pages "
+                    f"have no result, first missing page "
+                    f"{self.pages[self._num_written]}"
+                )
+            self.writer.close()
+            self._stack.close()
+            # Every page is back, free the disk for the books still running
+            shutil.rmtree(self.local_image_path, ignore_errors=True)
+            self.reference = ParquetReference(
+                bucket=self.bucket,
+                object_name=self.results_path,
+                num_rows=self.writer.num_rows,
+                size_bytes=self.client.stat_object(self.bucket, self.results_path).size,
+                status_counts=dict(self.writer.status_counts),
+            )
+        for checkpoint in filtered:
+            self.checkpointer.save(checkpoint)
+        logger.info(
+            f"Wrote {self.reference.num_rows} page records of {self.book_name} "
+            f"to {self.reference.uri}"
+        )
+        return self.reference
+
+    def abort(self, error: BaseException) -> None:
+        """Abandons the results upload, nothing is left at `results_path`."""
+        with self._lock:
+            if self._stack is not None and self.reference is None:
+                # Close the writer while its sink is open rather than on garbage
+                # collection, the upload is discarded either way
+                with suppress(OSError):
+                    self.writer.close()
+                self._stack.__exit__(type(error), error, error.__traceback__)
+                self._stack = None
+
+
+def ocr_books(
+    books: list[BookRun],
+    client: Minio,
+    bucket: str,
+    use_cache: bool = True,
+    image_transport: str = DEFAULT_TRANSPORT,
+) -> list[ParquetReference]:
+    """
+    OCRs the missing pages of every book through one warm dispatcher. Books are
+    streamed one after the other, so the dispatcher's prefetch and in-flight requests
+    carry over book boundaries and the GPU never waits for the next book to start.
+
+    Args:
+        books (list[BookRun]): Books to OCR, in dispatch order.
+        client (Minio): MinIO client used by the OCR cache and the transport.
+        bucket (str): Bucket of the OCR cache and presigned pages.
+        use_cache (bool): Reuse OCR results of identical pages from earlier runs.
+        image_transport (str): How pages reach vLLM, see `get_transport`.
+
+    Returns:
+        list[ParquetReference]: Results of every book, in the order of `books`.
+    """
+    books_by_dir = {str(Path(book.local_image_path)): book for book in books}
+    num_pages = sum(len(book.missing_pages) for book in books)
+    try:
+        if num_pages:
+            # Wake the model up first, ocr_batch fetches and encodes the first pages
+            # on its producer thread while it waits for the cold start to finish
+            model_ready = start_model_warmup()
+            cache = None
+            if use_cache:
+                cache = OCRResultCache(
+                    client=client,
+                    bucket=bucket,
+                    model_name=MODEL_NAME,
+                    prompt=OCR_PROMPT,
+                    generation_params=GENERATION_PARAMS,
+                )
+
+            def on_result(result: dict) -> None:
+                books_by_dir[str(Path(result["image_paths"][0]).parent)].on_result(
+                    result
+                )
+
+            logger.info(f"Streaming {num_pages} pages of {len(books)} books")
+            ocr_batch(
+                image_paths=itertools.chain.from_iterable(
+                    book.image_paths() for book in books
+                ),
+                num_pages=num_pages,
+                model_ready=model_ready,
+                cache=cache,
+                on_result=on_result,
+                transport=get_transport(image_transport, client=client, bucket=bucket),
+            )
+        # Books without OCR pages; a book still missing a page raises here
+        return [book.finish() for book in books]
+    except BaseException as e:
+        # Never complete a book's results object with missing pages
+        for book in books:
+            book.abort(e)
+        raise
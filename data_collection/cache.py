@@ -0,0 +1,194 @@
+"""
+OCR Result Cache
+
+Content-addressed cache of OCR results with a local disk tier in front of MinIO.
+
+An entry holds the text of a single page, keyed by the SHA-256 of its rendered bytes
+together with the model name, the prompt text and the generation parameters. Any change
+to what the model would see or how it decodes produces a new key, while re-rendering
+the same book with the same settings hits the cache however its pages are packed into
+requests.
+
+Eviction:
+    local: least recently used entries are removed by `evict_local` once the tier
+        exceeds `max_local_bytes`.
+    remote: entries under `ocr_cache/` expire after `REMOTE_CACHE_MAX_AGE_DAYS` through
+        a lifecycle rule of the bucket, see infrastructure/components/minio.
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from minio import Minio
+from minio.error import S3Error
+
+from helper.logger import setup_logger
+from helper.minio import get_object_bytes, put_object_bytes
+
+logger = setup_logger(__name__)
+
+CACHE_PREFIX = "ocr_cache"
+LOCAL_CACHE_DIR = "/tmp/ocr_cache"
+LOCAL_CACHE_MAX_BYTES = 512 * 1024 * 1024
+# Expiration of the ocr_cache/ lifecycle rule, see infrastructure/components/minio
+REMOTE_CACHE_MAX_AGE_DAYS = 30
+
+
+def hash_bytes(data: bytes) -> str:
+    """Returns the hex SHA-256 digest of `data`."""
+    return hashlib.sha256(data).hexdigest()
+
+
+class OCRResultCache:
+    """Two-tier (local disk, MinIO) cache of OCR outputs keyed by page content."""
+
+    def __init__(
+        self,
+        client: Minio | None,
+        bucket: str,
+        model_name: str,
+        prompt: str,
+        generation_params: dict,
+        prefix: str = CACHE_PREFIX,
+        local_dir: str = LOCAL_CACHE_DIR,
+        max_local_bytes: int = LOCAL_CACHE_MAX_BYTES,
+    ):
+        """
+        Args:
+            client (Minio | None): MinIO client for the remote tier, None for local only.
+            bucket (str): Bucket holding the remote tier.
+            model_name (str): Served model name, part of every key.
+            prompt (str): Prompt text, part of every key.
+            generation_params (dict): Sampling parameters, part of every key.
+            prefix (str): Object prefix of the remote tier.
+            local_dir (str): Directory of the local tier.
+            max_local_bytes (int): Size budget of the local tier.
+        """
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.local_dir = Path(local_dir)
+        self.local_dir.mkdir(parents=True, exist_ok=True)
+        self.max_local_bytes = max_local_bytes
+        self._namespace = json.dumps(
+            {
+                "model": model_name,
+                "prompt": prompt,
+                "params": generation_params,
+            },
+            sort_keys=True,
+        )
+        # Lookups run on several encoder threads at once
+        self._lock = threading.Lock()
+        self.local_hits = 0
+        self.remote_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def hits(self) -> int:
+        return self.local_hits + self.remote_hits
+
+    def _count(self, counter: str, amount: int = 1) -> None:
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def key(self, page_hash: str) -> str:
+        """Returns the cache key of a page with this content hash."""
+        return hash_bytes(
+            json.dumps({"page": page_hash, "namespace": self._namespace}).encode()
+        )
+
+    def _local_path(self, key: str) -> Path:
+        return self.local_dir / key[:2] / f"{key}.json"
+
+    def _object_name(self, key: str) -> str:
+        return f"{self.prefix}/{key[:2]}/{key}.json"
+
+    def get(self, key: str) -> str | None:
+        """
+        Looks a key up in the local tier, then the remote tier.
+
+        Returns:
+            str | None: Cached OCR output, or None on a miss.
+        """
+        local_path = self._local_path(key)
+        if local_path.exists():
+            # Refresh the access time, the local tier is evicted LRU
+            os.utime(local_path)
+            self._count("local_hits")
+            return json.loads(local_path.read_text())["ocr_result"]
+
+        if self.client is not None:
+            try:
+                entry = json.loads(
+                    get_object_bytes(self.client, self.bucket, self._object_name(key))
+                )
+                self._write_local(key, entry)
+                self._count("remote_hits")
+                return entry["ocr_result"]
+            except S3Error as e:
+                if e.code != "NoSuchKey":
+                    logger.warning(f"OCR cache lookup failed for {key}: {e}")
+
+        self._count("misses")
+        return None
+
+    def put(self, key: str, ocr_result: str) -> None:
+        """Stores an OCR output in both tiers."""
+        entry = {"ocr_result": ocr_result, "created_at": time.time()}
+        self._write_local(key, entry)
+        if self.client is not None:
+            try:
+                put_object_bytes(
+                    self.client,
+                    self.bucket,
+                    self._object_name(key),
+                    json.dumps(entry).encode(),
+                    content_type="application/json",
+                )
+            except S3Error as e:
+                logger.warning(f"Failed to store OCR cache entry {key}: {e}")
+
+    def _write_local(self, key: str, entry: dict) -> None:
+        local_path = self._local_path(key)
+        local_path.parent.mkdir(parents=True, exist_ok=True)
+        # Write then rename so concurrent readers never see a partial entry
+        tmp_path = local_path.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_text(json.dumps(entry))
+        tmp_path.replace(local_path)
+
+    def evict_local(self) -> int:
+        """
+        Removes least recently used local entries until the tier fits its budget.
+
+        Returns:
+            int: Number of evicted entries.
+        """
+        entries = [(p, p.stat()) for p in self.local_dir.glob("*/*.json")]
+        total_bytes = sum(st.st_size for _, st in entries)
+        evicted = 0
+        for path, st in sorted(entries, key=lambda e: e[1].st_mtime):
+            if total_bytes <= self.max_local_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total_bytes -= st.st_size
+            evicted += 1
+        self._count("evictions", evicted)
+        return evicted
+
+    def stats(self) -> dict:
+        """Returns hit/miss/eviction counters."""
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "local_hits": self.local_hits,
+            "remote_hits": self.remote_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+        }
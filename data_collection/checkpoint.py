@@ -0,0 +1,95 @@
+"""
+OCR Checkpoints
+
+Persists every completed OCR chunk to MinIO under a run-scoped prefix as soon as it finishes,
+so a step pod that dies halfway through a book can resume with only the missing pages. Pages
+the page filter dropped are checkpointed as one-page results with their "blank" or
+"duplicate" status, so a resumed run does not fetch and filter them again.
+
+Layout:
+    <prefix>/chunk_<first page, zero padded>.json    one result dict per object
+"""
+
+import json
+
+from minio import Minio
+
+from data_collection.rasterize import page_number_from_path
+from helper.logger import setup_logger
+from helper.minio import (
+    delete_objects,
+    get_objects,
+    list_object_names,
+    put_object_bytes,
+)
+
+logger = setup_logger(__name__)
+
+# Statuses of results that need no further work
+DONE_STATUSES = ("success", "blank", "duplicate")
+
+
+class ChunkCheckpointer:
+    """Stores and reloads completed chunk results of one OCR run."""
+
+    def __init__(self, client: Minio, bucket: str, prefix: str):
+        """
+        Args:
+            client (Minio): MinIO client.
+            bucket (str): Bucket holding the checkpoints.
+            prefix (str): Run-scoped object prefix, see `get_checkpoint_path`.
+        """
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix.rstrip("/")
+
+    def _object_name(self, result: dict) -> str:
+        first_page = page_number_from_path(result["image_paths"][0])
+        return f"{self.prefix}/chunk_{first_page:06d}.json"
+
+    def save(self, result: dict) -> None:
+        """
+        Checkpoints a completed chunk result, failed chunks are left to be redone.
+
+        Args:
+            result (dict): Result dict produced by the OCR dispatcher.
+        """
+        if result["status"] not in DONE_STATUSES:
+            return
+        put_object_bytes(
+            self.client,
+            self.bucket,
+            self._object_name(result),
+            json.dumps(result).encode(),
+            content_type="application/json",
+        )
+
+    def load(self) -> list[dict]:
+        """
+        Reloads every checkpointed chunk of the run.
+
+        Returns:
+            list[dict]: Result dicts, sorted by first page.
+        """
+        names = list_object_names(self.client, self.bucket, f"{self.prefix}/")
+        results = [
+            json.loads(data)
+            for data in get_objects(self.client, self.bucket, names).values()
+        ]
+        logger.info(f"Loaded {len(results)} checkpointed chunks from {self.prefix}")
+        return sorted(results, key=lambda r: page_number_from_path(r["image_paths"][0]))
+
+    def clear(self) -> None:
+        """Deletes every checkpoint of the run."""
+        names = list_object_names(self.client, self.bucket, f"{self.prefix}/")
+        delete_objects(self.client, self.bucket, names)
+
+
+def completed_pages(results: list[dict]) -> set[int]:
+    """Returns the page numbers covered by completed chunk results."""
+    return {
+        page_number_from_path(path)
+        for result in results
+        if result["status"] in DONE_STATUSES
+        for path in result["image_paths"]
+    }
@@ -0,0 +1,251 @@
+"""
+Adaptive Concurrency
+
+AIMD control of the number of OCR requests the dispatcher keeps in flight. A fixed
+window either leaves the GPU idle between batches or piles requests up in the router,
+where they only add latency and time out. The controller instead probes for the knee:
+it adds one request while the engine keeps up and cuts the window by a factor as soon
+as it falls behind.
+
+Falling behind is read from two signals, checked every `CONTROL_INTERVAL` seconds:
+    - `vllm:num_requests_waiting` of every engine, read from the Prometheus the KEDA
+      triggers use, so other pipelines sharing the engine are accounted for.
+    - The latency per output token of our own requests, which grows once the engine
+      batch is larger than the GPU handles efficiently. It is compared with the best
+      value seen recently.
+
+When Prometheus cannot be reached the controller keeps running on latency alone.
+
+Functions:
+    fetch_queue_metrics(client: httpx.AsyncClient) -> QueueMetrics | None:
+        Reads the waiting and running requests of the vLLM engines from Prometheus.
+
+Classes:
+    AdaptiveLimiter:
+        Async semaphore whose limit can change while requests are in flight.
+
+    AIMDController:
+        Adjusts an AdaptiveLimiter from the engine queue and observed latency.
+"""
+
+import asyncio
+import math
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import httpx
+
+from helper.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Same Prometheus the vLLM KEDA triggers query, see infrastructure/components/vllm
+PROMETHEUS_URL = "http://prometheus-stack-kube-prom-prometheus.monitoring.svc:9090"
+WAITING_QUERY = "sum(vllm:num_requests_waiting)"
+RUNNING_QUERY = "sum(vllm:num_requests_running)"
+PROMETHEUS_TIMEOUT = 5
+
+# Seconds between two adjustments, about half the Prometheus scrape interval
+CONTROL_INTERVAL = 15
+MIN_IN_FLIGHT = 1
+# Waiting requests tolerated in the engine, a short queue keeps the next batch ready
+TARGET_WAITING = 2
+# Window kept after a decrease
+DECREASE_FACTOR = 0.75
+# Latency per output token, relative to the best recent value, considered overload
+LATENCY_TOLERANCE = 1.5
+# Weight of a new latency sample in the moving average
+LATENCY_SMOOTHING = 0.2
+# Growth of the best latency per interval, so it follows slower pages
+BASELINE_DRIFT = 0.02
+
+
+@dataclass
+class QueueMetrics:
+    waiting: float
+    running: float
+
+
+async def _query(client: httpx.AsyncClient, query: str) -> float:
+    response = await client.get("/api/v1/query", params={"query": query})
+    response.raise_for_status()
+    result = response.json()["data"]["result"]
+    # No series while the engine is scaled to zero
+    return float(result[0]["value"][1]) if result else 0.0
+
+
+async def fetch_queue_metrics(client: httpx.AsyncClient) -> QueueMetrics | None:
+    """
+    Reads the waiting and running requests of the vLLM engines from Prometheus.
+
+    Args:
+        client (httpx.AsyncClient): Client with the Prometheus base URL.
+
+    Returns:
+        QueueMetrics | None: Engine queue, None if Prometheus cannot be queried.
+    """
+    try:
+        waiting, running = await asyncio.gather(
+            _query(client, WAITING_QUERY), _query(client, RUNNING_QUERY)
+        )
+    except (httpx.HTTPError, KeyError, IndexError, ValueError) as e:
+        logger.debug(f"Could not read vLLM queue metrics: {e}")
+        return None
+    return QueueMetrics(waiting=waiting, running=running)
+
+
+class AdaptiveLimiter:
+    """
+    Async semaphore whose limit can change while requests are in flight. Lowering the
+    limit never interrupts a request, new ones wait until enough have finished.
+    """
+
+    def __init__(self, limit: int):
+        self._limit = limit
+        self._waiters: deque[asyncio.Future] = deque()
+        self.in_flight = 0
+        # Set when a request had to wait for a slot, i.e. demand exceeded the limit
+        self.saturated = False
+
+    @property
+    def limit(self) -> int:
+        return self._limit
+
+    def set_limit(self, limit: int) -> None:
+        self._limit = limit
+        self._wake()
+
+    async def acquire(self) -> None:
+        if self.in_flight < self._limit and not self._waiters:
+            self.in_flight += 1
+            return
+        self.saturated = True
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            # The slot was handed over just before the cancellation
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self._limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # Hand the slot over directly, so no new request can take it first
+                self.in_flight += 1
+                waiter.set_result(None)
+
+
+class AIMDController:
+    """Adjusts an AdaptiveLimiter from the vLLM queue and observed latency."""
+
+    def __init__(
+        self,
+        limiter: AdaptiveLimiter,
+        max_limit: int,
+        min_limit: int = MIN_IN_FLIGHT,
+        prometheus_url: str = PROMETHEUS_URL,
+        interval: float = CONTROL_INTERVAL,
+        target_waiting: float = TARGET_WAITING,
+        latency_tolerance: float = LATENCY_TOLERANCE,
+    ):
+        """
+        Args:
+            limiter (AdaptiveLimiter): Limiter of the dispatcher, its current limit is
+                the starting window.
+            max_limit (int): Largest window, the size of the connection pool.
+            min_limit (int): Smallest window.
+            prometheus_url (str): Prometheus scraping the vLLM engines, None to
+                control on latency alone.
+            interval (float): Seconds between two adjustments.
+            target_waiting (float): Waiting engine requests tolerated.
+            latency_tolerance (float): Latency per output token, relative to the best
+                recent value, that counts as overload.
+        """
+        self.limiter = limiter
+        self.max_limit = max_limit
+        self.min_limit = min_limit
+        self.prometheus_url = prometheus_url
+        self.interval = interval
+        self.target_waiting = target_waiting
+        self.latency_tolerance = latency_tolerance
+        self.latency: float | None = None
+        self.best_latency: float | None = None
+        self._last_decrease = -math.inf
+
+    def observe(self, latency: float, completion_tokens: int) -> None:
+        """Records the latency of a successful request."""
+        if completion_tokens <= 0:
+            return
+        sample = latency / completion_tokens
+        self.latency = (
+            sample
+            if self.latency is None
+            else LATENCY_SMOOTHING * sample + (1 - LATENCY_SMOOTHING) * self.latency
+        )
+
+    def backoff(self) -> None:
+        """
+        Cuts the window at once, e.g. when the router rejects a request. A burst of
+        rejections caused by the same overload only cuts it once per interval.
+        """
+        now = time.monotonic()
+        if now - self._last_decrease < self.interval:
+            return
+        self._last_decrease = now
+        self._set_limit(math.floor(self.limiter.limit * DECREASE_FACTOR), "overload")
+
+    def update(self, metrics: QueueMetrics | None) -> int:
+        """
+        Adjusts the window once from the latest engine queue and latency.
+
+        Args:
+            metrics (QueueMetrics | None): Engine queue, None if unknown.
+
+        Returns:
+            int: The new window.
+        """
+        if self.latency is not None:
+            self.best_latency = (
+                self.latency
+                if self.best_latency is None
+                else min(self.latency, self.best_latency * (1 + BASELINE_DRIFT))
+            )
+        if (metrics is not None and metrics.waiting > self.target_waiting) or (
+            self.latency is not None
+            and self.latency > self.best_latency * self.latency_tolerance
+        ):
+            self.backoff()
+        elif self.limiter.saturated:
+            # Only grow while requests are actually waiting for a slot
+            self._set_limit(self.limiter.limit + 1, "headroom")
+        self.limiter.saturated = False
+        return self.limiter.limit
+
+    def _set_limit(self, limit: int, reason: str) -> None:
+        limit = max(self.min_limit, min(self.max_limit, limit))
+        if limit != self.limiter.limit:
+            logger.info(
+                f"Requests in flight {self.limiter.limit} -> {limit} ({reason})"
+            )
+            self.limiter.set_limit(limit)
+
+    async def run(self) -> None:
+        """Adjusts the window every `interval` seconds until cancelled."""
+        async with httpx.AsyncClient(
+            base_url=self.prometheus_url or "", timeout=PROMETHEUS_TIMEOUT
+        ) as client:
+            while True:
+                await asyncio.sleep(self.interval)
+                metrics = None
+                if self.prometheus_url:
+                    metrics = await fetch_queue_metrics(client)
+                self.update(metrics)
@@ -1,128 +1,129 @@
 """
 OCR Engine Steps
 
-This module provides functions and a ZenML step for performing OCR on images using a multimodal LLM.
-It includes utilities for sorting image filenames, extracting page numbers, running inference in batches,
-and converting results into a Hugging Face Dataset.
+This module provides the ZenML step that OCRs a book's pages from the page store with a
+multimodal LLM served by vLLM, and streams per-page results into a Parquet object in
+MinIO. A book can be split into page-range shards, each OCR'd by its own step.
 
 Functions:
-    sort_pages_by_number(pages: list[str]) -> list[str]:
-        Sorts a list of image filenames by their embedded page numbers.
-
-    extract_page_number(filename: str) -> int:
-        Extracts the numeric page number from a filename (e.g., 'page_23.jpg').
-
-    do_inference(
-        image_paths: list[str],
-        model_path: str,
-        max_new_tokens: int,
-        batch_size: int
-    ) -> list[dict]:
-        Runs OCR inference on a list of images using a multimodal LLM, batching requests for efficiency.
-
     ocr_images(
         endpoint: str,
         bucket: str,
-        object_key: str,
-        local_path: str,
-        model_path: str,
-        extract_to: str,
-        max_new_tokens: int,
-        batch_size: int = 5
-    ) -> Dataset:
-        ZenML step that downloads a zip of images, extracts them, runs OCR, and returns a Hugging Face Dataset.
+        book_name: str,
+        pages: PageStoreReference,
+        use_cache: bool = True,
+        resume: bool = True,
+        run_id: str | None = None,
+        image_transport: str = DEFAULT_TRANSPORT,
+        filter_pages: bool = True,
+        shard_index: int = 0,
+        num_shards: int = 1
+    ) -> ParquetReference:
+        ZenML step that OCRs a book's pages from the page store and writes per-page records to MinIO.
 """
 
-import re
-from pathlib import Path
-from datasets import Dataset
-
-from zenml import step
+from zenml import get_step_context, step
+from zenml.config.retry_config import StepRetryConfig
 from helper.logger import setup_logger
-from helper.minio import download_from_minio
-from helper.minio_paths import get_books_path
-from pdf2image import convert_from_path
-from data_collection.ocr import ocr_batch
+from helper.minio import get_minio_client
+from helper.minio_paths import get_ocr_results_path, get_ocr_shard_path
+from data_collection.artifacts import (
+    PageStoreReference,
+    ParquetReference,
+    ParquetReferenceMaterializer,
+)
+from data_collection.book_run import BookRun, ocr_books
+from data_collection.page_store import PageStore
+from data_collection.sharding import shard_range
+from data_collection.transport import DEFAULT_TRANSPORT
 
 logger = setup_logger(__name__)
 
 
-def load_pdf_and_extract_images(pdf_path: str, extract_to: str) -> list[str]:
-    """
-    Loads a PDF file and extracts its pages as images.
-
-    Args:
-        pdf_path (str): Path to the PDF file.
-        extract_to (str): Directory to save the extracted images.
-
-    Returns:
-        list[str]: List of file paths to the extracted images.
-    """
-    Path(extract_to).mkdir(parents=True, exist_ok=True)
-    pages = convert_from_path(pdf_path, dpi=300)
-    image_paths = []
-    for i, page in enumerate(pages):
-        image_path = Path(extract_to) / f"page_{i + 1}.jpg"
-        page.save(image_path, "JPEG")
-        image_paths.append(str(image_path))
-    return image_paths
-
-
-def sort_pages_by_number(pages: list[str]) -> list[str]:
-    """
-    Sorts a list of image filenames by their embedded page numbers.
-
-    Args:
-        pages (list[str]): List of image file paths or names containing 'page_<number>'.
-
-    Returns:
-        list[str]: Sorted list of image file paths/names by page number.
-    """
-
-    def extract_number(filename: str) -> int:
-        match = re.search(r"page_(\d+)", filename)
-        return int(match.group(1)) if match else -1
-
-    return sorted(pages, key=extract_number)
-
-
-@step(enable_step_logs=True, enable_cache=False, name="ocr_images")
+@step(
+    enable_step_logs=True,
+    enable_cache=False,
+    name="ocr_images",
+    # Only a reference to the results goes to the artifact store
+    output_materializers=ParquetReferenceMaterializer,
+    # A retried step resumes from its checkpoints instead of starting over
+    retry=StepRetryConfig(max_retries=2, delay=60, backoff=2),
+)
 def ocr_images(
     endpoint: str,
     bucket: str,
     book_name: str,
-) -> Dataset:
+    pages: PageStoreReference,
+    use_cache: bool = True,
+    resume: bool = True,
+    run_id: str | None = None,
+    image_transport: str = DEFAULT_TRANSPORT,
+    filter_pages: bool = True,
+    shard_index: int = 0,
+    num_shards: int = 1,
+) -> ParquetReference:
     """
-    ZenML step that downloads a zip of images from MinIO, extracts them, runs OCR inference,
-    and returns the results as a Hugging Face Dataset.
+    ZenML step that reads a book's rendered pages from the page store, runs OCR inference,
+    and streams one record per page into a Parquet object in MinIO as requests complete.
 
     Args:
         endpoint (str): MinIO endpoint URL.
         bucket (str): MinIO bucket name.
         book_name (str) : Name of the book.
+        pages (PageStoreReference): Page store written by `rasterize_book`. Pages it
+            holds as text layers are written as they are, the rendered ones are OCR'd.
+        use_cache (bool): Reuse OCR results of identical pages from earlier runs.
+        resume (bool): Reload checkpointed chunks and only OCR the missing pages.
+        run_id (str | None): Run whose checkpoints to write and resume from.
+            Defaults to the current pipeline run, pass an earlier run's id to
+            resume a run whose pod died.
+        image_transport (str): How pages reach vLLM: "inline" base64, "presigned"
+            MinIO URLs or "shared_volume" file paths.
+        filter_pages (bool): Skip blank pages and near-identical repeats, they get
+            "blank" and "duplicate" rows instead of an OCR request.
+        shard_index (int): Shard of the book this step OCRs, see `shard_range`.
+        num_shards (int): Number of shards the book is split into, 1 OCRs the whole
+            book into its final results object.
 
     Returns:
-        Dataset: Hugging Face Dataset containing OCR results for each image.
+        ParquetReference: Location of the results in `bucket`. They hold one record per page
+        (book, page, text, status, source, latency, token counts, see
+        `page_record`), in page order; `source` tells text-layer pages from OCR'd
+        ones.
+
+    Raises:
+        ValueError: If the page store has no manifest.
     """
-    book_minio_path = get_books_path(book_name=book_name)
-    local_path = f"/tmp/{book_name}.pdf"
-    local_image_path = f"/tmp/{book_name}_images"
-    pdf_path = download_from_minio(
-        endpoint=endpoint,
+    minio_client = get_minio_client(endpoint)
+    store = PageStore(minio_client, pages.bucket)
+    manifest = store.load_manifest(pages.prefix)
+    if manifest is None:
+        raise ValueError(f"No page store manifest at {pages.uri}")
+
+    page_range = shard_range(manifest.num_pages, shard_index, num_shards) or (1, 0)
+    if num_shards > 1:
+        logger.info(f"Shard {shard_index + 1}/{num_shards}: pages {page_range}")
+    book = BookRun(
+        client=minio_client,
         bucket=bucket,
-        minio_path=book_minio_path,
-        local_path=local_path,
+        book_name=book_name,
+        store=store,
+        manifest=manifest,
+        run_id=run_id or str(get_step_context().pipeline_run.id),
+        results_path=(
+            get_ocr_shard_path(book_name, shard_index, num_shards)
+            if num_shards > 1
+            else get_ocr_results_path(book_name=book_name)
+        ),
+        page_range=page_range,
+        resume=resume,
+        filter_pages=filter_pages,
     )
-    logger.info(f"Downloaded PDF from MinIO to {local_path}")
-
-    image_paths = load_pdf_and_extract_images(
-        pdf_path=pdf_path, extract_to=local_image_path
-    )
-    image_paths = sort_pages_by_number(image_paths)
-    logger.info(f"Extracted {len(image_paths)} images from {local_image_path}")
-    outputs = ocr_batch(
-        image_paths=image_paths,
+    (reference,) = ocr_books(
+        [book],
+        client=minio_client,
+        bucket=bucket,
+        use_cache=use_cache,
+        image_transport=image_transport,
     )
-    # Convert list[dict] → Hugging Face Dataset
-    dataset = Dataset.from_list(outputs)
-    return dataset
+    return reference
@@ -0,0 +1,266 @@
+"""
+Ingestion Queue
+
+Durable work queue of books waiting to be OCRed, fed by MinIO bucket notifications on
+`raw_data/` and drained by the ingestion service workers, see `ingest_service.py`.
+
+The queue is a single SQLite database on a persistent volume. Jobs are keyed by their
+object and ETag, so a notification MinIO delivers twice is queued once while a book that
+is uploaded again with new content is OCRed again. A job moves from "queued" to
+"running" when a worker claims it and ends "done" or, after `MAX_ATTEMPTS` failed runs,
+"failed".
+
+The page count of a book is only known once it is rasterized, so jobs carry an estimate
+made from the object size. The estimate only drives the backlog metric vLLM is
+pre-scaled on, it never limits what gets OCRed.
+
+Functions:
+    estimate_pages(size: int) -> int:
+        Returns a rough page count of a PDF of this size.
+
+Classes:
+    IngestJob:
+        A book in the queue.
+
+    BookQueue:
+        SQLite backed queue of books to OCR.
+"""
+
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+from helper.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Average size of a scanned book page, used to estimate the page backlog
+BYTES_PER_PAGE = 150 * 1024
+# Runs of a book before it is left "failed"
+MAX_ATTEMPTS = 3
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+STATUSES = (QUEUED, RUNNING, DONE, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    bucket TEXT NOT NULL,
+    object_name TEXT NOT NULL,
+    etag TEXT NOT NULL,
+    book_name TEXT NOT NULL,
+    est_pages INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    worker TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    UNIQUE (bucket, object_name, etag)
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, id);
+"""
+
+
+def estimate_pages(size: int) -> int:
+    """Returns a rough page count of a PDF of `size` bytes, at least 1."""
+    return max(1, round(size / BYTES_PER_PAGE))
+
+
+@dataclass
+class IngestJob:
+    id: int
+    bucket: str
+    object_name: str
+    book_name: str
+    est_pages: int
+    attempts: int
+
+
+class BookQueue:
+    """SQLite backed queue of books to OCR, safe to share between threads."""
+
+    def __init__(self, path: str, max_attempts: int = MAX_ATTEMPTS):
+        """
+        Args:
+            path (str): SQLite database file, created if missing.
+            max_attempts (int): Runs of a book before it is marked failed.
+        """
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            path, check_same_thread=False, isolation_level=None
+        )
+        # WAL keeps the queue consistent if the pod dies mid write
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=FULL")
+        self._conn.executescript(SCHEMA)
+
+    def _transaction(self, *statements: tuple[str, tuple]) -> list[sqlite3.Cursor]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                cursors = [self._conn.execute(sql, args) for sql, args in statements]
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+            return cursors
+
+    def enqueue(
+        self, bucket: str, object_name: str, etag: str, book_name: str, size: int
+    ) -> bool:
+        """
+        Queues a book, once per object content.
+
+        A queued job of an older version of the same object is dropped, the new upload
+        replaces it.
+
+        Args:
+            bucket (str): Bucket holding the book.
+            object_name (str): Object name of the PDF.
+            etag (str): ETag of the uploaded object.
+            book_name (str): Name of the book, see `get_book_name`.
+            size (int): Object size in bytes.
+
+        Returns:
+            bool: True if the book was queued, False if it already was.
+        """
+        now = time.time()
+        _, inserted = self._transaction(
+            (
+                (
+                    "DELETE FROM jobs WHERE bucket = ? AND object_name = ? "
+                    "AND etag != ? AND status = ?"
+                ),
+                (bucket, object_name, etag, QUEUED),
+            ),
+            (
+                (
+                    "INSERT INTO jobs (bucket, object_name, etag, book_name, "
+                    "est_pages, status, created_at, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT DO NOTHING"
+                ),
+                (
+                    bucket,
+                    object_name,
+                    etag,
+                    book_name,
+                    estimate_pages(size),
+                    QUEUED,
+                    now,
+                    now,
+                ),
+            ),
+        )
+        return inserted.rowcount == 1
+
+    def claim(self, worker: str, limit: int = 1) -> list[IngestJob]:
+        """
+        Moves the oldest queued books of one bucket to "running".
+
+        Args:
+            worker (str): Name of the claiming worker, kept for debugging.
+            limit (int): Maximum number of books to claim.
+
+        Returns:
+            list[IngestJob]: Claimed books, oldest first, empty if none are queued.
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id, bucket, object_name, book_name, est_pages, attempts "
+                    "FROM jobs WHERE status = ? AND bucket = ("
+                    "SELECT bucket FROM jobs WHERE status = ? ORDER BY id LIMIT 1) "
+                    "ORDER BY id LIMIT ?",
+                    (QUEUED, QUEUED, limit),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET status = ?, worker = ?, attempts = attempts + 1, "
+                    "updated_at = ? WHERE id = ?",
+                    [(RUNNING, worker, time.time(), row[0]) for row in rows],
+                )
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._conn.execute("COMMIT")
+        return [
+            IngestJob(*row[:5], attempts=row[5] + 1)  # attempts counts this run
+            for row in rows
+        ]
+
+    def complete(self, jobs: list[IngestJob]) -> None:
+        """Marks claimed books as done."""
+        self._transaction(
+            *(
+                (
+                    (
+                        "UPDATE jobs SET status = ?, error = NULL, updated_at = ? "
+                        "WHERE id = ?"
+                    ),
+                    (DONE, time.time(), job.id),
+                )
+                for job in jobs
+            )
+        )
+
+    def fail(self, jobs: list[IngestJob], error: str) -> None:
+        """Queues claimed books again, or marks them failed after `max_attempts`."""
+        self._transaction(
+            *(
+                (
+                    "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE id = ?",
+                    (
+                        FAILED if job.attempts >= self.max_attempts else QUEUED,
+                        error,
+                        time.time(),
+                        job.id,
+                    ),
+                )
+                for job in jobs
+            )
+        )
+
+    def requeue_running(self) -> int:
+        """
+        Queues the books a previous process was running again. Only call this before
+        any worker starts, the queue has a single consumer process.
+
+        Returns:
+            int: Number of books queued again.
+        """
+        (cursor,) = self._transaction(
+            (
+                "UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?",
+                (QUEUED, time.time(), RUNNING),
+            )
+        )
+        return cursor.rowcount
+
+    def backlog_pages(self) -> int:
+        """Returns the estimated pages of queued and running books."""
+        with self._lock:
+            (pages,) = self._conn.execute(
+                "SELECT COALESCE(SUM(est_pages), 0) FROM jobs WHERE status IN (?, ?)",
+                (QUEUED, RUNNING),
+            ).fetchone()
+        return pages
+
+    def counts(self) -> dict[str, int]:
+        """Returns the number of books in every status."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM jobs GROUP BY status"
+            ).fetchall()
+        return {status: 0 for status in STATUSES} | dict(rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
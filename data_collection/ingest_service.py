@@ -0,0 +1,356 @@
+"""
+Ingestion Service
+
+Long running service that turns uploads into OCR runs. MinIO posts a notification for
+every PDF written under `raw_data/` to `/minio/events`, the book is added to the
+`BookQueue`, and worker threads claim queued books and launch the OCR pipeline for
+them, a single book through `pipeline.py` and several through `batch_pipeline.py`.
+
+`/metrics` exports the queue for Prometheus. KEDA scales vLLM on
+`dharma_ingest_backlog_pages`, so the engine starts loading as soon as a book is
+uploaded instead of once the first OCR request has queued up in the router.
+
+Endpoints:
+    POST /minio/events: MinIO webhook notifications.
+    GET /metrics: Prometheus metrics of the queue.
+    GET /healthz: Liveness probe.
+
+Functions:
+    parse_event(event: dict) -> list[dict]:
+        Returns the PDFs under `raw_data/` created by a MinIO notification.
+
+    pipeline_command(jobs: list[IngestJob], run_name: str) -> list[str]:
+        Returns the command launching the OCR pipeline for claimed books.
+
+    stop_pipeline_run(run_name: str) -> str | None:
+        Force stops a pipeline run, returns why it could not be stopped.
+
+    run_pipeline(jobs: list[IngestJob], run_timeout: int) -> str | None:
+        Runs the OCR pipeline for claimed books, returns why it failed.
+
+Classes:
+    RunNotStoppedError:
+        A timed-out pipeline run that could not be stopped and may still be running.
+
+    render_metrics(queue: BookQueue) -> str:
+        Renders the queue metrics in the Prometheus text format.
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote_plus
+
+from data_collection.ingest_queue import BookQueue, IngestJob
+from helper.logger import setup_logger
+from helper.minio_paths import get_book_name, get_books_prefix
+
+logger = setup_logger(__name__)
+
+BOOKS_PREFIX = get_books_prefix()
+DEFAULT_PORT = 8080
+DEFAULT_DB_PATH = "/var/lib/dharma/ingest/queue.db"
+# Seconds between polls of an empty queue
+POLL_INTERVAL = 10
+# A pipeline run taking longer is stopped and its books retried
+RUN_TIMEOUT = 6 * 60 * 60
+# Seconds to wait for the ZenML server to stop a run
+STOP_TIMEOUT = 120
+
+
+class RunNotStoppedError(RuntimeError):
+    """A timed-out pipeline run that could not be stopped and may still be running."""
+
+
+def parse_event(event: dict) -> list[dict]:
+    """
+    Returns the PDFs under `raw_data/` created by a MinIO notification.
+
+    Args:
+        event (dict): Body of a MinIO webhook notification, in the S3 event format.
+
+    Returns:
+        list[dict]: "bucket", "object_name", "etag" and "size" of every created book.
+    """
+    books = []
+    for record in event.get("Records", []):
+        if not record.get("eventName", "").startswith("s3:ObjectCreated:"):
+            continue
+        s3 = record["s3"]
+        # Keys are URL encoded in notifications
+        object_name = unquote_plus(s3["object"]["key"])
+        if not object_name.startswith(BOOKS_PREFIX) or not object_name.endswith(".pdf"):
+            continue
+        books.append(
+            {
+                "bucket": s3["bucket"]["name"],
+                "object_name": object_name,
+                "etag": s3["object"].get("eTag", ""),
+                "size": s3["object"].get("size", 0),
+            }
+        )
+    return books
+
+
+def pipeline_command(jobs: list[IngestJob], run_name: str) -> list[str]:
+    """
+    Returns the command launching the OCR pipeline for claimed books of one bucket.
+
+    Several books go through one batch run, so they share a warm dispatcher. A book is
+    OCRed again even if it already has results, the upload replaced it. The run is
+    given `run_name`, so it can be stopped if it times out.
+    """
+    bucket = jobs[0].bucket
+    if len(jobs) == 1:
+        return [
+            sys.executable,
+            "-m",
+            "data_collection.pipeline",
+            "--bucket",
+            bucket,
+            "--book_name",
+            jobs[0].book_name,
+            "--run_name",
+            run_name,
+        ]
+    return [
+        sys.executable,
+        "-m",
+        "data_collection.batch_pipeline",
+        "--bucket",
+        bucket,
+        "--include_done",
+        "--run_name",
+        run_name,
+        "--book_names",
+        *(job.book_name for job in jobs),
+    ]
+
+
+def render_metrics(queue: BookQueue) -> str:
+    """Renders the queue metrics in the Prometheus text exposition format."""
+    lines = [
+        "# HELP dharma_ingest_backlog_pages Estimated pages of queued and running books.",
+        "# TYPE dharma_ingest_backlog_pages gauge",
+        f"dharma_ingest_backlog_pages {queue.backlog_pages()}",
+        "# HELP dharma_ingest_books Books in the ingestion queue by status.",
+        "# TYPE dharma_ingest_books gauge",
+    ]
+    lines += [
+        f'dharma_ingest_books{{status="{status}"}} {count}'
+        for status, count in queue.counts().items()
+    ]
+    return "\n".join(lines) + "\n"
+
+
+def stop_pipeline_run(run_name: str) -> str | None:
+    """
+    Force stops a pipeline run through the ZenML CLI.
+
+    Args:
+        run_name (str): Name the run was launched with.
+
+    Returns:
+        str | None: Why the run could not be stopped, None if it was.
+    """
+    try:
+        subprocess.run(
+            ["zenml", "pipeline", "runs", "stop", run_name, "--yes"],
+            check=True,
+            timeout=STOP_TIMEOUT,
+            capture_output=True,
+            text=True,
+        )
+    except subprocess.CalledProcessError as e:
+        return (e.stdout + e.stderr).strip() or str(e)
+    except (subprocess.SubprocessError, OSError) as e:
+        return str(e)
+    return None
+
+
+def run_pipeline(jobs: list[IngestJob], run_timeout: int = RUN_TIMEOUT) -> str | None:
+    """
+    Runs the OCR pipeline for claimed books and waits for it.
+
+    Args:
+        jobs (list[IngestJob]): Books of the run.
+        run_timeout (int): Seconds after which the run is stopped.
+
+    Returns:
+        str | None: Why the run failed, None if it succeeded.
+
+    Raises:
+        RunNotStoppedError: The run timed out and could not be stopped, running its
+            books again could OCR them twice at the same time.
+    """
+    run_name = f"ingest_{jobs[0].book_name}_{uuid.uuid4().hex[:8]}"
+    try:
+        # The pipeline runs synchronously, the command returns with the run
+        subprocess.run(
+            pipeline_command(jobs, run_name), check=True, timeout=run_timeout
+        )
+    except subprocess.TimeoutExpired as e:
+        # Killing the command leaves the orchestrator pods of the run going
+        stop_error = stop_pipeline_run(run_name)
+        if stop_error is not None:
+            raise RunNotStoppedError(
+                f"{run_name} timed out and could not be stopped: {stop_error}"
+            ) from e
+        logger.info(f"Stopped {run_name} after {run_timeout}s")
+        return str(e)
+    except (subprocess.SubprocessError, OSError) as e:
+        return str(e)
+    return None
+
+
+def run_worker(
+    queue: BookQueue,
+    name: str,
+    batch_size: int,
+    stop: threading.Event,
+    run_timeout: int = RUN_TIMEOUT,
+) -> None:
+    """
+    Claims queued books and runs the OCR pipeline for them until `stop` is set. When
+    a batch run fails its books are run again one at a time within the same attempt,
+    so only the books that fail on their own are retried or marked failed.
+
+    Books of a timed-out run that could not be stopped are left claimed, the next
+    start of the service queues them again.
+    """
+    while not stop.is_set():
+        jobs = queue.claim(name, limit=batch_size)
+        if not jobs:
+            stop.wait(POLL_INTERVAL)
+            continue
+        try:
+            run_jobs(queue, name, jobs, run_timeout)
+        except RunNotStoppedError as e:
+            logger.error(f"{name}: {e}")
+
+
+def run_jobs(
+    queue: BookQueue, name: str, jobs: list[IngestJob], run_timeout: int
+) -> None:
+    """Runs the OCR pipeline for claimed books and records the outcome."""
+    book_names = ", ".join(job.book_name for job in jobs)
+    logger.info(f"{name}: starting OCR of {book_names}")
+    error = run_pipeline(jobs, run_timeout)
+    if error is None:
+        logger.info(f"{name}: OCR of {book_names} finished")
+        queue.complete(jobs)
+        return
+    logger.error(f"{name}: OCR of {book_names} failed: {error}")
+    if len(jobs) == 1:
+        queue.fail(jobs, error=error)
+        return
+    # A single bad book fails the whole batch, find out which
+    for job in jobs:
+        logger.info(f"{name}: running {job.book_name} alone")
+        error = run_pipeline([job], run_timeout)
+        if error is None:
+            queue.complete([job])
+        else:
+            logger.error(f"{name}: OCR of {job.book_name} failed: {error}")
+            queue.fail([job], error=error)
+
+
+class IngestHandler(BaseHTTPRequestHandler):
+    """HTTP handler of the MinIO webhook, the metrics and the liveness probe."""
+
+    queue: BookQueue
+
+    def _respond(self, status: int, body: str = "", content_type: str = "text/plain"):
+        data = body.encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/metrics":
+            self._respond(200, render_metrics(self.queue), "text/plain; version=0.0.4")
+        elif self.path == "/healthz":
+            self._respond(200, "ok")
+        else:
+            self._respond(404)
+
+    def do_POST(self):
+        if self.path != "/minio/events":
+            self._respond(404)
+            return
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+            books = parse_event(json.loads(self.rfile.read(length) or b"{}"))
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Ignoring malformed notification: {e}")
+            self._respond(400)
+            return
+        for book in books:
+            book_name = get_book_name(book["object_name"])
+            if self.queue.enqueue(book_name=book_name, **book):
+                logger.info(f"Queued {book_name} from {book['bucket']}")
+        # Anything but 2xx makes MinIO keep and redeliver the event
+        self._respond(200)
+
+    def log_message(self, format, *args):
+        # Prometheus scrapes would flood the logs
+        pass
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run the OCR ingestion service")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--db_path", type=str, default=DEFAULT_DB_PATH)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Pipeline runs launched at the same time",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=4,
+        help="Books OCRed together in one pipeline run",
+    )
+    parser.add_argument("--run_timeout", type=int, default=RUN_TIMEOUT)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    queue = BookQueue(args.db_path)
+    requeued = queue.requeue_running()
+    if requeued:
+        logger.info(f"Queued {requeued} books of an interrupted run again")
+
+    stop = threading.Event()
+    workers = [
+        threading.Thread(
+            target=run_worker,
+            args=(queue, f"worker-{i}", args.batch_size, stop, args.run_timeout),
+            daemon=True,
+        )
+        for i in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    IngestHandler.queue = queue
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), IngestHandler)
+    logger.info(f"Ingestion service listening on port {args.port}")
+    try:
+        server.serve_forever()
+    finally:
+        stop.set()
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
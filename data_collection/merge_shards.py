@@ -0,0 +1,75 @@
+from collections import Counter
+
+from zenml import step
+
+from data_collection.artifacts import ParquetReference, ParquetReferenceMaterializer
+from data_collection.result_writer import upload_stream
+from data_collection.sharding import merge_parquet_objects
+from helper.logger import setup_logger
+from helper.minio import delete_objects, get_minio_client
+from helper.minio_paths import get_ocr_results_path
+
+logger = setup_logger(__name__)
+
+
+@step(
+    name="merge_ocr_shards",
+    enable_step_logs=True,
+    enable_cache=False,
+    output_materializers=ParquetReferenceMaterializer,
+)
+def merge_ocr_shards(
+    shards: list[ParquetReference],
+    minio_endpoint: str,
+    bucket: str,
+    book_name: str,
+    secure=False,
+) -> ParquetReference:
+    """
+    ZenML step that merges the shard outputs of a sharded OCR run into the book's results
+    object, in page order, and deletes the shard objects once the merge is uploaded.
+
+    Args:
+        shards (list[ParquetReference]): Outputs of the `ocr_images` shards, in shard
+            order.
+        minio_endpoint (str): MinIO server endpoint (e.g., "localhost:9000").
+        bucket (str): Bucket receiving the merged results.
+        book_name (str): Name of the book.
+        secure (bool, optional): Use HTTPS if True. Defaults to False.
+
+    Returns:
+        ParquetReference: Location of the merged results, same layout as an unsharded
+        `ocr_images` output but sorted by page.
+
+    Raises:
+        ValueError: If the merged row count differs from the shards' total.
+    """
+    minio_client = get_minio_client(minio_endpoint, secure=secure)
+    results_path = get_ocr_results_path(book_name=book_name)
+    with upload_stream(minio_client, bucket, results_path) as sink:
+        num_rows = merge_parquet_objects(
+            minio_client, bucket, [shard.object_name for shard in shards], sink
+        )
+        expected_rows = sum(shard.num_rows for shard in shards)
+        if num_rows != expected_rows:
+            # Raising inside the stream aborts the upload
+            raise ValueError(
+                f"Merged {num_rows} rows from {len(shards)} shards, "
+                f"expected {expected_rows}"
+            )
+
+    status_counts = Counter()
+    for shard in shards:
+        status_counts.update(shard.status_counts)
+    reference = ParquetReference(
+        bucket=bucket,
+        object_name=results_path,
+        num_rows=num_rows,
+        size_bytes=minio_client.stat_object(bucket, results_path).size,
+        status_counts=dict(status_counts),
+    )
+    delete_objects(minio_client, bucket, [shard.object_name for shard in shards])
+    logger.info(
+        f"Merged {len(shards)} shards into {reference.uri} ({reference.num_rows} pages)"
+    )
+    return reference
@@ -1,52 +1,244 @@
-import base64
+import asyncio
+import io
+import itertools
+import math
+import threading
 import time
+from collections import deque
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+import httpx
+from data_collection.cache import OCRResultCache, hash_bytes
+from data_collection.concurrency import AdaptiveLimiter, AIMDController
+from data_collection.packing import (
+    MAX_IMAGES_PER_PROMPT,
+    output_budget,
+    pack_pages,
+    vision_tokens,
+)
+from data_collection.prefetch import prefetch
+from data_collection.rasterize import page_number_from_path
+from data_collection.records import PAGE_BREAK, split_page_text
+from data_collection.transport import ImageTransport, InlineTransport
+from data_collection.readiness import (
+    MAX_WARMUP_WAIT,
+    ReadinessResult,
+    send_warmup_request,
+    wait_for_model_ready,
+)
 from helper.logger import setup_logger
+from data_collection.retry_policy import (
+    CircuitBreaker,
+    ErrorKind,
+    classify_error,
+    is_retryable,
+    request_timeout,
+    stop_for_error,
+    wait_for_error,
+)
 from tenacity import (
+    AsyncRetrying,
     retry,
-    stop_after_attempt,
-    wait_exponential,
-    retry_if_exception_type,
+    retry_if_exception,
     before_sleep_log,
     after_log,
 )
 import logging
-from openai import OpenAI
+from openai import (
+    APIConnectionError,
+    AsyncOpenAI,
+    BadRequestError,
+    InternalServerError,
+    OpenAI,
+)
+from openai.types.chat import ChatCompletion
+from PIL import Image
 
 
 logger = setup_logger(__name__)
 
 # Configuration matching your vLLM setup
-IMAGES_PER_REQUEST = 4  # matches limit_mm_per_prompt
-MAX_WARMUP_WAIT = 600
+IMAGES_PER_REQUEST = MAX_IMAGES_PER_PROMPT  # matches limit_mm_per_prompt
+MAX_IN_FLIGHT = 5  # matches maxNumSeqs
+# Upper bound of the adaptive window, leaves room for a short queue in the engine
+MAX_ADAPTIVE_IN_FLIGHT = 2 * MAX_IN_FLIGHT
+PREFETCH_CHUNKS = 2 * MAX_IN_FLIGHT
+ENCODE_WORKERS = 4
+MAX_TOKENS = 15000  # used when a chunk's vision tokens are unknown
+REQUEST_TIMEOUT = 600
+VLLM_ROUTER_URL = "http://vllm-stack-router-service.zenml.svc.cluster.local/v1"
+MODEL_NAME = "/models/Nanonets-OCR2-3B"
+GENERATION_PARAMS = {"temperature": 0.0, "max_tokens": MAX_TOKENS}
+# Errors where a smaller request may succeed: context overflow, oversized payloads,
+# timeouts and engine/router failures under a heavy multi-image request. An overloaded
+# router (see `retry_policy`) is not helped by more, smaller requests.
+SPLITTABLE_ERRORS = (
+    ValueError,
+    BadRequestError,
+    APIConnectionError,
+    InternalServerError,
+)
+OCR_PROMPT = f"Extract the text from the above document as if you were reading it naturally. Page numbers should be wrapped in brackets. Ex: <page_number>14</page_number> or <page_number>9/22</page_number>. Prefer using ☐ and ☑ for check boxes. End every page with {PAGE_BREAK}."
+
 
+def chunk_pages(image_paths: Iterable[str], size: int) -> Iterator[list[str]]:
+    """
+    Lazily group a stream of image paths into chunks of `size`, never mixing
+    directories (i.e. books) in a chunk.
 
-def encode_image(image_path: str) -> str:
-    """Encode a single image to base64."""
-    with open(image_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+    Args:
+        image_paths: Image file paths, possibly produced by a generator
+        size: Number of images per chunk
 
+    Yields:
+        Lists of at most `size` image paths, in input order
+    """
+    for _, book_paths in itertools.groupby(image_paths, key=lambda p: Path(p).parent):
+        while chunk := list(itertools.islice(book_paths, size)):
+            yield chunk
 
-@retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type((Exception,)),
-    before_sleep=before_sleep_log(logger, logging.WARNING),
-    after=after_log(logger, logging.INFO),
-)
-def ocr_multiple_images(
-    image_base64_list: list[str], model_name: str, client: OpenAI
-) -> str:
+
+@dataclass
+class PreparedChunk:
+    """
+    A chunk of pages ready for dispatch. Pages already answered by the cache are
+    moved to `cached_pages` and never sent.
+    """
+
+    paths: list[str]
+    image_urls: list[str] = field(default_factory=list)
+    page_hashes: list[str] = field(default_factory=list)
+    page_tokens: list[int] = field(default_factory=list)
+    # (path, text) of every page answered by the cache
+    cached_pages: list[tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def max_tokens(self) -> int:
+        """Output budget left in the context once this chunk's images are in it."""
+        return output_budget(self.page_tokens) if self.page_tokens else MAX_TOKENS
+
+
+def prepare_chunk(
+    chunk_paths: list[str],
+    cache: OCRResultCache | None = None,
+    transport: ImageTransport | None = None,
+) -> PreparedChunk:
+    """
+    Read the images of a chunk once, look every page up in the cache and encode the
+    pages it misses.
+
+    Args:
+        chunk_paths: Image file paths in the chunk
+        cache: Optional OCR result cache
+        transport: How images reach the engine, inline data URLs by default
+
+    Returns:
+        PreparedChunk
+    """
+    images = [Path(path).read_bytes() for path in chunk_paths]
+    page_hashes, cached_pages = [], []
+    if cache is not None:
+        missed_paths, missed_images = [], []
+        for path, image in zip(chunk_paths, images):
+            page_hash = hash_bytes(image)
+            cached = cache.get(cache.key(page_hash))
+            if cached is None:
+                missed_paths.append(path)
+                missed_images.append(image)
+                page_hashes.append(page_hash)
+            else:
+                cached_pages.append((path, cached))
+        chunk_paths, images = missed_paths, missed_images
+    transport = transport or InlineTransport()
+    page_tokens = []
+    for image in images:
+        with Image.open(io.BytesIO(image)) as page:
+            page_tokens.append(vision_tokens(*page.size))
+    return PreparedChunk(
+        paths=chunk_paths,
+        image_urls=[
+            transport.image_url(path, image) for path, image in zip(chunk_paths, images)
+        ],
+        page_hashes=page_hashes,
+        page_tokens=page_tokens,
+        cached_pages=cached_pages,
+    )
+
+
+def select_pages(chunk: PreparedChunk, indices: Iterable[int]) -> PreparedChunk:
+    """Take the pages at `indices` of a prepared chunk as a chunk of their own."""
+    indices = list(indices)
+    return PreparedChunk(
+        paths=[chunk.paths[i] for i in indices],
+        image_urls=[chunk.image_urls[i] for i in indices],
+        page_hashes=[chunk.page_hashes[i] for i in indices if chunk.page_hashes],
+        page_tokens=[chunk.page_tokens[i] for i in indices if chunk.page_tokens],
+    )
+
+
+def split_chunk(chunk: PreparedChunk, size: int) -> list[PreparedChunk]:
+    """Split a prepared chunk into sub-chunks of `size` pages."""
+    return [
+        select_pages(chunk, range(start, min(start + size, len(chunk.paths))))
+        for start in range(0, len(chunk.paths), size)
+    ]
+
+
+def cache_pages(
+    cache: OCRResultCache, chunk: PreparedChunk, texts: list[str | None]
+) -> None:
+    """Store the per-page texts of an answered chunk, keyed by page content."""
+    for page_hash, text in zip(chunk.page_hashes, texts):
+        if text is not None:
+            cache.put(cache.key(page_hash), text)
+
+
+def prepare_chunks(
+    image_chunks: Iterable[list[str]],
+    workers: int = 1,
+    cache: OCRResultCache | None = None,
+    transport: ImageTransport | None = None,
+) -> Iterator[PreparedChunk]:
     """
-    Process multiple images (up to 5) in a single request.
+    Prepare chunks for dispatch, keeping up to `workers` chunks in progress.
 
     Args:
-        image_base64_list: List of base64-encoded images (max 5)
+        image_chunks: Chunks of image file paths, in page order
+        workers: Number of encoder threads, 1 encodes inline
+        cache: Optional OCR result cache consulted before encoding
+        transport: How images reach the engine, inline data URLs by default
+
+    Yields:
+        PreparedChunk, in input order
+    """
+    if workers <= 1:
+        for chunk_paths in image_chunks:
+            yield prepare_chunk(chunk_paths, cache=cache, transport=transport)
+        return
 
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="encode") as pool:
+        pending = deque()
+        for chunk_paths in image_chunks:
+            pending.append(pool.submit(prepare_chunk, chunk_paths, cache, transport))
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def build_ocr_messages(image_urls: list[str]) -> list[dict]:
+    """
+    Build the chat messages for a multi-image OCR request.
+
+    Args:
+        image_urls: Data, presigned or file URLs of the images (max 5)
 
     Returns:
-        Single OCR result containing text from all images
+        Chat messages with every image followed by a single OCR instruction
     """
-    if len(image_base64_list) > IMAGES_PER_REQUEST:
+    if len(image_urls) > IMAGES_PER_REQUEST:
         raise ValueError(
             f"Cannot process more than {IMAGES_PER_REQUEST} images per request"
         )
@@ -55,11 +247,11 @@ def ocr_multiple_images(
     content = []
 
     # Add all images
-    for img_base64 in image_base64_list:
+    for image_url in image_urls:
         content.append(
             {
                 "type": "image_url",
-                "image_url": {"url": f"data:image/png;base64,{img_base64}"},
+                "image_url": {"url": image_url},
             }
         )
 
@@ -67,189 +259,809 @@ def ocr_multiple_images(
     content.append(
         {
             "type": "text",
-            "text": "Extract the text from the above document as if you were reading it naturally. Page numbers should be wrapped in brackets. Ex: <page_number>14</page_number> or <page_number>9/22</page_number>. Prefer using ☐ and ☑ for check boxes.",
+            "text": OCR_PROMPT,
         }
     )
+    return [
+        {
+            "role": "user",
+            "content": content,
+        }
+    ]
+
 
-    response = client.chat.completions.create(
+@retry(
+    stop=stop_for_error(),
+    wait=wait_for_error(),
+    retry=retry_if_exception(is_retryable),
+    before_sleep=before_sleep_log(logger, logging.WARNING),
+    after=after_log(logger, logging.INFO),
+    reraise=True,
+)
+def ocr_multiple_images(
+    image_urls: list[str],
+    model_name: str,
+    client: OpenAI,
+    max_tokens: int = MAX_TOKENS,
+) -> ChatCompletion:
+    """
+    Process multiple images (up to 5) in a single request. Transient and overload
+    errors are retried, see `data_collection.retry_policy`.
+
+    Args:
+        image_urls: Image URLs, see `build_ocr_messages` (max 5)
+        max_tokens: Output budget of the request, see `PreparedChunk.max_tokens`
+
+    Returns:
+        Raw completion, its single choice holds the text of all images
+    """
+    return client.chat.completions.create(
         model=model_name,
-        messages=[
-            {
-                "role": "user",
-                "content": content,
-            }
-        ],
-        temperature=0.0,
-        max_tokens=15000,
+        messages=build_ocr_messages(image_urls),
+        timeout=request_timeout(len(image_urls)),
+        **{**GENERATION_PARAMS, "max_tokens": max_tokens},
     )
 
-    return response.choices[0].message.content
 
+async def ocr_multiple_images_async(
+    image_urls: list[str],
+    model_name: str,
+    client: AsyncOpenAI,
+    max_tokens: int = MAX_TOKENS,
+    breaker: CircuitBreaker | None = None,
+    on_overload: Callable[[], None] | None = None,
+) -> tuple[ChatCompletion, float]:
+    """
+    Async counterpart of `ocr_multiple_images` used by the concurrent dispatcher.
+    Oversized batches and 400s are not retried, the dispatcher splits them instead.
 
-def check_first_batch(image_batch: list, model_name: str, client: OpenAI):
-    """Method to check if vllm is ready for processing batches.
     Args:
-        image_batch: List of image file paths
+        image_urls: Image URLs, see `build_ocr_messages` (max 5)
+        max_tokens: Output budget of the request, see `PreparedChunk.max_tokens`
+        breaker: Circuit breaker of the dispatcher, every attempt waits for it and
+            reports its outcome to it
+        on_overload: Called whenever the router answers 429 or 503
+
+    Returns:
+        The full completion, so callers can inspect finish_reason, and the seconds
+        its successful attempt took, without retries, backoff or breaker waits
     """
-    encoded_images = [encode_image(image_batch[0])]
-    # encoded_images = [encode_image(path) for path in image_batch]
+    messages = build_ocr_messages(image_urls)
+    async for attempt in AsyncRetrying(
+        stop=stop_for_error(),
+        wait=wait_for_error(),
+        retry=retry_if_exception(is_retryable),
+        before_sleep=before_sleep_log(logger, logging.WARNING),
+        after=after_log(logger, logging.INFO),
+        reraise=True,
+    ):
+        with attempt:
+            if breaker is not None:
+                await breaker.acquire()
+            start = time.time()
+            try:
+                response = await client.chat.completions.create(
+                    model=model_name,
+                    messages=messages,
+                    timeout=request_timeout(len(image_urls)),
+                    **{**GENERATION_PARAMS, "max_tokens": max_tokens},
+                )
+            except Exception as e:
+                if breaker is not None:
+                    breaker.record_failure(e)
+                if on_overload is not None and classify_error(e) is ErrorKind.OVERLOAD:
+                    on_overload()
+                raise
+            latency = time.time() - start
+            if breaker is not None:
+                breaker.record_success()
+    return response, latency
+
+
+def build_async_client(
+    base_url: str = VLLM_ROUTER_URL, max_in_flight: int = MAX_IN_FLIGHT
+) -> AsyncOpenAI:
+    """
+    Create an async OpenAI client backed by a single pooled keep-alive connection set.
+
+    The pool is sized to `max_in_flight` so every in-flight request reuses one of
+    the same connections to the router instead of opening a new one per chunk.
+
+    Args:
+        base_url: OpenAI-compatible base URL of the vLLM router
+        max_in_flight: Maximum number of concurrent requests
 
-    # Send request with multiple images
-    ocr_result = ocr_multiple_images(
-        encoded_images, model_name=model_name, client=client
+    Returns:
+        AsyncOpenAI client
+    """
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=max_in_flight,
+            max_keepalive_connections=max_in_flight,
+            keepalive_expiry=60,
+        ),
+        timeout=httpx.Timeout(REQUEST_TIMEOUT, connect=10),
+    )
+    # Retries follow `retry_policy`, not the SDK's own
+    return AsyncOpenAI(
+        base_url=base_url, api_key="dummy", http_client=http_client, max_retries=0
     )
-    if len(ocr_result) > 0:
-        return True
-    else:
-        return False
 
 
-def wait_for_model_ready(
-    client: OpenAI,
-    image_batch: list,
-    model_name: str,
+def start_model_warmup(
+    model_name: str = MODEL_NAME,
+    base_url: str = VLLM_ROUTER_URL,
     max_wait: int = MAX_WARMUP_WAIT,
-    check_interval: int = 5,
-) -> bool:
-    start_time = time.time()
-    logger.info(f"Waiting for model '{model_name}' to be ready...")
-
-    while (time.time() - start_time) < max_wait:
-        try:
-            is_up = check_first_batch(
-                image_batch=image_batch,
-                model_name=model_name,
-                client=client,
-            )
-            if is_up:
-                elapsed = time.time() - start_time
-                logger.info(f"✓ Model '{model_name}' is ready! (took {elapsed:.1f}s)")
-                return True  # ← FIX #1
-            else:
-                logger.warning(f"{model_name} is not up yet")
+) -> Future:
+    """
+    Start warming up the model on a background thread and return immediately.
 
-        except Exception as e:  # ← FIX #2: Catch all exceptions during warmup
-            logger.info(f"Model not ready: {e}. Waiting for pod to start...")
+    Call this before `ocr_batch` and pass it the returned future: in pipelined mode
+    the pages are fetched and encoded on the producer thread while `ocr_batch` waits
+    on it, so the scale-from-zero cold start of the vLLM deployment overlaps with
+    that work.
 
-        # Wait before next check
-        elapsed = time.time() - start_time
-        logger.info(
-            f"Waiting... ({elapsed:.0f}s / {max_wait}s) - "
-            f"next check in {check_interval}s"
-        )
-        time.sleep(check_interval)
+    Args:
+        model_name: Served model name
+        base_url: OpenAI-compatible base URL of the vLLM router
+        max_wait: Maximum time to wait for the model, in seconds
 
-    # Timeout
-    logger.error(
-        f"✗ Timeout: Model did not become ready within {max_wait}s. "
-        f"Pod may have failed to start."
+    Returns:
+        Future resolving to a ReadinessResult
+    """
+    client = OpenAI(base_url=base_url, api_key="dummy")
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="warmup")
+    model_ready = executor.submit(
+        wait_for_model_ready,
+        client=client,
+        model_name=model_name,
+        max_wait=max_wait,
     )
-    return False
+    # Let the thread finish on its own, nothing else is ever submitted
+    executor.shutdown(wait=False)
+    return model_ready
 
 
-def ocr_batch(
-    image_paths: list[str],
-    images_per_request: int = IMAGES_PER_REQUEST,
-    show_progress: bool = True,
+def wake_model(model_name: str = MODEL_NAME, base_url: str = VLLM_ROUTER_URL) -> None:
+    """
+    Send the warm-up request on a daemon thread and return immediately, without
+    waiting for the model like `start_model_warmup` does.
+
+    Call this from the steps before OCR, e.g. rasterization, so the cold start of a
+    deployment scaled to zero overlaps with their work instead of starting with the
+    OCR step.
+
+    Args:
+        model_name: Served model name
+        base_url: OpenAI-compatible base URL of the vLLM router
+    """
+    client = OpenAI(base_url=base_url, api_key="dummy")
+    threading.Thread(
+        target=send_warmup_request,
+        args=(client, model_name),
+        name="warmup",
+        daemon=True,
+    ).start()
+
+
+def chunk_result(
+    chunk_paths: list[str],
+    ocr_result: str | None = None,
+    error: str | None = None,
+    cached: bool = False,
+    status: str | None = None,
+    finish_reason: str | None = None,
+    source: str = "ocr",
+    latency: float = 0.0,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    duplicate_of: int | None = None,
+) -> dict:
+    """
+    Build the result row of one OCR request, `source` records where the text came from.
+    `data_collection.records.page_records` turns it into one record per page.
+    `duplicate_of` is only set on the checkpoint of a page the filter found repeated.
+    """
+    return {
+        "image_paths": chunk_paths,
+        "ocr_result": ocr_result,
+        "status": status or ("failed" if error is not None else "success"),
+        "error": error,
+        "num_images": len(chunk_paths),
+        "cached": cached,
+        "finish_reason": finish_reason,
+        "source": source,
+        "latency": latency,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "duplicate_of": duplicate_of,
+    }
+
+
+async def _ocr_with_recovery(
+    chunk: PreparedChunk,
+    model_name: str,
+    client: AsyncOpenAI,
+    cache: OCRResultCache | None = None,
+    breaker: CircuitBreaker | None = None,
+    on_overload: Callable[[], None] | None = None,
 ) -> list[dict]:
     """
-    Process a batch of images sequentially.
-    With maxNumSeqs=1, requests are processed one at a time.
+    OCR a chunk, recursively halving it when the request fails with a splittable
+    error or the output is cut off at max_tokens, down to single pages. Pages a
+    complete output has no text for are redone one by one, all of them when the
+    output cannot be divided into pages at all.
 
     Args:
-        image_paths: List of image file paths
-        images_per_request: Number of images per request (default: 5)
-        show_progress: Show progress updates
+        chunk: Prepared chunk with its encoded images
+        model_name: Served model name
+        client: Shared async client
+        cache: Optional OCR result cache, complete outputs are stored in it
+        breaker: Optional circuit breaker shared by the dispatcher's requests
+        on_overload: Optional callback run when the router is overloaded
 
     Returns:
-        List of dicts with image_paths (list), ocr_result, status, error
+        One result dict per request that finally answered, in page order
     """
-    # Split images into chunks
-    image_chunks = [
-        image_paths[i : i + images_per_request]
-        for i in range(0, len(image_paths), images_per_request)
+    try:
+        response, latency = await ocr_multiple_images_async(
+            chunk.image_urls,
+            model_name=model_name,
+            client=client,
+            max_tokens=chunk.max_tokens,
+            breaker=breaker,
+            on_overload=on_overload,
+        )
+    except SPLITTABLE_ERRORS as e:
+        if len(chunk.paths) == 1 or classify_error(e) is ErrorKind.OVERLOAD:
+            return [chunk_result(chunk.paths, error=str(e))]
+        logger.warning(
+            f"Request for {len(chunk.paths)} images failed ({type(e).__name__}), "
+            f"retrying as two smaller requests"
+        )
+        return await _ocr_parts(
+            chunk,
+            math.ceil(len(chunk.paths) / 2),
+            model_name,
+            client,
+            cache,
+            breaker,
+            on_overload,
+        )
+    except Exception as e:
+        return [chunk_result(chunk.paths, error=str(e))]
+
+    choice = response.choices[0]
+    ocr_result = choice.message.content
+    usage = {
+        "latency": latency,
+        "prompt_tokens": response.usage.prompt_tokens if response.usage else 0,
+        "completion_tokens": response.usage.completion_tokens if response.usage else 0,
+    }
+    if choice.finish_reason == "length":
+        if len(chunk.paths) > 1:
+            logger.warning(
+                f"Output for {len(chunk.paths)} images hit max_tokens, "
+                f"retrying as two smaller requests"
+            )
+            return await _ocr_parts(
+                chunk,
+                math.ceil(len(chunk.paths) / 2),
+                model_name,
+                client,
+                cache,
+                breaker,
+                on_overload,
+            )
+        # A single page that still overflows keeps its partial text
+        return [
+            chunk_result(
+                chunk.paths,
+                ocr_result=ocr_result,
+                status="truncated",
+                finish_reason=choice.finish_reason,
+                **usage,
+            )
+        ]
+    texts = split_page_text(ocr_result, len(chunk.paths))
+    if texts is None:
+        logger.warning(
+            f"Output for {len(chunk.paths)} images cannot be split into pages, "
+            f"retrying page by page"
+        )
+        return await _ocr_parts(
+            chunk, 1, model_name, client, cache, breaker, on_overload
+        )
+
+    if cache is not None:
+        await asyncio.to_thread(cache_pages, cache, chunk, texts)
+    missing = [i for i, text in enumerate(texts) if text is None]
+    if not missing:
+        return [
+            chunk_result(
+                chunk.paths,
+                ocr_result=ocr_result,
+                finish_reason=choice.finish_reason,
+                **usage,
+            )
+        ]
+    logger.warning(
+        f"Output for {len(chunk.paths)} images has no text for {len(missing)} "
+        f"pages, retrying those page by page"
+    )
+    # Keep the split pages, separated so the result splits the same way again
+    split = [i for i, text in enumerate(texts) if text is not None]
+    results = [
+        chunk_result(
+            [chunk.paths[i] for i in split],
+            ocr_result=PAGE_BREAK.join(texts[i] for i in split),
+            finish_reason=choice.finish_reason,
+            **usage,
+        )
     ]
+    results += await _ocr_parts(
+        select_pages(chunk, missing), 1, model_name, client, cache, breaker, on_overload
+    )
+    results.sort(key=lambda r: page_number_from_path(r["image_paths"][0]))
+    return results
 
-    total_requests = len(image_chunks)
-    logger.info(f"Processing {len(image_paths)} images in {total_requests} requests")
+
+async def _ocr_parts(
+    chunk: PreparedChunk,
+    size: int,
+    model_name: str,
+    client: AsyncOpenAI,
+    cache: OCRResultCache | None,
+    breaker: CircuitBreaker | None = None,
+    on_overload: Callable[[], None] | None = None,
+) -> list[dict]:
+    # Parts run one after the other inside the slot held by the original chunk
     results = []
-    start_time = time.time()
+    for part in split_chunk(chunk, size):
+        results += await _ocr_with_recovery(
+            part, model_name, client, cache, breaker, on_overload
+        )
+    return results
 
-    vllm_router_url = "http://vllm-stack-router-service.zenml.svc.cluster.local/v1"
-    model_name = "/models/Nanonets-OCR2-3B"
-    client: OpenAI = OpenAI(
-        base_url=vllm_router_url,
-        api_key="dummy",
-    )
 
-    is_vllm_alive = wait_for_model_ready(
-        image_batch=image_chunks[0], client=client, model_name=model_name
-    )
-    if is_vllm_alive:
-        logger.info("Testing dummy batch")
-        is_vllm_ready_for_batching = check_first_batch(
-            image_batch=image_chunks[0],
+async def _ocr_chunk(
+    request_num: int,
+    chunk: PreparedChunk,
+    model_name: str,
+    client: AsyncOpenAI,
+    limiter: AdaptiveLimiter,
+    progress: dict,
+    show_progress: bool,
+    cache: OCRResultCache | None = None,
+    on_result: Callable[[dict], None] | None = None,
+    controller: AIMDController | None = None,
+    breaker: CircuitBreaker | None = None,
+) -> list[dict]:
+    """
+    OCR a single chunk and free its slot in the in-flight window when done.
+
+    Args:
+        request_num: 1-based position of the chunk in the book
+        chunk: Prepared chunk with its encoded images
+        model_name: Served model name
+        client: Shared async client
+        limiter: Slot acquired by the dispatcher, released here
+        progress: Shared counters used for progress reporting
+        show_progress: Show progress updates
+        cache: Optional OCR result cache, successful outputs are stored in it
+        on_result: Optional callback run on a worker thread with every result
+        controller: Optional concurrency controller fed with request latencies, and
+            backed off when the router is overloaded
+        breaker: Optional circuit breaker shared by the dispatcher's requests
+
+    Returns:
+        Result dicts covering the chunk, more than one if it had to be split
+    """
+    chunk_start = time.time()
+    total_requests = progress["total"] or "?"
+    try:
+        results = await _ocr_with_recovery(
+            chunk,
             model_name=model_name,
             client=client,
+            cache=cache,
+            breaker=breaker,
+            on_overload=controller.backoff if controller else None,
         )
-        if not is_vllm_ready_for_batching:
-            raise ValueError(f"Model '{model_name}' is not ready yet. ")
-    else:
-        raise ValueError(f"Model {model_name} is not ready yet. ")
+    finally:
+        limiter.release()
+    progress["completed"] += 1
+    if controller is not None:
+        for result in results:
+            if result["status"] == "success":
+                controller.observe(result["latency"], result["completion_tokens"])
+
+    failed = [r for r in results if r["status"] != "success"]
+    if failed:
+        logger.info(
+            f"✗ Request {request_num}/{total_requests} "
+            f"{len(failed)}/{len(results)} sub-requests FAILED: "
+            f"{'; '.join(str(r['error'] or r['status']) for r in failed)}"
+        )
+    elif show_progress:
+        chunk_time = time.time() - chunk_start
+        completed = progress["completed"]
+        elapsed = time.time() - progress["start_time"]
+        remaining = (
+            f"{(progress['total'] - completed) * elapsed / completed:.1f}s"
+            if progress["total"]
+            else "unknown"
+        )
+        logger.info(
+            f"✓ Request {request_num}/{total_requests} ({len(chunk.paths)} images"
+            f"{f', split into {len(results)}' if len(results) > 1 else ''}) "
+            f"completed in {chunk_time:.2f}s | Est. remaining: {remaining}"
+        )
+    for result in results:
+        await _notify(on_result, result)
+    return results
 
-    for request_num, chunk_paths in enumerate(image_chunks, 1):
-        chunk_start = time.time()
 
-        try:
-            # Encode all images in the chunk
-            encoded_images = [encode_image(path) for path in chunk_paths]
+async def _notify(on_result: Callable[[dict], None] | None, result: dict) -> None:
+    """Run the result callback off the event loop, a failing callback fails the chunk."""
+    if on_result is not None:
+        await asyncio.to_thread(on_result, result)
 
-            # Send request with multiple images
-            ocr_result = ocr_multiple_images(
-                encoded_images, model_name=model_name, client=client
-            )
 
-            results.append(
-                {
-                    "image_paths": chunk_paths,
-                    "ocr_result": ocr_result,
-                    "status": "success",
-                    "error": None,
-                    "num_images": len(chunk_paths),
-                }
-            )
+async def _with_cached(
+    chunk: PreparedChunk,
+    ocr_task: asyncio.Task | None,
+    on_result: Callable[[dict], None] | None,
+) -> list[dict]:
+    """Adds a one-page result per cached page to the OCR results of the other pages."""
+    results = [
+        chunk_result([path], ocr_result=text, cached=True)
+        for path, text in chunk.cached_pages
+    ]
+    try:
+        for result in results:
+            await _notify(on_result, result)
+    except BaseException:
+        if ocr_task is not None:
+            ocr_task.cancel()
+        raise
+    if ocr_task is not None:
+        results += await ocr_task
+    return sorted(results, key=lambda r: page_number_from_path(r["image_paths"][0]))
+
 
-            chunk_time = time.time() - chunk_start
+async def dispatch_chunks_async(
+    prepared_chunks: Iterable[PreparedChunk],
+    model_name: str,
+    client: AsyncOpenAI,
+    max_in_flight: int = MAX_IN_FLIGHT,
+    total_requests: int | None = None,
+    show_progress: bool = True,
+    cache: OCRResultCache | None = None,
+    on_result: Callable[[dict], None] | None = None,
+    controller: AIMDController | None = None,
+    breaker: CircuitBreaker | None = None,
+) -> list[dict]:
+    """
+    Keep up to `max_in_flight` OCR requests running against the router at once, or
+    as many as `controller` currently allows.
 
-            if show_progress:
-                elapsed = time.time() - start_time
-                avg_time = elapsed / request_num
-                remaining = (total_requests - request_num) * avg_time
-                logger.info(
-                    f"✓ Request {request_num}/{total_requests} ({len(chunk_paths)} images) "
-                    f"completed in {chunk_time:.2f}s | Est. remaining: {remaining:.1f}s"
+    Chunks are pulled from `prepared_chunks` only when a slot is free, so a lazy
+    page stream is rendered just ahead of inference instead of all up front.
+    Pages answered by the cache are never sent, a chunk made only of them never
+    takes a slot. While `breaker` is open
+    no new chunk is dispatched.
+
+    Args:
+        prepared_chunks: Prepared chunks, in page order
+        model_name: Served model name
+        client: Shared async client
+        max_in_flight: Maximum number of concurrent requests
+        total_requests: Expected number of chunks, used for progress only
+        show_progress: Show progress updates
+        cache: Optional OCR result cache, successful outputs are stored in it
+        on_result: Optional callback run on a worker thread with every result, an
+            error it raises stops the dispatch
+        controller: Adjusts the number of requests in flight while they run,
+            `max_in_flight` is ignored when given
+        breaker: Circuit breaker pausing dispatch while the router keeps failing
+
+    Returns:
+        Result dicts in the same page order as `prepared_chunks`, a chunk split
+        during recovery contributes one dict per sub-request and every cached page
+        one dict of its own
+    """
+    limiter = controller.limiter if controller else AdaptiveLimiter(max_in_flight)
+    control_task = asyncio.create_task(controller.run()) if controller else None
+    progress = {"total": total_requests, "completed": 0, "start_time": time.time()}
+    chunk_iterator = iter(prepared_chunks)
+    tasks = []
+    # Errors of finished chunks, i.e. a failing `on_result`, stop the dispatch
+    errors = []
+
+    def check_task(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    try:
+        for request_num in itertools.count(1):
+            if breaker is not None:
+                await breaker.wait_until_ready()
+            await limiter.acquire()
+            if errors:
+                limiter.release()
+                raise errors[0]
+            # Producing a chunk may rasterize and encode pages, keep it off the loop
+            chunk = await asyncio.to_thread(next, chunk_iterator, None)
+            if chunk is None:
+                limiter.release()
+                break
+            if not chunk.paths:
+                # Every page was answered by the cache
+                limiter.release()
+                progress["completed"] += 1
+                task = asyncio.create_task(_with_cached(chunk, None, on_result))
+                task.add_done_callback(check_task)
+                tasks.append(task)
+                continue
+            ocr_task = asyncio.create_task(
+                _ocr_chunk(
+                    request_num=request_num,
+                    chunk=chunk,
+                    model_name=model_name,
+                    client=client,
+                    limiter=limiter,
+                    progress=progress,
+                    show_progress=show_progress,
+                    cache=cache,
+                    on_result=on_result,
+                    controller=controller,
+                    breaker=breaker,
                 )
+            )
+            if chunk.cached_pages:
+                ocr_task = asyncio.create_task(_with_cached(chunk, ocr_task, on_result))
+            ocr_task.add_done_callback(check_task)
+            tasks.append(ocr_task)
+        # gather preserves input order, so results come back in page order
+        return [
+            result for results in await asyncio.gather(*tasks) for result in results
+        ]
+    finally:
+        if control_task is not None:
+            control_task.cancel()
+        # Nothing is left running once the dispatch failed
+        for task in tasks:
+            task.cancel()
+
+
+def dispatch_chunks(
+    prepared_chunks: Iterable[PreparedChunk],
+    model_name: str = MODEL_NAME,
+    base_url: str = VLLM_ROUTER_URL,
+    max_in_flight: int = MAX_IN_FLIGHT,
+    total_requests: int | None = None,
+    show_progress: bool = True,
+    cache: OCRResultCache | None = None,
+    on_result: Callable[[dict], None] | None = None,
+    adaptive: bool = False,
+) -> list[dict]:
+    """
+    Run the async dispatcher from synchronous code.
+
+    Args:
+        prepared_chunks: Prepared chunks, in page order
+        model_name: Served model name
+        base_url: OpenAI-compatible base URL of the vLLM router
+        max_in_flight: Maximum number of concurrent requests
+        total_requests: Expected number of chunks, used for progress only
+        show_progress: Show progress updates
+        cache: Optional OCR result cache, successful outputs are stored in it
+        on_result: Optional callback run on a worker thread with every result
+        adaptive: Start at `max_in_flight` requests and let an `AIMDController`
+            move the window between 1 and `MAX_ADAPTIVE_IN_FLIGHT`
 
-        except Exception as e:
-            logger.info(f"✗ Request {request_num}/{total_requests} FAILED: {e}")
-            results.append(
-                {
-                    "image_paths": chunk_paths,
-                    "ocr_result": None,
-                    "status": "failed",
-                    "error": str(e),
-                    "num_images": len(chunk_paths),
-                }
+    Returns:
+        Result dicts in page order
+    """
+    max_window = max(max_in_flight, MAX_ADAPTIVE_IN_FLIGHT) if adaptive else None
+
+    async def _run() -> list[dict]:
+        controller = None
+        if adaptive:
+            controller = AIMDController(
+                AdaptiveLimiter(max_in_flight), max_limit=max_window
             )
+        async with build_async_client(
+            base_url=base_url, max_in_flight=max_window or max_in_flight
+        ) as client:
+            return await dispatch_chunks_async(
+                prepared_chunks=prepared_chunks,
+                model_name=model_name,
+                client=client,
+                max_in_flight=max_in_flight,
+                total_requests=total_requests,
+                show_progress=show_progress,
+                cache=cache,
+                on_result=on_result,
+                controller=controller,
+                breaker=CircuitBreaker(),
+            )
+
+    return asyncio.run(_run())
+
+
+def ocr_batch(
+    image_paths: Iterable[str],
+    images_per_request: int = IMAGES_PER_REQUEST,
+    max_in_flight: int = MAX_IN_FLIGHT,
+    num_pages: int | None = None,
+    pack: bool = True,
+    pipelined: bool = True,
+    model_ready: Future | None = None,
+    warmup_with_first_chunk: bool = False,
+    cache: OCRResultCache | None = None,
+    on_result: Callable[[dict], None] | None = None,
+    transport: ImageTransport | None = None,
+    show_progress: bool = True,
+    adaptive: bool = True,
+) -> list[dict]:
+    """
+    Process a stream of images through the concurrent dispatcher.
+    Up to `max_in_flight` requests are kept running so vLLM can batch them
+    (maxNumSeqs=5); `max_in_flight=1` processes chunks one at a time. In adaptive
+    mode `max_in_flight` is only the starting point, the window then follows the
+    engine queue and latency, see `data_collection.concurrency`.
+
+    In pipelined mode, page rendering and base64 encoding run on background
+    workers that start before the model is waited on and fill a bounded queue of
+    `PREFETCH_CHUNKS` ready chunks, so they overlap with the model warm-up and with
+    inference. Otherwise each chunk is
+    rendered and encoded only when a request slot frees up.
+
+    Every request is given the output budget its images leave in the context,
+    rather than a fixed max_tokens.
+
+    Args:
+        image_paths: Image file paths, a list or a lazy page stream
+        images_per_request: Maximum number of images per request (default: 5)
+        max_in_flight: Maximum number of concurrent requests (default: 5)
+        num_pages: Number of pages in the stream, used for progress only
+        pack: Size requests by the pages' vision tokens (see `pack_pages`)
+            instead of always sending `images_per_request` pages
+        pipelined: Produce encoded chunks ahead of inference on background workers
+        model_ready: Warm-up started earlier with `start_model_warmup`; when
+            omitted the readiness check runs here
+        warmup_with_first_chunk: Without `model_ready`, confirm readiness by
+            OCRing the first chunk and keep that output as its result
+        cache: OCR result cache consulted before dispatching each chunk
+        on_result: Callback run with every chunk result as soon as it completes,
+            e.g. `ChunkCheckpointer.save`; an error it raises fails the batch
+        transport: How images reach the engine (see `data_collection.transport`),
+            inline data URLs by default; closed once every request has finished
+        show_progress: Show progress updates
+        adaptive: Adjust the number of requests in flight while running
+
+    Returns:
+        List of dicts with image_paths (list), ocr_result, status ("success",
+        "failed" or "truncated"), error, cached, finish_reason; a chunk that had
+        to be split contributes one dict per sub-request. Empty when the stream
+        has no images, e.g. every page was filtered out.
+    """
+    if num_pages is None and isinstance(image_paths, list):
+        num_pages = len(image_paths)
+    # A lower bound when packing, large pages may go in smaller requests
+    total_requests = (
+        math.ceil(num_pages / images_per_request) if num_pages is not None else None
+    )
+    logger.info(
+        f"Processing {num_pages if num_pages is not None else 'a stream of'} images "
+        f"in {total_requests or '?'} requests ({max_in_flight} in flight"
+        f"{', adaptive' if adaptive else ''}{', pipelined' if pipelined else ''})"
+    )
+    start_time = time.time()
+    transport = transport or InlineTransport()
+
+    if pack:
+        image_chunks = pack_pages(image_paths, max_images=images_per_request)
+    else:
+        image_chunks = chunk_pages(image_paths, images_per_request)
+    if pipelined:
+        prepared_chunks = prefetch(
+            prepare_chunks(
+                image_chunks, workers=ENCODE_WORKERS, cache=cache, transport=transport
+            ),
+            max_buffered=PREFETCH_CHUNKS,
+            name="ocr-producer",
+        )
+    else:
+        prepared_chunks = prepare_chunks(image_chunks, cache=cache, transport=transport)
+
+    # Known before waiting on the model, a book whose pages were all filtered out or
+    # done has nothing to send
+    first_chunk = next(prepared_chunks, None)
+    if first_chunk is None:
+        logger.info("No images left to process")
+        transport.close()
+        return []
+    prepared_chunks = itertools.chain([first_chunk], prepared_chunks)
+
+    model_name = MODEL_NAME
+    first_results = []
+    if model_ready is not None:
+        logger.info("Waiting for background model warm-up to finish")
+        readiness: ReadinessResult = model_ready.result()
+    else:
+        client: OpenAI = OpenAI(
+            base_url=VLLM_ROUTER_URL,
+            api_key="dummy",
+            max_retries=0,
+        )
+        ocr_probe = None
+        if warmup_with_first_chunk and first_chunk.paths:
+
+            def ocr_probe() -> tuple[str | None, str | None]:
+                choice = ocr_multiple_images(
+                    first_chunk.image_urls,
+                    model_name=model_name,
+                    client=client,
+                    max_tokens=first_chunk.max_tokens,
+                ).choices[0]
+                return choice.message.content, choice.finish_reason
+
+        readiness = wait_for_model_ready(
+            client=client, model_name=model_name, ocr_probe=ocr_probe
+        )
+        if readiness.ocr_result:
+            # The probe already OCR'd the first chunk, don't send it again
+            next(prepared_chunks)
+            first_results = [
+                chunk_result(first_chunk.paths, ocr_result=readiness.ocr_result)
+            ] + [
+                chunk_result([path], ocr_result=text, cached=True)
+                for path, text in first_chunk.cached_pages
+            ]
+            first_results.sort(key=lambda r: page_number_from_path(r["image_paths"][0]))
+            texts = split_page_text(readiness.ocr_result, len(first_chunk.paths))
+            if cache is not None and texts is not None:
+                cache_pages(cache, first_chunk, texts)
+            if on_result is not None:
+                for result in first_results:
+                    on_result(result)
+    if not readiness.ready:
+        raise ValueError(f"Model {model_name} is not ready yet. ")
+
+    try:
+        results = dispatch_chunks(
+            prepared_chunks=prepared_chunks,
+            model_name=model_name,
+            base_url=VLLM_ROUTER_URL,
+            max_in_flight=max_in_flight,
+            total_requests=total_requests,
+            show_progress=show_progress,
+            cache=cache,
+            on_result=on_result,
+            adaptive=adaptive,
+        )
+    finally:
+        transport.close()
+    results = first_results + results
 
     total_time = time.time() - start_time
+    total_requests = len(results)
+    total_images = sum(r["num_images"] for r in results)
     successful_requests = sum(1 for r in results if r["status"] == "success")
-    # successful_images = sum(
-    #    r["num_images"] for r in results if r["status"] == "success"
-    # )
+    truncated_requests = sum(1 for r in results if r["status"] == "truncated")
 
     logger.info(f"Total processing time: {total_time:.2f}s")
     logger.info(f"Successful requests: {successful_requests}/{total_requests}")
+    if truncated_requests:
+        logger.warning(
+            f"{truncated_requests} single-page requests still hit max_tokens"
+        )
     logger.info(f"Average time per request: {total_time / total_requests:.2f}s")
-    logger.info(f"Average time per image: {total_time / len(image_paths):.2f}s")
+    logger.info(f"Average time per image: {total_time / total_images:.2f}s")
+    if cache is not None:
+        cache.evict_local()
+        logger.info(f"OCR cache: {cache.stats()}")
     return results
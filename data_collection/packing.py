@@ -0,0 +1,138 @@
+"""
+Request Packing
+
+Estimates what each page costs the vLLM server in vision tokens and packs pages into
+requests that fit the model context together with room for their output.
+
+The estimate mirrors the Qwen2-VL image processor used by Nanonets-OCR2: every image is
+resized so both sides are multiples of 28 and its area falls within the server's
+`min_pixels`/`max_pixels` bounds, then each 28x28 patch becomes one token.
+
+Functions:
+    smart_resize(height: int, width: int) -> tuple[int, int]:
+        Returns the size the server processor resizes an image to.
+
+    vision_tokens(width: int, height: int) -> int:
+        Returns the number of vision tokens of an image of this size.
+
+    request_input_tokens(page_tokens: list[int]) -> int:
+        Returns the prompt length of a request made of these pages.
+
+    output_budget(page_tokens: list[int]) -> int:
+        Returns the max_tokens a request made of these pages can be given.
+
+    pack_pages(image_paths: Iterable[str], max_images: int) -> Iterator[list[str]]:
+        Greedily groups a stream of pages into requests that fit the context.
+"""
+
+import math
+from collections.abc import Iterable, Iterator
+from pathlib import Path
+
+from PIL import Image
+
+# Server processor and engine limits, see infrastructure/components/vllm/deploy_vllm.py
+PATCH_FACTOR = 28  # 14px patches merged 2x2
+MIN_PIXELS = 784
+MAX_PIXELS = 4096000
+MAX_MODEL_LEN = 48000
+MAX_IMAGES_PER_PROMPT = 5  # limit_mm_per_prompt
+# Chat template plus the OCR instruction
+PROMPT_TOKENS = 128
+# <|vision_start|> and <|vision_end|> around every image
+IMAGE_OVERHEAD_TOKENS = 2
+# Output reserved per page when deciding whether another page fits a request
+OUTPUT_TOKENS_PER_PAGE = 3500
+
+
+def smart_resize(
+    height: int,
+    width: int,
+    factor: int = PATCH_FACTOR,
+    min_pixels: int = MIN_PIXELS,
+    max_pixels: int = MAX_PIXELS,
+) -> tuple[int, int]:
+    """
+    Returns the (height, width) the server processor resizes an image to.
+
+    Both sides are rounded to multiples of `factor` and the area is scaled into
+    [`min_pixels`, `max_pixels`], keeping the aspect ratio.
+    """
+    resized_height = max(factor, round(height / factor) * factor)
+    resized_width = max(factor, round(width / factor) * factor)
+    if resized_height * resized_width > max_pixels:
+        beta = math.sqrt((height * width) / max_pixels)
+        resized_height = max(factor, math.floor(height / beta / factor) * factor)
+        resized_width = max(factor, math.floor(width / beta / factor) * factor)
+    elif resized_height * resized_width < min_pixels:
+        beta = math.sqrt(min_pixels / (height * width))
+        resized_height = math.ceil(height * beta / factor) * factor
+        resized_width = math.ceil(width * beta / factor) * factor
+    return resized_height, resized_width
+
+
+def vision_tokens(width: int, height: int) -> int:
+    """Returns the number of vision tokens the server spends on an image of this size."""
+    resized_height, resized_width = smart_resize(height, width)
+    return (resized_height // PATCH_FACTOR) * (resized_width // PATCH_FACTOR)
+
+
+def image_tokens(image_path: str) -> int:
+    """Returns the vision tokens of an image file, reading only its header."""
+    with Image.open(image_path) as image:
+        return vision_tokens(*image.size)
+
+
+def request_input_tokens(page_tokens: list[int]) -> int:
+    """Returns the prompt length of a request made of pages with these token costs."""
+    return PROMPT_TOKENS + sum(t + IMAGE_OVERHEAD_TOKENS for t in page_tokens)
+
+
+def output_budget(page_tokens: list[int], max_model_len: int = MAX_MODEL_LEN) -> int:
+    """Returns the max_tokens left for the output once the pages are in the context."""
+    return max(1, max_model_len - request_input_tokens(page_tokens))
+
+
+def fits(page_tokens: list[int], max_model_len: int = MAX_MODEL_LEN) -> bool:
+    """Returns True if the pages and their reserved output fit in the context."""
+    return (
+        request_input_tokens(page_tokens) + len(page_tokens) * OUTPUT_TOKENS_PER_PAGE
+        <= max_model_len
+    )
+
+
+def pack_pages(
+    image_paths: Iterable[str],
+    max_images: int = MAX_IMAGES_PER_PROMPT,
+    max_model_len: int = MAX_MODEL_LEN,
+) -> Iterator[list[str]]:
+    """
+    Lazily group a stream of pages into requests, in page order.
+
+    Pages are added to the current request while it stays under `max_images` and
+    its vision tokens plus `OUTPUT_TOKENS_PER_PAGE` per page fit `max_model_len`.
+    Small pages therefore ride together while a page too large to share goes alone.
+    A request never mixes directories, i.e. pages of two books.
+
+    Args:
+        image_paths: Image file paths, possibly produced by a generator
+        max_images: Maximum number of images per request
+        max_model_len: Context length of the served model
+
+    Yields:
+        Lists of image paths, one per request
+    """
+    pack, pack_tokens = [], []
+    for image_path in image_paths:
+        tokens = image_tokens(image_path)
+        if pack and (
+            len(pack) >= max_images
+            or Path(image_path).parent != Path(pack[-1]).parent
+            or not fits(pack_tokens + [tokens], max_model_len)
+        ):
+            yield pack
+            pack, pack_tokens = [], []
+        pack.append(image_path)
+        pack_tokens.append(tokens)
+    if pack:
+        yield pack
@@ -0,0 +1,334 @@
+"""
+Page Filter
+
+Cheap CPU checks that keep pages which would waste a vision generation out of the OCR
+stream: blank separator pages and near-identical repeats (covers, inserts, rescans).
+
+Checks:
+    blank: The share of ink pixels is below `BLANK_INK_RATIO`. The border where scanner
+        and gutter shadows live is taken on the full render, not on the autocropped
+        page, and isolated specks holding less than `MIN_INK_COMPONENT` of the page
+        are not ink.
+    duplicate: The difference hash of the page is within `DUPLICATE_MAX_DISTANCE` bits
+        of a page seen earlier in the book, and a pixel comparison of both pages
+        confirms it.
+
+Both checks run on a JPEG draft decoded at reduced size.
+
+Functions:
+    ink_ratio(image: Image.Image, geometry: PageBox | None) -> float:
+        Returns the share of ink in the content region of a page.
+
+    dhash(image: Image.Image, hash_size: int) -> int:
+        Returns the difference hash of a page.
+
+    same_pixels(first: tuple, second: tuple) -> bool:
+        Compares the `fingerprint` of two pages pixel by pixel.
+"""
+
+import math
+from collections.abc import Iterable, Iterator
+
+import numpy as np
+from PIL import Image
+
+from data_collection.preprocess import PageBox, crop_box, page_box
+from data_collection.rasterize import page_number_from_path
+from data_collection.records import page_record
+from helper.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Pixels darker than this count as ink
+INK_THRESHOLD = 128
+BLANK_INK_RATIO = 0.001
+# Share of each side of the full page ignored when measuring ink
+BORDER_RATIO = 0.05
+# Ink closer than this share of the page width is one blob, bridges letters and words
+INK_LINK_DISTANCE = 0.01
+# Fewest ink pixels of a counted blob as a share of the page area, about a word of body
+# text; isolated specks hold less
+MIN_INK_COMPONENT = 1e-4
+# 16x16 gradients, 256 bits; unrelated pages differ in about half of them, distinct
+# sparse pages (a title, a single line) in as few as 11
+HASH_SIZE = 16
+DUPLICATE_MAX_DISTANCE = 4
+# Thumbnails compared pixel by pixel to confirm a hash match
+CONFIRM_SIZE = 64
+# Gray levels two matching pixels may differ by, absorbs JPEG and rescan noise
+PIXEL_TOLERANCE = 48
+# Share of thumbnail pixels allowed to differ by more
+MAX_DIFFERING_PIXELS = 0.005
+# Largest relative difference of the aspect ratios of two matching pages
+MAX_ASPECT_DIFFERENCE = 0.02
+# Size pages are decoded at for the checks
+ANALYSIS_SIZE = (512, 512)
+
+
+def load_for_analysis(image_path: str) -> tuple[Image.Image, PageBox | None]:
+    """
+    Decodes a page in grayscale at reduced size, JPEGs are scaled during decoding.
+
+    Returns:
+        tuple[Image.Image, PageBox | None]: The page and where it sat on its full
+        render, None if it was not cropped by the rasterizer.
+    """
+    with Image.open(image_path) as image:
+        geometry = page_box(image)
+        image.draft("L", ANALYSIS_SIZE)
+        image = image.convert("L")
+        image.thumbnail(ANALYSIS_SIZE)
+        return image, geometry
+
+
+def component_ink(ink: np.ndarray, min_size: float, link_radius: int = 0) -> int:
+    """
+    Counts the ink pixels of the blobs holding at least `min_size` of them. Ink closer
+    than `link_radius` pixels belongs to the same blob, so the letters of a word or a
+    line form one blob while an isolated speck stays small.
+
+    Blobs are labeled on the horizontal runs of the linked mask rather than pixel by
+    pixel: runs touching in consecutive rows are merged by propagating the smallest
+    run index until nothing changes.
+
+    Args:
+        ink (np.ndarray): Boolean ink mask.
+        min_size (float): Fewest ink pixels of a counted blob.
+        link_radius (int): Gap bridged between ink pixels of one blob.
+
+    Returns:
+        int: Counted pixels.
+    """
+    linked = ink
+    for _ in range(link_radius):
+        grown = linked.copy()
+        grown[1:] |= linked[:-1]
+        grown[:-1] |= linked[1:]
+        grown[:, 1:] |= linked[:, :-1]
+        grown[:, :-1] |= linked[:, 1:]
+        linked = grown
+    height, width = ink.shape
+    # A blank column after every row keeps runs from wrapping to the next one
+    stride = width + 1
+    flat_linked = np.zeros((height, stride), dtype=bool)
+    flat_linked[:, :width] = linked
+    flat_linked = flat_linked.ravel()
+    flat_ink = np.zeros((height, stride), dtype=np.int64)
+    flat_ink[:, :width] = ink
+    flat_ink = flat_ink.ravel()
+
+    steps = np.diff(flat_linked.astype(np.int8), prepend=0)
+    starts, ends = np.flatnonzero(steps == 1), np.flatnonzero(steps == -1)
+    if not len(starts):
+        return 0
+    run_of = np.cumsum(steps == 1) - 1
+    ink_sums = np.concatenate(([0], np.cumsum(flat_ink)))
+    run_ink = ink_sums[ends] - ink_sums[starts]
+
+    # Runs sharing a column in consecutive rows are one blob
+    above = np.flatnonzero(flat_linked[:-stride] & flat_linked[stride:])
+    pairs = np.unique(run_of[above] * len(starts) + run_of[above + stride])
+    first, second = np.divmod(pairs, len(starts))
+    labels = np.arange(len(starts))
+    while True:
+        lowest = np.minimum(labels[first], labels[second])
+        merged = labels.copy()
+        np.minimum.at(merged, first, lowest)
+        np.minimum.at(merged, second, lowest)
+        # Point every run at the label of its label
+        merged = merged[merged]
+        if np.array_equal(merged, labels):
+            break
+        labels = merged
+
+    sizes = np.bincount(labels, weights=run_ink)
+    return int(sizes[sizes >= min_size].sum())
+
+
+def ink_ratio(
+    image: Image.Image,
+    geometry: PageBox | None = None,
+    border_ratio: float = BORDER_RATIO,
+    min_component: float = MIN_INK_COMPONENT,
+) -> float:
+    """
+    Returns the share of ink pixels in the content region of a page, leaving out a
+    border of its full render.
+
+    The page may be an autocropped region of the render, `geometry` tells where it
+    sat, so a crop around a speck or a gutter shadow is not mistaken for content.
+    A sparse page such as a dedication reads as high as a full one.
+
+    Args:
+        image (Image.Image): Grayscale page.
+        geometry (PageBox | None): Crop of the page, None if it is the full render,
+            which is then cropped the way the rasterizer does.
+        border_ratio (float): Share of each side of the full page left out.
+        min_component (float): Fewest ink pixels of a counted blob, as a share of the
+            page area, see `component_ink`.
+
+    Returns:
+        float: Ink pixels over measured pixels of the page.
+    """
+    if geometry is None:
+        geometry = PageBox(box=crop_box(image), page_size=image.size)
+        image = image.crop(geometry.box)
+    pixels = np.asarray(image)
+    height, width = pixels.shape
+    left, top, right, bottom = geometry.box
+    page_width, page_height = geometry.page_size
+    # Pixels of this image per pixel of the full render
+    scale_x, scale_y = width / (right - left), height / (bottom - top)
+    x0 = max(0, round((page_width * border_ratio - left) * scale_x))
+    x1 = min(width, round((page_width * (1 - border_ratio) - left) * scale_x))
+    y0 = max(0, round((page_height * border_ratio - top) * scale_y))
+    y1 = min(height, round((page_height * (1 - border_ratio) - top) * scale_y))
+    if x1 <= x0 or y1 <= y0:
+        return 0.0
+    measured = (x1 - x0) * (y1 - y0)
+    min_size = min_component * page_width * scale_x * page_height * scale_y
+    link_radius = math.ceil(INK_LINK_DISTANCE * page_width * scale_x)
+    ink = pixels[y0:y1, x0:x1] < INK_THRESHOLD
+    return component_ink(ink, min_size, link_radius) / measured
+
+
+def dhash(image: Image.Image, hash_size: int = HASH_SIZE) -> int:
+    """
+    Returns the difference hash of a page: one bit per horizontal gradient sign of a
+    (hash_size + 1) x hash_size thumbnail.
+
+    Args:
+        image (Image.Image): Grayscale page.
+        hash_size (int): Number of rows and gradients per row.
+
+    Returns:
+        int: hash_size * hash_size bit hash.
+    """
+    pixels = np.asarray(
+        image.resize((hash_size + 1, hash_size), Image.Resampling.LANCZOS),
+        dtype=np.int16,
+    )
+    bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def fingerprint(image: Image.Image) -> tuple[float, np.ndarray]:
+    """Returns the aspect ratio and a small thumbnail of a page, see `same_pixels`."""
+    thumbnail = image.resize((CONFIRM_SIZE, CONFIRM_SIZE), Image.Resampling.BOX)
+    return image.width / image.height, np.asarray(thumbnail, dtype=np.int16)
+
+
+def same_pixels(
+    first: tuple[float, np.ndarray], second: tuple[float, np.ndarray]
+) -> bool:
+    """
+    Returns True if two pages have the same shape and all but a few of their
+    thumbnail pixels match.
+
+    Args:
+        first (tuple[float, np.ndarray]): `fingerprint` of a page.
+        second (tuple[float, np.ndarray]): `fingerprint` of another page.
+
+    Returns:
+        bool: Whether the pages are the same image.
+    """
+    (first_aspect, first_pixels), (second_aspect, second_pixels) = first, second
+    if abs(first_aspect - second_aspect) > MAX_ASPECT_DIFFERENCE * first_aspect:
+        return False
+    difference = np.abs(first_pixels - second_pixels)
+    differing = np.count_nonzero(difference > PIXEL_TOLERANCE)
+    return bool(differing <= MAX_DIFFERING_PIXELS * difference.size)
+
+
+class PageFilter:
+    """
+    Streaming filter that drops blank and duplicate pages before OCR and keeps a
+    result row for each of them.
+    """
+
+    def __init__(
+        self,
+        blank_ink_ratio: float = BLANK_INK_RATIO,
+        max_distance: int = DUPLICATE_MAX_DISTANCE,
+    ):
+        """
+        Args:
+            blank_ink_ratio (float): Ink share under which a page is blank.
+            max_distance (int): Hash distance under which pages are duplicates.
+        """
+        self.blank_ink_ratio = blank_ink_ratio
+        self.max_distance = max_distance
+        self.blank: list[str] = []
+        self.duplicates: dict[str, str] = {}  # duplicate page -> first occurrence
+        # Page number -> path of every page dropped
+        self.skipped: dict[int, str] = {}
+        # Hash, fingerprint and path of every page kept so far
+        self._seen: list[tuple[int, tuple[float, np.ndarray], str]] = []
+
+    def _find_duplicate(
+        self, page_hash: int, page_fingerprint: tuple[float, np.ndarray]
+    ) -> str | None:
+        for seen_hash, seen_fingerprint, seen_path in self._seen:
+            if (page_hash ^ seen_hash).bit_count() <= self.max_distance and (
+                same_pixels(page_fingerprint, seen_fingerprint)
+            ):
+                return seen_path
+        return None
+
+    def __call__(self, image_paths: Iterable[str]) -> Iterator[str]:
+        """
+        Yields the pages that still need OCR, in input order.
+
+        Args:
+            image_paths (Iterable[str]): Image file paths, possibly a lazy stream.
+
+        Yields:
+            str: Paths of pages that are neither blank nor duplicates.
+        """
+        for image_path in image_paths:
+            image, geometry = load_for_analysis(image_path)
+            ink = ink_ratio(image, geometry)
+            if ink < self.blank_ink_ratio:
+                self.blank.append(image_path)
+                self.skipped[page_number_from_path(image_path)] = image_path
+                continue
+            page_hash, page_fingerprint = dhash(image), fingerprint(image)
+            original = self._find_duplicate(page_hash, page_fingerprint)
+            if original is not None:
+                self.duplicates[image_path] = original
+                self.skipped[page_number_from_path(image_path)] = image_path
+                continue
+            self._seen.append((page_hash, page_fingerprint, image_path))
+            yield image_path
+        logger.info(
+            f"Page filter skipped {len(self.blank)} blank and "
+            f"{len(self.duplicates)} duplicate pages"
+        )
+
+    def record(self, page: int, book: str, text_by_page: dict[int, str]) -> dict:
+        """
+        Builds the page record of a filtered page. A duplicate reuses the text of its
+        first occurrence.
+
+        Args:
+            page (int): Number of a page in `skipped`.
+            book (str): Book name.
+            text_by_page (dict[int, str]): Text of the pages that went through OCR.
+
+        Returns:
+            dict: Page record of the filtered page.
+        """
+        path = self.skipped[page]
+        if path not in self.duplicates:
+            return page_record(
+                book=book, page=page, text="", status="blank", source="page_filter"
+            )
+        original_page = page_number_from_path(self.duplicates[path])
+        return page_record(
+            book=book,
+            page=page,
+            text=text_by_page.get(original_page),
+            status="duplicate",
+            source="page_filter",
+            duplicate_of=original_page,
+        )
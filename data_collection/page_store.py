@@ -0,0 +1,192 @@
+"""
+Page Store
+
+Rendered page images kept in MinIO, so a book is rasterized once and can be OCR'd any
+number of times, with other models or prompts, without downloading or rendering the PDF
+again.
+
+A store lives under a content-addressed prefix made of the SHA-256 of the PDF bytes and a
+hash of the render settings. The same book rendered the same way always maps to the same
+prefix, and any change to the PDF or to the settings gets a fresh one.
+
+Layout:
+    page_store/<pdf sha256>/<settings hash>/page_<n>.jpg    one normalized page image
+    page_store/<pdf sha256>/<settings hash>/manifest.json   written last, see PageManifest
+
+A prefix with a manifest therefore always holds every page the manifest lists.
+
+Functions:
+    hash_file(path: str) -> str:
+        Returns the hex SHA-256 digest of a file.
+
+    render_settings_key(settings: dict) -> str:
+        Returns a short stable hash of the render settings.
+"""
+
+import hashlib
+import json
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+from minio import Minio
+from minio.error import S3Error
+
+from data_collection.cache import hash_bytes
+from data_collection.rasterize import page_image_path, page_number_from_path
+from helper.logger import setup_logger
+from helper.minio import BULK_WORKERS, get_object_bytes, put_object_bytes
+
+logger = setup_logger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+
+
+def hash_file(path: str) -> str:
+    """Returns the hex SHA-256 digest of a file."""
+    with open(path, "rb") as f:
+        return hashlib.file_digest(f, "sha256").hexdigest()
+
+
+def render_settings_key(settings: dict) -> str:
+    """Returns a short stable hash of the render settings."""
+    return hash_bytes(json.dumps(settings, sort_keys=True).encode())[:16]
+
+
+@dataclass
+class PageManifest:
+    """Contents of a page store prefix."""
+
+    prefix: str
+    pdf_sha256: str
+    settings: dict
+    num_pages: int
+    # page number -> SHA-256 of the stored image, for the rendered pages
+    pages: dict[int, str] = field(default_factory=dict)
+    # page number -> text, for the pages read from the PDF's text layer instead
+    text_layers: dict[int, str] = field(default_factory=dict)
+
+    def object_name(self, page_number: int) -> str:
+        """Returns the object holding the image of a page."""
+        return f"{self.prefix}/page_{page_number}.jpg"
+
+    def to_json(self) -> bytes:
+        return json.dumps(asdict(self)).encode()
+
+    @classmethod
+    def from_json(cls, data: bytes) -> "PageManifest":
+        manifest = cls(**json.loads(data))
+        # JSON object keys are strings
+        manifest.pages = {int(k): v for k, v in manifest.pages.items()}
+        manifest.text_layers = {int(k): v for k, v in manifest.text_layers.items()}
+        return manifest
+
+
+class PageStore:
+    """Reads and writes page store prefixes in a bucket."""
+
+    def __init__(self, client: Minio, bucket: str, workers: int = BULK_WORKERS):
+        """
+        Args:
+            client (Minio): MinIO client.
+            bucket (str): Bucket holding the page store.
+            workers (int): Number of concurrent page uploads or downloads.
+        """
+        self.client = client
+        self.bucket = bucket
+        self.workers = workers
+
+    def load_manifest(self, prefix: str) -> PageManifest | None:
+        """Returns the manifest of a prefix, None if it was never completed."""
+        try:
+            data = get_object_bytes(
+                self.client, self.bucket, f"{prefix}/{MANIFEST_NAME}"
+            )
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                return None
+            raise
+        return PageManifest.from_json(data)
+
+    def save_manifest(self, manifest: PageManifest) -> None:
+        """Writes the manifest, which marks its prefix complete."""
+        put_object_bytes(
+            self.client,
+            self.bucket,
+            f"{manifest.prefix}/{MANIFEST_NAME}",
+            manifest.to_json(),
+            content_type="application/json",
+        )
+
+    def _upload_page(self, prefix: str, image_path: str) -> tuple[int, str]:
+        page_number = page_number_from_path(image_path)
+        image = Path(image_path).read_bytes()
+        put_object_bytes(
+            self.client,
+            self.bucket,
+            f"{prefix}/page_{page_number}.jpg",
+            image,
+            content_type="image/jpeg",
+        )
+        return page_number, hash_bytes(image)
+
+    def upload_pages(self, image_paths: Iterable[str], prefix: str) -> dict[int, str]:
+        """
+        Uploads page images as they are produced.
+
+        Args:
+            image_paths (Iterable[str]): Page image files, e.g. from `render_pages`.
+            prefix (str): Page store prefix.
+
+        Returns:
+            dict[int, str]: SHA-256 of every uploaded image, keyed by page number.
+        """
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="page-upload"
+        ) as pool:
+            futures = [
+                pool.submit(self._upload_page, prefix, image_path)
+                for image_path in image_paths
+            ]
+            return dict(future.result() for future in futures)
+
+    def _fetch_page(
+        self, manifest: PageManifest, page_number: int, extract_to: str
+    ) -> str:
+        image = get_object_bytes(
+            self.client, self.bucket, manifest.object_name(page_number)
+        )
+        if hash_bytes(image) != manifest.pages[page_number]:
+            raise ValueError(
+                f"Page {page_number} in {manifest.prefix} does not match its manifest"
+            )
+        image_path = page_image_path(extract_to, page_number)
+        image_path.write_bytes(image)
+        return str(image_path)
+
+    def fetch_pages(
+        self, manifest: PageManifest, page_numbers: list[int], extract_to: str
+    ) -> Iterator[str]:
+        """
+        Downloads page images in parallel and yields them in page order as they arrive.
+
+        Args:
+            manifest (PageManifest): Manifest of the prefix to read.
+            page_numbers (list[int]): Rendered pages to download.
+            extract_to (str): Local directory receiving the images.
+
+        Yields:
+            str: Local path of the next page image, in the order of `page_numbers`.
+
+        Raises:
+            ValueError: If a downloaded image does not match its manifest hash.
+        """
+        Path(extract_to).mkdir(parents=True, exist_ok=True)
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="page-fetch"
+        ) as pool:
+            yield from pool.map(
+                lambda page_number: self._fetch_page(manifest, page_number, extract_to),
+                page_numbers,
+            )
@@ -7,6 +7,7 @@ from helper.pipeline_settings.data_collection import (
 )
 import argparse
 from data_collection.extract_data import ocr_images
+from data_collection.rasterize_book import rasterize_book
 from data_collection.upload import store_extracted_texts_to_minio
 from helper.constants import DefaultConstants
 
@@ -17,6 +18,18 @@ def parse_args():
     parser = argparse.ArgumentParser(description="Run OCR ZenML pipeline")
     parser.add_argument("--bucket", type=str, required=True)
     parser.add_argument("--book_name", type=str, required=True)
+    parser.add_argument(
+        "--resume_run_id",
+        type=str,
+        default=None,
+        help="Resume the OCR checkpoints of an earlier pipeline run",
+    )
+    parser.add_argument(
+        "--run_name",
+        type=str,
+        default=None,
+        help="Name of the pipeline run, generated by ZenML when omitted",
+    )
     return parser.parse_args()
 
 
@@ -30,18 +43,25 @@ def parse_args():
 def ocr_pipeline(
     bucket: str,
     book_name: str,
+    resume_run_id: str | None = None,
 ):
     """Pipeline for performing OCR on images extracted from a zip file."""
     logger.info("Starting OCR pipeline")
-    data = ocr_images(
+    # CPU-only, reuses the stored pages when the book was rendered before
+    pages = rasterize_book(
+        endpoint=DefaultConstants.minio_endpoint.value,
+        bucket=bucket,
+        book_name=book_name,
+    )
+    results = ocr_images(
         endpoint=DefaultConstants.minio_endpoint.value,
         bucket=bucket,
         book_name=book_name,
+        pages=pages,
+        run_id=resume_run_id,
     )
-    logger.info(f"OCR results stored in MinIO bucket '{bucket}'.")
     store_extracted_texts_to_minio(
-        dataset=data,
-        bucket_name=bucket,
+        results=results,
         minio_endpoint=DefaultConstants.minio_endpoint.value,
         filename=book_name,
     )
@@ -52,7 +72,8 @@ def ocr_pipeline(
 
 if __name__ == "__main__":
     parser = parse_args()
-    ocr_pipeline(
+    ocr_pipeline.with_options(run_name=parser.run_name)(
         bucket=parser.bucket,
         book_name=parser.book_name,
+        resume_run_id=parser.resume_run_id,
     )
@@ -0,0 +1,90 @@
+"""
+Background Prefetching
+
+Runs a producer iterable (page rendering, image encoding, ...) on a background thread and
+hands its items to the consumer through a bounded queue, so producing and consuming overlap
+while memory stays capped at `max_buffered` items.
+"""
+
+import queue
+import threading
+from collections.abc import Iterable, Iterator
+from typing import TypeVar
+
+T = TypeVar("T")
+
+_DONE = object()
+_PUT_TIMEOUT = 0.5
+
+
+class _ProducerError:
+    """Carries an exception raised by the producer over to the consumer."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def prefetch(
+    iterable: Iterable[T], max_buffered: int, name: str = "prefetch"
+) -> Iterator[T]:
+    """
+    Iterate over `iterable` on a background thread, keeping at most `max_buffered`
+    items ready for the consumer.
+
+    The producer starts right away, not on the first `next()`, so items are ready
+    by the time the consumer gets to them. Exceptions raised by the producer are
+    re-raised in the consumer. Closing the returned generator early stops the
+    producer at its next item.
+
+    Args:
+        iterable: Producer of items, typically a generator
+        max_buffered: Maximum number of produced items waiting to be consumed
+        name: Name of the producer thread, shown in logs and thread dumps
+
+    Returns:
+        Generator of the items of `iterable`, in order
+    """
+    items = _consume(iterable, max_buffered, name)
+    # Run up to the first yield, which starts the producer thread
+    next(items)
+    return items
+
+
+def _consume(iterable: Iterable[T], max_buffered: int, name: str) -> Iterator[T]:
+    """Starts the producer, yields once, then yields the produced items."""
+    buffer: queue.Queue = queue.Queue(maxsize=max_buffered)
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        # Never block forever on a full queue the consumer has abandoned
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=_PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in iterable:
+                if not put(item):
+                    return
+        except BaseException as e:  # noqa: BLE001 - re-raised in the consumer
+            put(_ProducerError(e))
+        finally:
+            put(_DONE)
+
+    thread = threading.Thread(target=produce, name=name, daemon=True)
+    thread.start()
+    try:
+        yield None
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                break
+            if isinstance(item, _ProducerError):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
@@ -0,0 +1,170 @@
+"""
+Page Preprocessing
+
+CPU-side cleanup applied to every rendered page before it is saved and encoded, so the
+request carries no more pixels than the vLLM processor would keep anyway.
+
+Steps:
+    autocrop: Trims near-white margins, keeping a small border around the content.
+    grayscale: Converts pages without color to single-channel images.
+    fit_to_pixel_budget: Resizes to the size the server processor would resize to.
+
+Where the crop sat on the full render is kept in the JPEG comment of the saved page, so
+checks like the page filter can still measure against the whole page.
+
+Functions:
+    preprocess_page(image: Image.Image) -> Image.Image:
+        Runs every step on a rendered page.
+
+    page_box(image: Image.Image) -> PageBox | None:
+        Returns where a preprocessed page sat on its full render.
+"""
+
+import re
+from dataclasses import dataclass
+
+from PIL import Image, ImageChops
+
+from data_collection.packing import MAX_PIXELS, MIN_PIXELS, smart_resize
+
+# Luminance above which a pixel counts as paper
+WHITE_THRESHOLD = 245
+# Border kept around the content after cropping, in pixels
+CROP_MARGIN = 16
+# Largest channel spread still treated as gray, scans are rarely perfectly neutral
+COLOR_TOLERANCE = 12
+# Analysis runs on a reduced copy of the page
+ANALYSIS_REDUCTION = 4
+# Crop recorded in the JPEG comment of a saved page, see `PageBox.comment`
+PAGE_BOX_COMMENT = re.compile(r"page_box=(\d+),(\d+),(\d+),(\d+);page_size=(\d+),(\d+)")
+
+
+@dataclass
+class PageBox:
+    """Region (left, top, right, bottom) a page was cropped to and the full render size."""
+
+    box: tuple[int, int, int, int]
+    page_size: tuple[int, int]
+
+    def comment(self) -> str:
+        return "page_box={},{},{},{};page_size={},{}".format(*self.box, *self.page_size)
+
+
+def crop_box(
+    image: Image.Image,
+    threshold: int = WHITE_THRESHOLD,
+    margin: int = CROP_MARGIN,
+) -> tuple[int, int, int, int]:
+    """
+    Returns the box of the page content plus `margin`, the whole page if it has none.
+
+    Args:
+        image (Image.Image): Rendered page.
+        threshold (int): Luminance above which a pixel is considered background.
+        margin (int): Border kept around the detected content.
+
+    Returns:
+        tuple[int, int, int, int]: (left, top, right, bottom) of the region to keep.
+    """
+    reduced = image.convert("L").reduce(ANALYSIS_REDUCTION)
+    content = reduced.point(lambda p: 255 if p < threshold else 0)
+    bbox = content.getbbox()
+    if bbox is None:
+        return 0, 0, image.width, image.height
+    left, top, right, bottom = (v * ANALYSIS_REDUCTION for v in bbox)
+    return (
+        max(0, left - margin),
+        max(0, top - margin),
+        min(image.width, right + margin),
+        min(image.height, bottom + margin),
+    )
+
+
+def is_grayscale(image: Image.Image, tolerance: int = COLOR_TOLERANCE) -> bool:
+    """
+    Returns True if no pixel's channels differ by more than `tolerance`.
+
+    Args:
+        image (Image.Image): Rendered page.
+        tolerance (int): Largest channel spread still treated as gray.
+
+    Returns:
+        bool: Whether the page can be stored as a single-channel image.
+    """
+    if image.mode in ("L", "1"):
+        return True
+    red, green, blue = image.convert("RGB").reduce(ANALYSIS_REDUCTION).split()
+    spread = ImageChops.lighter(
+        ImageChops.lighter(
+            ImageChops.difference(red, green), ImageChops.difference(green, blue)
+        ),
+        ImageChops.difference(red, blue),
+    )
+    return spread.getextrema()[1] <= tolerance
+
+
+def fit_to_pixel_budget(
+    image: Image.Image,
+    min_pixels: int = MIN_PIXELS,
+    max_pixels: int = MAX_PIXELS,
+) -> Image.Image:
+    """
+    Downscales a page to the size the server processor would resize it to.
+
+    Pages already within the budget are left alone, they are never upscaled here.
+
+    Args:
+        image (Image.Image): Rendered page.
+        min_pixels (int): Server processor lower bound.
+        max_pixels (int): Server processor upper bound.
+
+    Returns:
+        Image.Image: Resized page.
+    """
+    height, width = smart_resize(
+        image.height, image.width, min_pixels=min_pixels, max_pixels=max_pixels
+    )
+    if height * width >= image.height * image.width:
+        return image
+    return image.resize((width, height), Image.Resampling.LANCZOS)
+
+
+def preprocess_page(image: Image.Image) -> Image.Image:
+    """
+    Autocrops, grayscales and downscales a rendered page. The crop is recorded in the
+    JPEG comment the page is saved with, see `page_box`.
+
+    Args:
+        image (Image.Image): Rendered page.
+
+    Returns:
+        Image.Image: Page ready to be saved and encoded.
+    """
+    geometry = PageBox(box=crop_box(image), page_size=image.size)
+    if geometry.box != (0, 0, *image.size):
+        image = image.crop(geometry.box)
+    if is_grayscale(image):
+        image = image.convert("L")
+    image = fit_to_pixel_budget(image)
+    image.info["comment"] = geometry.comment()
+    return image
+
+
+def page_box(image: Image.Image) -> PageBox | None:
+    """
+    Returns where a page saved by the rasterizer sat on its full render.
+
+    Args:
+        image (Image.Image): Page opened from disk.
+
+    Returns:
+        PageBox | None: Crop of the page, None if it was not preprocessed.
+    """
+    comment = image.info.get("comment", b"")
+    if isinstance(comment, bytes):
+        comment = comment.decode("ascii", errors="ignore")
+    match = PAGE_BOX_COMMENT.fullmatch(comment)
+    if match is None:
+        return None
+    values = tuple(int(v) for v in match.groups())
+    return PageBox(box=values[:4], page_size=values[4:])
@@ -0,0 +1,286 @@
+"""
+Rasterization Engine
+
+This module renders PDF pages to JPEG files through a pluggable backend and spreads the
+page range across a process pool so rendering uses every CPU the step pod requests.
+
+Backends:
+    pdf2image: Shells out to poppler's pdftoppm (the historical default).
+    pypdfium2: Renders in-process with PDFium, usually faster and lighter on memory.
+
+Functions:
+    get_backend(name: str) -> RasterBackend:
+        Returns an instance of the named backend.
+
+    get_page_count(pdf_path: str, backend: str) -> int:
+        Returns the number of pages in a PDF without rendering it.
+
+    render_pages(
+        pdf_path: str,
+        extract_to: str,
+        backend: str,
+        dpi: int,
+        workers: int,
+        pages_per_task: int,
+        page_numbers: Iterable[int] | None,
+        preprocess: bool
+    ) -> Iterator[str]:
+        Renders a PDF in parallel page ranges, yielding image paths in page order.
+        Pages are autocropped and fitted to the model's pixel budget on the way.
+"""
+
+import itertools
+import multiprocessing
+import re
+from abc import ABC, abstractmethod
+from collections import deque
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pypdfium2 as pdfium
+from pdf2image import convert_from_path, pdfinfo_from_path
+from PIL import Image
+
+from data_collection.preprocess import preprocess_page
+
+DEFAULT_DPI = 300
+DEFAULT_BACKEND = "pdf2image"
+# Upper bound on decoded pages a single worker holds in memory at once
+PAGES_PER_RENDER = 8
+RASTER_WORKERS = 4  # matches the step pod CPU request
+JPEG_QUALITY = 90
+
+
+class RasterBackend(ABC):
+    """Renders page ranges of a PDF to PIL images."""
+
+    name: str
+
+    @abstractmethod
+    def page_count(self, pdf_path: str) -> int:
+        """Returns the number of pages in the PDF."""
+
+    @abstractmethod
+    def render_range(
+        self, pdf_path: str, first_page: int, last_page: int, dpi: int
+    ) -> Iterator[Image.Image]:
+        """Yields pages `first_page`..`last_page` (1-based, inclusive) in order."""
+
+
+class Pdf2ImageBackend(RasterBackend):
+    """poppler/pdftoppm backend via pdf2image."""
+
+    name = "pdf2image"
+
+    def page_count(self, pdf_path: str) -> int:
+        return int(pdfinfo_from_path(pdf_path)["Pages"])
+
+    def render_range(
+        self, pdf_path: str, first_page: int, last_page: int, dpi: int
+    ) -> Iterator[Image.Image]:
+        pages = convert_from_path(
+            pdf_path, dpi=dpi, first_page=first_page, last_page=last_page
+        )
+        while pages:
+            # Hand each page over as soon as possible so the caller can release it
+            yield pages.pop(0)
+
+
+class PdfiumBackend(RasterBackend):
+    """PDFium backend via pypdfium2, renders one page at a time."""
+
+    name = "pypdfium2"
+
+    def page_count(self, pdf_path: str) -> int:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            return len(pdf)
+        finally:
+            pdf.close()
+
+    def render_range(
+        self, pdf_path: str, first_page: int, last_page: int, dpi: int
+    ) -> Iterator[Image.Image]:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            for index in range(first_page - 1, last_page):
+                page = pdf[index]
+                try:
+                    bitmap = page.render(scale=dpi / 72)
+                    yield bitmap.to_pil()
+                finally:
+                    page.close()
+        finally:
+            pdf.close()
+
+
+BACKENDS: dict[str, type[RasterBackend]] = {
+    Pdf2ImageBackend.name: Pdf2ImageBackend,
+    PdfiumBackend.name: PdfiumBackend,
+}
+
+
+def get_backend(name: str) -> RasterBackend:
+    """
+    Returns an instance of the named rasterization backend.
+
+    Args:
+        name (str): One of the keys of `BACKENDS`.
+
+    Returns:
+        RasterBackend: Backend instance.
+
+    Raises:
+        ValueError: If the backend is unknown.
+    """
+    if name not in BACKENDS:
+        raise ValueError(
+            f"Unknown rasterization backend '{name}'. Choose from {sorted(BACKENDS)}"
+        )
+    return BACKENDS[name]()
+
+
+def get_page_count(pdf_path: str, backend: str = DEFAULT_BACKEND) -> int:
+    """
+    Returns the number of pages in a PDF without rendering it.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        backend (str): Backend used to read the document.
+
+    Returns:
+        int: Number of pages.
+    """
+    return get_backend(backend).page_count(pdf_path)
+
+
+def page_image_path(extract_to: str, page_number: int) -> Path:
+    """Returns the image path for a 1-based page number."""
+    return Path(extract_to) / f"page_{page_number}.jpg"
+
+
+def page_number_from_path(image_path: str) -> int:
+    """Returns the 1-based page number embedded in an image path, -1 if there is none."""
+    match = re.search(r"page_(\d+)", Path(image_path).name)
+    return int(match.group(1)) if match else -1
+
+
+def page_ranges(
+    page_numbers: Iterable[int], pages_per_task: int
+) -> Iterator[tuple[int, int]]:
+    """
+    Groups sorted page numbers into runs of consecutive pages of at most
+    `pages_per_task` pages.
+
+    Yields:
+        tuple[int, int]: (first_page, last_page), inclusive.
+    """
+    first_page = last_page = None
+    for page_number in page_numbers:
+        if (
+            first_page is not None
+            and page_number == last_page + 1
+            and page_number - first_page < pages_per_task
+        ):
+            last_page = page_number
+            continue
+        if first_page is not None:
+            yield first_page, last_page
+        first_page = last_page = page_number
+    if first_page is not None:
+        yield first_page, last_page
+
+
+def _render_range_to_files(
+    backend: str,
+    pdf_path: str,
+    extract_to: str,
+    first_page: int,
+    last_page: int,
+    dpi: int,
+    preprocess: bool = True,
+) -> list[str]:
+    """
+    Renders a page range and saves every page to disk. Runs inside a pool worker,
+    so only file paths, never decoded images, cross the process boundary.
+    """
+    image_paths = []
+    pages = get_backend(backend).render_range(pdf_path, first_page, last_page, dpi)
+    for page_number, page in enumerate(pages, first_page):
+        image_path = page_image_path(extract_to, page_number)
+        output = preprocess_page(page) if preprocess else page
+        output.save(image_path, "JPEG", quality=JPEG_QUALITY)
+        output.close()
+        page.close()
+        image_paths.append(str(image_path))
+    return image_paths
+
+
+def render_pages(
+    pdf_path: str,
+    extract_to: str,
+    backend: str = DEFAULT_BACKEND,
+    dpi: int = DEFAULT_DPI,
+    workers: int = RASTER_WORKERS,
+    pages_per_task: int = PAGES_PER_RENDER,
+    page_numbers: Iterable[int] | None = None,
+    preprocess: bool = True,
+) -> Iterator[str]:
+    """
+    Renders a PDF to JPEG files, splitting the page range across a process pool.
+
+    Page ranges of `pages_per_task` are submitted to `workers` processes with a
+    lookahead of two ranges per worker, and finished ranges are yielded strictly in
+    page order. Memory is bounded by `workers * pages_per_task` decoded pages.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        extract_to (str): Directory to save the extracted images.
+        backend (str): Rasterization backend name.
+        dpi (int): Rendering resolution.
+        workers (int): Number of rendering processes, 1 renders in-process.
+        pages_per_task (int): Number of pages rendered per task.
+        page_numbers (Iterable[int] | None): Sorted 1-based pages to render, all
+            pages when None.
+        preprocess (bool): Autocrop, grayscale and downscale every page to the
+            model's pixel budget before saving it, see `preprocess_page`.
+
+    Yields:
+        str: File path of the next extracted image, in page order.
+    """
+    Path(extract_to).mkdir(parents=True, exist_ok=True)
+    if page_numbers is None:
+        page_numbers = range(1, get_page_count(pdf_path, backend=backend) + 1)
+    tasks = page_ranges(page_numbers, pages_per_task)
+
+    if workers <= 1:
+        for first_page, last_page in tasks:
+            yield from _render_range_to_files(
+                backend, pdf_path, extract_to, first_page, last_page, dpi, preprocess
+            )
+        return
+
+    # spawn: the caller may already be running threads (e.g. the OCR event loop)
+    with ProcessPoolExecutor(
+        max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+    ) as pool:
+
+        def submit(page_range: tuple[int, int]):
+            return pool.submit(
+                _render_range_to_files,
+                backend,
+                pdf_path,
+                extract_to,
+                *page_range,
+                dpi,
+                preprocess,
+            )
+
+        pending = deque(submit(r) for r in itertools.islice(tasks, workers * 2))
+        while pending:
+            image_paths = pending.popleft().result()
+            next_range = next(tasks, None)
+            if next_range is not None:
+                pending.append(submit(next_range))
+            yield from image_paths
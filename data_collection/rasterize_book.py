@@ -0,0 +1,247 @@
+"""
+Rasterize Step
+
+CPU-only ZenML step that turns a book into the page images the OCR step consumes. It
+downloads the PDF, reads the pages that carry a usable text layer, renders and normalizes
+the others and writes them to the page store in MinIO.
+
+The page store prefix is content-addressed, so rasterizing a book that was already
+rendered with the same settings only downloads and hashes the PDF. Re-OCRing a book with
+another model or prompt reuses the stored pages as they are.
+
+Both steps send the vLLM deployment a warm-up request before rendering, so a model
+scaled to zero is coming up while the book is rendered rather than once OCR starts.
+
+Functions:
+    rasterize_to_page_store(
+        endpoint: str,
+        bucket: str,
+        book_name: str,
+        raster_backend: str,
+        raster_workers: int,
+        dpi: int,
+        preprocess: bool,
+        use_text_layer: bool,
+        cache_downloads: bool
+    ) -> PageStoreReference:
+        Renders a book into the page store, or finds an earlier rendering.
+
+    rasterize_book(
+        endpoint: str,
+        bucket: str,
+        book_name: str,
+        raster_backend: str,
+        raster_workers: int,
+        dpi: int,
+        preprocess: bool,
+        use_text_layer: bool,
+        cache_downloads: bool
+    ) -> PageStoreReference:
+        ZenML step that renders a book into the page store and returns its location.
+
+    rasterize_books(endpoint: str, bucket: str, book_names: list[str]) -> list[PageStoreReference]:
+        ZenML step that renders several books one after the other.
+"""
+
+from zenml import step
+
+from data_collection.artifacts import (
+    PageStoreReference,
+    PageStoreReferenceMaterializer,
+)
+from data_collection.ocr import wake_model
+from data_collection.page_store import (
+    PageManifest,
+    PageStore,
+    hash_file,
+    render_settings_key,
+)
+from data_collection.rasterize import (
+    DEFAULT_BACKEND,
+    DEFAULT_DPI,
+    JPEG_QUALITY,
+    RASTER_WORKERS,
+    get_page_count,
+    render_pages,
+)
+from data_collection.text_layer import probe_text_layers
+from helper.logger import setup_logger
+from helper.minio import DOWNLOAD_CACHE_DIR, download_from_minio, get_minio_client
+from helper.minio_paths import get_books_path, get_page_store_path
+from helper.pipeline_settings.data_collection import rasterize_operator_settings
+
+logger = setup_logger(__name__)
+
+
+def rasterize_to_page_store(
+    endpoint: str,
+    bucket: str,
+    book_name: str,
+    raster_backend: str = DEFAULT_BACKEND,
+    raster_workers: int = RASTER_WORKERS,
+    dpi: int = DEFAULT_DPI,
+    preprocess: bool = True,
+    use_text_layer: bool = True,
+    cache_downloads: bool = True,
+) -> PageStoreReference:
+    """
+    Renders a book into the page store, reusing an earlier rendering of the same PDF
+    with the same settings.
+
+    Args:
+        endpoint (str): MinIO endpoint URL.
+        bucket (str): MinIO bucket holding the book and the page store.
+        book_name (str): Name of the book.
+        raster_backend (str): Rasterization backend, "pdf2image" or "pypdfium2".
+        raster_workers (int): Number of processes used to render pages.
+        dpi (int): Rendering resolution.
+        preprocess (bool): Autocrop, grayscale and fit pages to the model's pixel
+            budget, see `preprocess_page`.
+        use_text_layer (bool): Store the text of pages that carry a usable text layer
+            instead of rendering them.
+        cache_downloads (bool): Keep the PDF in the node-local download cache.
+
+    Returns:
+        PageStoreReference: Location of the rendered pages and their manifest.
+    """
+    pdf_path = download_from_minio(
+        endpoint=endpoint,
+        bucket=bucket,
+        minio_path=get_books_path(book_name=book_name),
+        local_path=f"/tmp/{book_name}.pdf",
+        cache_dir=DOWNLOAD_CACHE_DIR if cache_downloads else None,
+    )
+    settings = {
+        "backend": raster_backend,
+        "dpi": dpi,
+        "preprocess": preprocess,
+        "jpeg_quality": JPEG_QUALITY,
+        "text_layer": use_text_layer,
+    }
+    pdf_sha256 = hash_file(pdf_path)
+    prefix = get_page_store_path(pdf_sha256, render_settings_key(settings))
+    store = PageStore(get_minio_client(endpoint), bucket)
+
+    manifest = store.load_manifest(prefix)
+    if manifest is not None:
+        logger.info(f"{book_name} is already rendered at {prefix}, reusing it")
+    else:
+        num_pages = get_page_count(pdf_path, backend=raster_backend)
+        all_pages = range(1, num_pages + 1)
+        text_layers = probe_text_layers(pdf_path, all_pages) if use_text_layer else {}
+        image_paths = render_pages(
+            pdf_path=pdf_path,
+            extract_to=f"/tmp/{book_name}_images",
+            backend=raster_backend,
+            dpi=dpi,
+            workers=raster_workers,
+            page_numbers=[p for p in all_pages if p not in text_layers],
+            preprocess=preprocess,
+        )
+        manifest = PageManifest(
+            prefix=prefix,
+            pdf_sha256=pdf_sha256,
+            settings=settings,
+            num_pages=num_pages,
+            pages=store.upload_pages(image_paths, prefix),
+            text_layers=text_layers,
+        )
+        store.save_manifest(manifest)
+        logger.info(
+            f"Rendered {len(manifest.pages)} pages of {book_name} to {prefix}, "
+            f"{len(text_layers)} read from the text layer"
+        )
+
+    return PageStoreReference(
+        bucket=bucket,
+        book_name=book_name,
+        prefix=prefix,
+        num_pages=manifest.num_pages,
+        rendered_pages=len(manifest.pages),
+        text_layer_pages=len(manifest.text_layers),
+    )
+
+
+@step(
+    enable_step_logs=True,
+    enable_cache=False,
+    name="rasterize_book",
+    output_materializers=PageStoreReferenceMaterializer,
+    settings={"orchestrator": rasterize_operator_settings},
+)
+def rasterize_book(
+    endpoint: str,
+    bucket: str,
+    book_name: str,
+    raster_backend: str = DEFAULT_BACKEND,
+    raster_workers: int = RASTER_WORKERS,
+    dpi: int = DEFAULT_DPI,
+    preprocess: bool = True,
+    use_text_layer: bool = True,
+    cache_downloads: bool = True,
+) -> PageStoreReference:
+    """
+    ZenML step that renders a book into the page store, see `rasterize_to_page_store`.
+
+    Returns:
+        PageStoreReference: Location of the rendered pages and their manifest.
+    """
+    # Wake the model up now so its cold start overlaps with rendering
+    wake_model()
+    return rasterize_to_page_store(
+        endpoint=endpoint,
+        bucket=bucket,
+        book_name=book_name,
+        raster_backend=raster_backend,
+        raster_workers=raster_workers,
+        dpi=dpi,
+        preprocess=preprocess,
+        use_text_layer=use_text_layer,
+        cache_downloads=cache_downloads,
+    )
+
+
+@step(
+    enable_step_logs=True,
+    enable_cache=False,
+    name="rasterize_books",
+    settings={"orchestrator": rasterize_operator_settings},
+)
+def rasterize_books(
+    endpoint: str,
+    bucket: str,
+    book_names: list[str],
+    raster_backend: str = DEFAULT_BACKEND,
+    raster_workers: int = RASTER_WORKERS,
+    use_text_layer: bool = True,
+) -> list[PageStoreReference]:
+    """
+    ZenML step that renders several books into the page store one after the other,
+    each with every worker, see `rasterize_to_page_store`.
+
+    Args:
+        endpoint (str): MinIO endpoint URL.
+        bucket (str): MinIO bucket holding the books and the page store.
+        book_names (list[str]): Names of the books.
+        raster_backend (str): Rasterization backend, "pdf2image" or "pypdfium2".
+        raster_workers (int): Number of processes used to render pages.
+        use_text_layer (bool): Store the text of pages that carry a usable text layer
+            instead of rendering them.
+
+    Returns:
+        list[PageStoreReference]: Page store of every book, in the order of
+        `book_names`.
+    """
+    # Wake the model up now so its cold start overlaps with rendering
+    wake_model()
+    return [
+        rasterize_to_page_store(
+            endpoint=endpoint,
+            bucket=bucket,
+            book_name=book_name,
+            raster_backend=raster_backend,
+            raster_workers=raster_workers,
+            use_text_layer=use_text_layer,
+        )
+        for book_name in book_names
+    ]
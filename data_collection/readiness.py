@@ -0,0 +1,175 @@
+"""
+Model Readiness
+
+This module decides when the vLLM deployment behind the router can take OCR traffic using
+lightweight probes instead of full vision generations.
+
+Probes, cheapest first:
+    health: GET <router>/health, the router process is up.
+    models: GET <router>/v1/models lists the model, an engine has been discovered.
+    completion: A 1-token text completion succeeds, the engine is actually serving.
+
+An optional OCR probe can replace the completion probe. Its output is real OCR output, so
+callers can reuse it instead of sending the same pages again, unless it was cut off at the
+output budget.
+"""
+
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+import httpx
+from openai import OpenAI, OpenAIError
+
+from helper.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MAX_WARMUP_WAIT = 600
+PROBE_TIMEOUT = 10
+COMPLETION_PROBE_TIMEOUT = 60
+
+
+@dataclass
+class ReadinessResult:
+    """Outcome of waiting for the model."""
+
+    ready: bool
+    probe: str | None = None  # probe that confirmed readiness
+    elapsed: float = 0.0
+    ocr_result: str | None = None  # real OCR output produced while probing
+
+
+def router_root(base_url: str) -> str:
+    """Strip the OpenAI `/v1` suffix from a router base URL."""
+    base_url = base_url.rstrip("/")
+    return base_url.removesuffix("/v1")
+
+
+def probe_health(base_url: str, timeout: float = PROBE_TIMEOUT) -> bool:
+    """Return True if the router answers its health endpoint."""
+    response = httpx.get(f"{router_root(base_url)}/health", timeout=timeout)
+    return response.status_code == 200
+
+
+def probe_models(
+    base_url: str, model_name: str, timeout: float = PROBE_TIMEOUT
+) -> bool:
+    """Return True if the router lists `model_name` among its served models."""
+    response = httpx.get(f"{router_root(base_url)}/v1/models", timeout=timeout)
+    if response.status_code != 200:
+        return False
+    return any(
+        model.get("id") == model_name for model in response.json().get("data", [])
+    )
+
+
+def probe_completion(
+    client: OpenAI, model_name: str, timeout: float = COMPLETION_PROBE_TIMEOUT
+) -> bool:
+    """Send a 1-token text completion through the router.
+    Any request reaching the router counts as traffic, so this also serves as the
+    scale-from-zero signal for the vLLM deployment.
+    Args:
+        model_name: Served model name
+    """
+    response = client.with_options(
+        timeout=timeout, max_retries=0
+    ).chat.completions.create(
+        model=model_name,
+        messages=[{"role": "user", "content": "ping"}],
+        temperature=0.0,
+        max_tokens=1,
+    )
+    return len(response.choices) > 0
+
+
+def send_warmup_request(client: OpenAI, model_name: str) -> None:
+    """Fire one completion so a deployment scaled to zero starts coming up."""
+    try:
+        probe_completion(client=client, model_name=model_name)
+    except OpenAIError as e:
+        logger.info(f"Warm-up request sent, model not serving yet: {e}")
+
+
+def wait_for_model_ready(
+    client: OpenAI,
+    model_name: str,
+    max_wait: int = MAX_WARMUP_WAIT,
+    check_interval: int = 5,
+    ocr_probe: Callable[[], tuple[str | None, str | None]] | None = None,
+) -> ReadinessResult:
+    """
+    Poll the router with the cheap probes until the model serves requests.
+
+    A warm-up request is fired first so a deployment scaled to zero starts coming
+    up right away, while the probes below only observe it.
+
+    Args:
+        client: Sync OpenAI client pointed at the router
+        model_name: Served model name
+        max_wait: Maximum time to wait, in seconds
+        check_interval: Time between polls, in seconds
+        ocr_probe: Optional callable running a real OCR request and returning its
+            text and finish reason, used instead of the completion probe once the
+            model is listed; its output is kept unless it was truncated
+
+    Returns:
+        ReadinessResult
+    """
+    start_time = time.time()
+    base_url = str(client.base_url)
+    logger.info(f"Waiting for model '{model_name}' to be ready...")
+
+    send_warmup_request(client, model_name)
+
+    while (time.time() - start_time) < max_wait:
+        try:
+            if not probe_health(base_url):
+                logger.info("Router is not healthy yet")
+            elif not probe_models(base_url, model_name):
+                logger.info(f"Router does not list '{model_name}' yet")
+            else:
+                probe, ocr_result = "completion", None
+                if ocr_probe is not None:
+                    probe = "ocr"
+                    ocr_result, finish_reason = ocr_probe()
+                    is_up = bool(ocr_result)
+                    if finish_reason == "length":
+                        # The model serves, but the output ran out of tokens, the
+                        # dispatcher sends the pages again and splits them
+                        logger.warning("OCR probe output was truncated, discarding it")
+                        ocr_result = None
+                else:
+                    is_up = probe_completion(client=client, model_name=model_name)
+                if is_up:
+                    elapsed = time.time() - start_time
+                    logger.info(
+                        f"✓ Model '{model_name}' is ready! "
+                        f"(took {elapsed:.1f}s, {probe} probe)"
+                    )
+                    return ReadinessResult(
+                        ready=True,
+                        probe=probe,
+                        elapsed=elapsed,
+                        ocr_result=ocr_result,
+                    )
+                logger.warning(f"{model_name} is not up yet")
+
+        except Exception as e:  # noqa: BLE001 - any failure means not ready yet
+            logger.info(f"Model not ready: {e}. Waiting for pod to start...")
+
+        # Wait before next check
+        elapsed = time.time() - start_time
+        logger.info(
+            f"Waiting... ({elapsed:.0f}s / {max_wait}s) - "
+            f"next check in {check_interval}s"
+        )
+        time.sleep(check_interval)
+
+    # Timeout
+    logger.error(
+        f"✗ Timeout: Model did not become ready within {max_wait}s. "
+        f"Pod may have failed to start."
+    )
+    return ReadinessResult(ready=False, elapsed=time.time() - start_time)
@@ -0,0 +1,202 @@
+"""
+Page Records
+
+Turns request-level OCR results into one record per page, so downstream jobs can read
+and filter pages without re-parsing multi-page blobs.
+
+A multi-page output is split on the `PAGE_BREAK` the prompt asks for after every page,
+so pages without a printed number split as well. Where the model left breaks out, the
+`<page_number>` tags it was also asked for are used; a split on tags is only trusted
+when they consistently sit at the top (headers) or the bottom (footers) of the pages.
+The dispatcher re-OCRs only the pages a split leaves without text, and every page one
+by one when the output cannot be divided at all.
+
+Functions:
+    split_on_tags(text: str) -> list[str]:
+        Splits a text holding one or more pages on their `<page_number>` tags.
+
+    split_page_text(text: str, num_pages: int) -> list[str | None] | None:
+        Splits a multi-page output into per-page texts.
+
+    page_record(book: str, page: int, ...) -> dict:
+        Builds the record of one page.
+
+    page_records(result: dict, book: str) -> list[dict]:
+        Splits a request-level result into page records.
+"""
+
+import re
+
+from data_collection.rasterize import page_number_from_path
+
+PAGE_BREAK = "<page_break>"
+PAGE_TAG = re.compile(r"<page_number>.*?</page_number>", re.DOTALL)
+# Text allowed before the first header tag or after the last footer tag, e.g. a
+# running title printed next to the page number
+MAX_STRAY_CHARS = 80
+
+
+def split_on_tags(text: str) -> list[str]:
+    """
+    Splits a text holding one or more pages on their `<page_number>` tags.
+
+    Args:
+        text (str): OCR output of consecutive pages.
+
+    Returns:
+        list[str]: One text per tag, or the text alone if the tags do not delimit
+        pages reliably.
+    """
+    tags = list(PAGE_TAG.finditer(text))
+    if len(tags) < 2:
+        return [text]
+    lead = text[: tags[0].start()].strip()
+    tail = text[tags[-1].end() :].strip()
+    if len(tail) <= MAX_STRAY_CHARS < len(lead):
+        # Footers: every page ends with its number
+        bounds = [tag.end() for tag in tags[:-1]]
+    elif len(lead) <= MAX_STRAY_CHARS < len(tail):
+        # Headers: every page starts with its number
+        bounds = [tag.start() for tag in tags[1:]]
+    else:
+        return [text]
+    starts = [0] + bounds
+    ends = bounds + [len(text)]
+    return [text[start:end].strip() for start, end in zip(starts, ends)]
+
+
+def split_page_text(text: str, num_pages: int) -> list[str | None] | None:
+    """
+    Splits the output of a multi-page request into per-page texts.
+
+    Args:
+        text (str): OCR output of the request.
+        num_pages (int): Number of pages in the request.
+
+    Returns:
+        list[str | None] | None: One text per page, in order, None for a page the
+        output has nothing for; None if the output cannot be divided into the pages.
+    """
+    if num_pages == 1:
+        # Nothing to split, only the break the page ends with is dropped
+        return [text.strip().removesuffix(PAGE_BREAK).rstrip() if text else text]
+    pieces = [piece.strip() for piece in (text or "").split(PAGE_BREAK)]
+    # The break after the last page leaves an empty piece
+    if len(pieces) > 1 and not pieces[-1]:
+        pieces.pop()
+    if len(pieces) < num_pages:
+        # Breaks left out, or an output from before they were asked for
+        pieces = [page for piece in pieces for page in split_on_tags(piece)]
+    if len(pieces) != num_pages:
+        return None
+    return [piece or None for piece in pieces]
+
+
+def apportion(total: int, weights: list[int]) -> list[int]:
+    """Splits an integer total across pages in proportion to `weights`."""
+    weight_sum = sum(weights)
+    if not weight_sum:
+        weights, weight_sum = [1] * len(weights), len(weights)
+    shares = [total * weight // weight_sum for weight in weights]
+    shares[-1] += total - sum(shares)
+    return shares
+
+
+def page_record(
+    book: str,
+    page: int,
+    text: str | None = None,
+    status: str = "success",
+    source: str = "ocr",
+    latency: float = 0.0,
+    prompt_tokens: int = 0,
+    completion_tokens: int = 0,
+    request_pages: int = 1,
+    finish_reason: str | None = None,
+    error: str | None = None,
+    cached: bool = False,
+    duplicate_of: int | None = None,
+) -> dict:
+    """
+    Builds the record of one page.
+
+    Args:
+        book (str): Book name.
+        page (int): 1-based page number.
+        text (str | None): Extracted text.
+        status (str): success, failed, truncated, unsplit, blank or duplicate.
+        source (str): ocr, text_layer or page_filter.
+        latency (float): Duration of the request the page was part of, in seconds.
+        prompt_tokens (int): Prompt tokens attributed to the page.
+        completion_tokens (int): Completion tokens attributed to the page.
+        request_pages (int): Number of pages in that request.
+        finish_reason (str | None): finish_reason of the request.
+        error (str | None): Error of a failed request.
+        cached (bool): Whether the text came from the OCR cache.
+        duplicate_of (int | None): Page this one repeats.
+
+    Returns:
+        dict: Page record.
+    """
+    return {
+        "book": book,
+        "page": page,
+        "text": text,
+        "status": status,
+        "source": source,
+        "latency": latency,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "request_pages": request_pages,
+        "finish_reason": finish_reason,
+        "error": error,
+        "cached": cached,
+        "duplicate_of": duplicate_of,
+    }
+
+
+def page_records(result: dict, book: str) -> list[dict]:
+    """
+    Splits a request-level result into page records. Prompt tokens are shared
+    evenly and completion tokens by text length.
+
+    Args:
+        result (dict): Result dict produced by the OCR dispatcher.
+        book (str): Book name.
+
+    Returns:
+        list[dict]: One record per page of the request, in page order.
+    """
+    pages = [page_number_from_path(path) for path in result["image_paths"]]
+    status = result["status"]
+    texts = [None] * len(pages)
+    if result["ocr_result"] is not None:
+        texts = split_page_text(result["ocr_result"], len(pages))
+        if texts is None:
+            # Only results the dispatcher did not redo, e.g. a warm-up probe
+            texts = [result["ocr_result"]] + [None] * (len(pages) - 1)
+            status = "unsplit"
+    prompt_tokens = apportion(result.get("prompt_tokens", 0), [1] * len(pages))
+    completion_tokens = apportion(
+        result.get("completion_tokens", 0), [len(text or "") for text in texts]
+    )
+    return [
+        page_record(
+            book=book,
+            page=page,
+            text=text,
+            status="unsplit" if text is None and status == "success" else status,
+            source=result.get("source", "ocr"),
+            latency=result.get("latency", 0.0),
+            prompt_tokens=prompt,
+            completion_tokens=completion,
+            request_pages=len(pages),
+            finish_reason=result.get("finish_reason"),
+            error=result["error"],
+            cached=result["cached"],
+            duplicate_of=result.get("duplicate_of"),
+        )
+        for page, text, prompt, completion in zip(
+            pages, texts, prompt_tokens, completion_tokens
+        )
+    ]
@@ -0,0 +1,191 @@
+"""
+Result Writer
+
+Streams page records into a zstd-compressed Parquet object in MinIO while the OCR run is
+still going, instead of collecting a Dataset and writing a full temp copy at the end.
+
+Records are buffered until a row group is full and then written, and the Parquet bytes go
+through a pipe straight into a multipart upload. Memory is bounded by one row group plus
+one upload part, whatever the size of the book.
+
+Functions:
+    upload_stream(client: Minio, bucket: str, object_name: str) -> BinaryIO:
+        Opens a writable stream whose bytes are uploaded to MinIO as they arrive.
+"""
+
+import os
+import threading
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import contextmanager
+from typing import BinaryIO
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from minio import Minio
+
+from helper.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Mirrors data_collection.records.page_record
+RECORD_SCHEMA = pa.schema(
+    [
+        ("book", pa.string()),
+        ("page", pa.int32()),
+        ("text", pa.large_string()),
+        ("status", pa.string()),
+        ("source", pa.string()),
+        ("latency", pa.float64()),
+        ("prompt_tokens", pa.int32()),
+        ("completion_tokens", pa.int32()),
+        ("request_pages", pa.int32()),
+        ("finish_reason", pa.string()),
+        ("error", pa.string()),
+        ("cached", pa.bool_()),
+        ("duplicate_of", pa.int32()),
+    ]
+)
+# A few MiB of text per row group
+ROW_GROUP_SIZE = 512
+COMPRESSION = "zstd"
+# Multipart part size, also the upload's read buffer
+UPLOAD_PART_SIZE = 16 * 1024 * 1024
+
+
+class _PipeReader:
+    """Read end of the upload pipe, fails at end of stream if the writer aborted."""
+
+    def __init__(self, fd: int, aborted: threading.Event):
+        self._file = os.fdopen(fd, "rb")
+        self._aborted = aborted
+
+    def read(self, size: int = -1) -> bytes:
+        data = self._file.read(size)
+        if (size < 0 or len(data) < size) and self._aborted.is_set():
+            raise OSError("Upload aborted by the writer")
+        return data
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+
+
+@contextmanager
+def upload_stream(
+    client: Minio,
+    bucket: str,
+    object_name: str,
+    content_type: str = "application/vnd.apache.parquet",
+) -> Iterator[BinaryIO]:
+    """
+    Opens a writable stream uploaded to MinIO as a multipart upload of unknown length.
+
+    The upload runs on a background thread reading the other end of a pipe, so a
+    slow upload applies back pressure to the writer instead of buffering the object.
+
+    Args:
+        client (Minio): MinIO client.
+        bucket (str): Destination bucket.
+        object_name (str): Destination object.
+        content_type (str): Content type of the object.
+
+    Yields:
+        BinaryIO: Stream to write the object's bytes to.
+
+    Raises:
+        Exception: Whatever the upload raised, once the stream is closed.
+    """
+    read_fd, write_fd = os.pipe()
+    aborted = threading.Event()
+    errors = []
+
+    def upload():
+        with _PipeReader(read_fd, aborted) as reader:
+            try:
+                client.put_object(
+                    bucket,
+                    object_name,
+                    reader,
+                    length=-1,
+                    part_size=UPLOAD_PART_SIZE,
+                    content_type=content_type,
+                )
+            except Exception as e:  # noqa: BLE001 - raised once the stream is closed
+                # Closing the read end makes the writer fail instead of blocking
+                errors.append(e)
+
+    uploader = threading.Thread(target=upload, name="minio-upload", daemon=True)
+    uploader.start()
+    writer = os.fdopen(write_fd, "wb")
+    written = False
+    try:
+        yield writer
+        written = True
+    except BrokenPipeError:
+        # The upload failed and closed its end, its error is raised below
+        written = True
+    finally:
+        if not written:
+            # The caller raised, never complete the upload with a truncated object
+            aborted.set()
+        try:
+            writer.close()
+        except BrokenPipeError:
+            pass
+        uploader.join()
+    if errors:
+        raise errors[0]
+
+
+class ParquetResultWriter:
+    """Thread-safe incremental Parquet writer of page records."""
+
+    def __init__(
+        self,
+        sink: BinaryIO,
+        schema: pa.Schema = RECORD_SCHEMA,
+        row_group_size: int = ROW_GROUP_SIZE,
+        compression: str = COMPRESSION,
+    ):
+        """
+        Args:
+            sink (BinaryIO): Writable stream, e.g. from `upload_stream`.
+            schema (pa.Schema): Schema of the records.
+            row_group_size (int): Records per row group.
+            compression (str): Parquet compression codec.
+        """
+        self.schema = schema
+        self.row_group_size = row_group_size
+        self._writer = pq.ParquetWriter(sink, schema, compression=compression)
+        # Records arrive from the dispatcher's callback threads
+        self._lock = threading.Lock()
+        self._buffer: list[dict] = []
+        self.num_rows = 0
+        self.status_counts: Counter[str] = Counter()
+
+    def write(self, records: list[dict]) -> None:
+        """Buffers records and writes every full row group."""
+        with self._lock:
+            self._buffer.extend(records)
+            while len(self._buffer) >= self.row_group_size:
+                self._flush(self._buffer[: self.row_group_size])
+                self._buffer = self._buffer[self.row_group_size :]
+
+    def _flush(self, records: list[dict]) -> None:
+        self._writer.write_table(
+            pa.Table.from_pylist(records, schema=self.schema),
+            row_group_size=self.row_group_size,
+        )
+        self.num_rows += len(records)
+        self.status_counts.update(record["status"] for record in records)
+
+    def close(self) -> None:
+        """Writes the last partial row group and the Parquet footer."""
+        with self._lock:
+            if self._buffer:
+                self._flush(self._buffer)
+                self._buffer = []
+            self._writer.close()
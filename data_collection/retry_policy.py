@@ -0,0 +1,256 @@
+"""
+Retry Policy
+
+Decides how a failed vLLM request is retried. Errors fall into three kinds:
+    transient: Connection drops, timeouts and 5xx answers, worth a few quick retries.
+    overload: 429 and 503 from the router or the engine. Retried patiently, honouring
+        `Retry-After`, and reported so the dispatcher sends fewer requests.
+    permanent: Our own `ValueError` for oversized batches, 400s such as a context
+        overflow and any other 4xx. The identical payload fails again, so it is never
+        retried, the dispatcher splits the chunk instead.
+
+Every request gets a deadline scaled to its number of images, so a stuck request is
+abandoned after minutes instead of waiting on the client default.
+
+A `CircuitBreaker` shared by all requests of a dispatcher opens after a run of
+consecutive transient or overload failures, i.e. when the router itself is unhealthy.
+While it is open no request is sent, then a single probe request decides whether
+dispatching resumes.
+
+Functions:
+    classify_error(error: BaseException) -> ErrorKind:
+        Returns how an error of a vLLM request should be handled.
+
+    is_retryable(error: BaseException) -> bool:
+        Returns True unless the error is permanent.
+
+    retry_after(error: BaseException) -> float | None:
+        Returns the delay a `Retry-After` header asks for, in seconds.
+
+    request_timeout(num_images: int) -> float:
+        Returns the deadline of a request with this many images.
+
+Classes:
+    ErrorKind:
+        Transient, overload or permanent.
+
+    wait_for_error:
+        Tenacity wait strategy backing off by error kind and `Retry-After`.
+
+    stop_for_error:
+        Tenacity stop strategy with an attempt budget per error kind.
+
+    CircuitBreaker:
+        Pauses dispatching while the router keeps failing.
+"""
+
+import asyncio
+import email.utils
+import random
+import time
+from enum import StrEnum
+
+from openai import APIConnectionError, APIStatusError
+from tenacity import RetryCallState
+
+from helper.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Request deadline, the engine decodes every page of a request in turn
+BASE_REQUEST_TIMEOUT = 60
+PER_IMAGE_TIMEOUT = 120
+MAX_REQUEST_TIMEOUT = 900
+OVERLOAD_STATUS_CODES = (429, 503)
+# Attempts per error kind, including the first one
+MAX_ATTEMPTS = {"transient": 3, "overload": 6, "permanent": 1}
+# Exponential backoff bounds per error kind, in seconds
+BACKOFF = {"transient": (2, 30), "overload": (5, 120)}
+# Consecutive failures that open the circuit, and how long it stays open
+FAILURE_THRESHOLD = 5
+RESET_TIMEOUT = 30
+MAX_RESET_TIMEOUT = 300
+BREAKER_POLL_INTERVAL = 0.5
+
+
+class ErrorKind(StrEnum):
+    TRANSIENT = "transient"
+    OVERLOAD = "overload"
+    PERMANENT = "permanent"
+
+
+def classify_error(error: BaseException) -> ErrorKind:
+    """
+    Returns how an error of a vLLM request should be handled.
+
+    Args:
+        error (BaseException): Error raised by the request.
+
+    Returns:
+        ErrorKind: Transient, overload or permanent.
+    """
+    if isinstance(error, APIStatusError):
+        if error.status_code in OVERLOAD_STATUS_CODES:
+            return ErrorKind.OVERLOAD
+        if error.status_code >= 500:
+            return ErrorKind.TRANSIENT
+        return ErrorKind.PERMANENT
+    # Includes timeouts
+    if isinstance(error, APIConnectionError):
+        return ErrorKind.TRANSIENT
+    # ValueError of oversized batches and anything unexpected
+    return ErrorKind.PERMANENT
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Returns True unless the error is permanent."""
+    return classify_error(error) is not ErrorKind.PERMANENT
+
+
+def retry_after(error: BaseException) -> float | None:
+    """
+    Returns the delay a `Retry-After` header of an error response asks for.
+
+    Args:
+        error (BaseException): Error raised by the request.
+
+    Returns:
+        float | None: Delay in seconds, None without a usable header.
+    """
+    if not isinstance(error, APIStatusError):
+        return None
+    value = error.response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(
+            0.0, email.utils.parsedate_to_datetime(value).timestamp() - time.time()
+        )
+    except (TypeError, ValueError):
+        return None
+
+
+def request_timeout(num_images: int) -> float:
+    """Returns the deadline of a request with `num_images` images, in seconds."""
+    return min(
+        MAX_REQUEST_TIMEOUT, BASE_REQUEST_TIMEOUT + PER_IMAGE_TIMEOUT * num_images
+    )
+
+
+class wait_for_error:
+    """
+    Tenacity wait strategy: exponential backoff with full jitter within the bounds of
+    the error kind, never shorter than what `Retry-After` asks for.
+    """
+
+    def __call__(self, retry_state: RetryCallState) -> float:
+        error = retry_state.outcome.exception()
+        low, high = BACKOFF.get(classify_error(error), BACKOFF["transient"])
+        delay = random.uniform(low, min(high, low * 2**retry_state.attempt_number))
+        return max(delay, retry_after(error) or 0.0)
+
+
+class stop_for_error:
+    """Tenacity stop strategy: stops once the error kind has used its attempts."""
+
+    def __call__(self, retry_state: RetryCallState) -> bool:
+        error = retry_state.outcome.exception()
+        if error is None:
+            return True
+        return retry_state.attempt_number >= MAX_ATTEMPTS[classify_error(error)]
+
+
+class CircuitBreaker:
+    """
+    Pauses dispatching while the router keeps failing.
+
+    closed: Requests go through, consecutive failures are counted.
+    open: No request goes through until the reset timeout has passed.
+    half_open: One probe request goes through. Its success closes the circuit, its
+        failure opens it again with twice the reset timeout.
+
+    A permanent error is an answer of the router, so it counts as a success.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = FAILURE_THRESHOLD,
+        reset_timeout: float = RESET_TIMEOUT,
+        max_reset_timeout: float = MAX_RESET_TIMEOUT,
+    ):
+        """
+        Args:
+            failure_threshold (int): Consecutive failures that open the circuit.
+            reset_timeout (float): Seconds the circuit first stays open.
+            max_reset_timeout (float): Longest the circuit stays open at once.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_reset_timeout = max_reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self._timeout = reset_timeout
+        self._opened_at = 0.0
+        self._probe_started = 0.0
+
+    def _reset_due(self) -> bool:
+        return time.monotonic() >= self._opened_at + self._timeout
+
+    def _allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        now = time.monotonic()
+        if self.state == "open" and self._reset_due():
+            self.state = "half_open"
+            self._probe_started = now
+            return True
+        # A probe that never reported, e.g. cancelled, is replaced
+        if (
+            self.state == "half_open"
+            and now - self._probe_started > MAX_REQUEST_TIMEOUT
+        ):
+            self._probe_started = now
+            return True
+        return False
+
+    async def wait_until_ready(self) -> None:
+        """Waits until the circuit is closed or due for its probe, without claiming it."""
+        while self.state == "open" and not self._reset_due():
+            await asyncio.sleep(BREAKER_POLL_INTERVAL)
+
+    async def acquire(self) -> None:
+        """Waits until a request may be sent, claiming the probe when half open."""
+        while not self._allow():
+            await asyncio.sleep(BREAKER_POLL_INTERVAL)
+
+    def record_success(self) -> None:
+        if self.state != "closed":
+            logger.info("vLLM router answers again, resuming dispatch")
+        self.state = "closed"
+        self.failures = 0
+        self._timeout = self.reset_timeout
+
+    def record_failure(self, error: BaseException) -> None:
+        """Counts a failed request, a permanent error means the router answered."""
+        if not is_retryable(error):
+            # Also releases a half open probe, which would otherwise block dispatch
+            self.record_success()
+            return
+        self.failures += 1
+        if self.state == "half_open":
+            self._timeout = min(self.max_reset_timeout, self._timeout * 2)
+            self._open(error)
+        elif self.state == "closed" and self.failures >= self.failure_threshold:
+            self._open(error)
+
+    def _open(self, error: BaseException) -> None:
+        self.state = "open"
+        self._opened_at = time.monotonic()
+        logger.warning(
+            f"vLLM router unhealthy after {self.failures} failures "
+            f"({type(error).__name__}), pausing dispatch for {self._timeout:.0f}s"
+        )
@@ -0,0 +1,93 @@
+import argparse
+
+from zenml import pipeline
+
+from data_collection.extract_data import ocr_images
+from data_collection.merge_shards import merge_ocr_shards
+from data_collection.rasterize_book import rasterize_book
+from data_collection.sharding import DEFAULT_NUM_SHARDS
+from data_collection.upload import store_extracted_texts_to_minio
+from helper.constants import DefaultConstants
+from helper.logger import setup_logger
+from helper.pipeline_settings.data_collection import (
+    docker_settings,
+    k8s_operator_settings,
+)
+
+logger = setup_logger(__name__)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run sharded OCR ZenML pipeline")
+    parser.add_argument("--bucket", type=str, required=True)
+    parser.add_argument("--book_name", type=str, required=True)
+    parser.add_argument(
+        "--num_shards",
+        type=int,
+        default=DEFAULT_NUM_SHARDS,
+        help="Number of page ranges OCR'd in parallel step pods",
+    )
+    parser.add_argument(
+        "--resume_run_id",
+        type=str,
+        default=None,
+        help="Resume the OCR checkpoints of an earlier pipeline run",
+    )
+    return parser.parse_args()
+
+
+@pipeline(
+    settings={
+        "docker": docker_settings,
+        "orchestrator": k8s_operator_settings,
+    },
+    name="sharded_ocr_pipeline",
+)
+def sharded_ocr_pipeline(
+    bucket: str,
+    book_name: str,
+    num_shards: int = DEFAULT_NUM_SHARDS,
+    resume_run_id: str | None = None,
+):
+    """Pipeline that OCRs page ranges of one book in parallel steps and merges them."""
+    logger.info(f"Starting sharded OCR pipeline with {num_shards} shards")
+    pages = rasterize_book(
+        endpoint=DefaultConstants.minio_endpoint.value,
+        bucket=bucket,
+        book_name=book_name,
+    )
+    # Shards only depend on the page store, so they run as concurrent step pods
+    shards = [
+        ocr_images(
+            endpoint=DefaultConstants.minio_endpoint.value,
+            bucket=bucket,
+            book_name=book_name,
+            pages=pages,
+            run_id=resume_run_id,
+            shard_index=shard_index,
+            num_shards=num_shards,
+            id=f"ocr_images_shard_{shard_index}",
+        )
+        for shard_index in range(num_shards)
+    ]
+    results = merge_ocr_shards(
+        shards=shards,
+        minio_endpoint=DefaultConstants.minio_endpoint.value,
+        bucket=bucket,
+        book_name=book_name,
+    )
+    store_extracted_texts_to_minio(
+        results=results,
+        minio_endpoint=DefaultConstants.minio_endpoint.value,
+        filename=book_name,
+    )
+
+
+if __name__ == "__main__":
+    parser = parse_args()
+    sharded_ocr_pipeline(
+        bucket=parser.bucket,
+        book_name=parser.book_name,
+        num_shards=parser.num_shards,
+        resume_run_id=parser.resume_run_id,
+    )
@@ -0,0 +1,99 @@
+"""
+Page Sharding
+
+Splits a book into contiguous page ranges OCR'd by parallel `ocr_images` steps, so one
+book can spread over several step pods and vLLM replicas, and merges the per-shard
+Parquet outputs back into a single object in page order.
+
+Every shard writes its own Parquet object and checkpoints under the run's shared prefix.
+Checkpoint objects are named by first page, so shards never collide; resume a sharded run
+with the same number of shards.
+
+Functions:
+    shard_range(num_pages: int, shard_index: int, num_shards: int) -> tuple[int, int] | None:
+        Returns the inclusive page range of a shard.
+
+    merge_parquet_objects(
+        client: Minio,
+        bucket: str,
+        object_names: list[str],
+        sink: BinaryIO
+    ) -> int:
+        Concatenates Parquet objects into `sink`, sorted by page within each object.
+"""
+
+from typing import BinaryIO
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from minio import Minio
+
+from data_collection.result_writer import COMPRESSION, RECORD_SCHEMA, ROW_GROUP_SIZE
+from helper.logger import setup_logger
+from helper.minio import get_object_bytes
+
+logger = setup_logger(__name__)
+
+DEFAULT_NUM_SHARDS = 4
+
+
+def shard_range(
+    num_pages: int, shard_index: int, num_shards: int
+) -> tuple[int, int] | None:
+    """
+    Returns the inclusive 1-based page range of a shard. Pages are split as evenly as
+    possible, the first `num_pages % num_shards` shards get one extra page.
+
+    Args:
+        num_pages (int): Number of pages in the book.
+        shard_index (int): 0-based shard index.
+        num_shards (int): Total number of shards.
+
+    Returns:
+        tuple[int, int] | None: (first_page, last_page), None when the book has fewer
+        pages than shards and this shard gets none.
+
+    Raises:
+        ValueError: If `shard_index` is not in [0, num_shards).
+    """
+    if not 0 <= shard_index < num_shards:
+        raise ValueError(f"Shard index {shard_index} out of range for {num_shards}")
+    base, extra = divmod(num_pages, num_shards)
+    size = base + (shard_index < extra)
+    if size == 0:
+        return None
+    first_page = shard_index * base + min(shard_index, extra) + 1
+    return first_page, first_page + size - 1
+
+
+def merge_parquet_objects(
+    client: Minio,
+    bucket: str,
+    object_names: list[str],
+    sink: BinaryIO,
+) -> int:
+    """
+    Concatenates shard outputs into one Parquet stream. Shards are read one at a time
+    and each is sorted by page, so with shards given in page order the result is in
+    page order while only one shard is held in memory.
+
+    Args:
+        client (Minio): MinIO client.
+        bucket (str): Bucket holding the shard objects.
+        object_names (list[str]): Shard objects, in page order.
+        sink (BinaryIO): Writable stream, e.g. from `upload_stream`.
+
+    Returns:
+        int: Number of rows written.
+    """
+    num_rows = 0
+    with pq.ParquetWriter(sink, RECORD_SCHEMA, compression=COMPRESSION) as writer:
+        for object_name in object_names:
+            table = pq.read_table(
+                pa.BufferReader(get_object_bytes(client, bucket, object_name)),
+                schema=RECORD_SCHEMA,
+            )
+            writer.write_table(table.sort_by("page"), row_group_size=ROW_GROUP_SIZE)
+            num_rows += table.num_rows
+            logger.info(f"Merged {table.num_rows} rows from {object_name}")
+    return num_rows
@@ -0,0 +1,105 @@
+"""
+Text Layer Probe
+
+Born-digital PDFs, and scans that were already OCR'd, carry a text layer that can be read
+directly instead of rendering the page and sending it to the GPU. This module reads that
+layer with PDFium and keeps it only where it looks like real text.
+
+A page's layer is accepted when it has at least `MIN_TEXT_CHARS` non-space characters and
+at least `MIN_ALNUM_RATIO` of them are letters or digits, which rejects empty layers,
+layers with only a page number or a header, and garbage produced by broken font encodings.
+
+Functions:
+    extract_text_layer(pdf_path: str, page_numbers: Iterable[int]) -> dict[int, str]:
+        Reads the text layer of the given pages.
+
+    is_usable_text(text: str) -> bool:
+        Returns True if a text layer is good enough to replace OCR.
+
+    probe_text_layers(pdf_path: str, page_numbers: Iterable[int]) -> dict[int, str]:
+        Returns the usable text layers, keyed by page number.
+"""
+
+from collections.abc import Iterable
+
+import pypdfium2 as pdfium
+
+from helper.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+MIN_TEXT_CHARS = 200
+MIN_ALNUM_RATIO = 0.6
+# Characters PDFium emits for glyphs it cannot map to unicode
+UNMAPPED_CHARS = {"�", "\x00"}
+MAX_UNMAPPED_RATIO = 0.01
+
+
+def extract_text_layer(pdf_path: str, page_numbers: Iterable[int]) -> dict[int, str]:
+    """
+    Reads the text layer of the given pages.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        page_numbers (Iterable[int]): 1-based page numbers.
+
+    Returns:
+        dict[int, str]: Text of every requested page, empty when it has no layer.
+    """
+    texts = {}
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        for page_number in page_numbers:
+            page = pdf[page_number - 1]
+            try:
+                textpage = page.get_textpage()
+                try:
+                    texts[page_number] = textpage.get_text_range()
+                finally:
+                    textpage.close()
+            finally:
+                page.close()
+    finally:
+        pdf.close()
+    return texts
+
+
+def is_usable_text(text: str) -> bool:
+    """
+    Returns True if a text layer is good enough to replace OCR.
+
+    Args:
+        text (str): Text layer of a page.
+
+    Returns:
+        bool: Whether the layer has enough well-formed text.
+    """
+    chars = [c for c in text if not c.isspace()]
+    if len(chars) < MIN_TEXT_CHARS:
+        return False
+    unmapped = sum(1 for c in chars if c in UNMAPPED_CHARS)
+    if unmapped / len(chars) > MAX_UNMAPPED_RATIO:
+        return False
+    alnum = sum(1 for c in chars if c.isalnum())
+    return alnum / len(chars) >= MIN_ALNUM_RATIO
+
+
+def probe_text_layers(pdf_path: str, page_numbers: Iterable[int]) -> dict[int, str]:
+    """
+    Returns the pages whose text layer can be used instead of OCR.
+
+    Args:
+        pdf_path (str): Path to the PDF file.
+        page_numbers (Iterable[int]): 1-based page numbers to probe.
+
+    Returns:
+        dict[int, str]: Usable text layers, keyed by page number.
+    """
+    page_numbers = list(page_numbers)
+    texts = extract_text_layer(pdf_path, page_numbers)
+    usable = {n: text for n, text in texts.items() if is_usable_text(text)}
+    logger.info(
+        f"Text layer usable on {len(usable)}/{len(page_numbers)} pages, "
+        f"{len(page_numbers) - len(usable)} pages need OCR"
+    )
+    return usable
@@ -0,0 +1,201 @@
+"""
+Image Transport
+
+Decides how page images reach the vLLM engine. Each transport turns a rendered page into
+the URL placed in the request's `image_url` content part.
+
+Transports:
+    inline: Embeds the page as a base64 data URL (the historical default). Works
+        everywhere but adds a third to the payload, all of it through the router.
+    presigned: Uploads the page to MinIO and sends a presigned GET URL. The engine
+        fetches the image itself, so the MinIO endpoint must be reachable from the
+        vLLM pods.
+    shared_volume: Copies the page to a volume mounted by both the step pod and the
+        vLLM pods and sends a file:// URL. Needs `--allowed-local-media-path`.
+
+Pages are stored under their content hash inside a namespace of their own per transport
+instance, so re-sending a page during bisection or a retry reuses the same object or
+file, while `close` only ever deletes what this run wrote. Pages of a run that never
+closed its transport expire: `ocr_pages/` through a lifecycle rule of the bucket (see
+infrastructure/components/minio), the shared volume when the next transport starts.
+
+Functions:
+    get_transport(name: str, client: Minio | None, bucket: str | None) -> ImageTransport:
+        Returns an instance of the named transport.
+"""
+
+import base64
+import mimetypes
+import shutil
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from datetime import timedelta
+from pathlib import Path
+
+from minio import Minio
+
+from data_collection.cache import hash_bytes
+from helper.logger import setup_logger
+from helper.minio import delete_objects, put_object_bytes
+
+logger = setup_logger(__name__)
+
+DEFAULT_TRANSPORT = "inline"
+PRESIGNED_PREFIX = "ocr_pages"
+PRESIGNED_EXPIRY = timedelta(hours=6)
+# Mounted at the same path in the step pods and the vLLM pods
+SHARED_PAGES_DIR = "/shared/pages"
+# Age after which pages left on the shared volume by a crashed run are removed
+SHARED_PAGES_MAX_AGE = timedelta(days=1)
+
+
+def guess_mime_type(image_path: str) -> str:
+    """Returns the MIME type of an image file from its extension."""
+    return mimetypes.guess_type(image_path)[0] or "image/jpeg"
+
+
+class ImageTransport(ABC):
+    """Turns page images into URLs the vLLM engine can load."""
+
+    name: str
+
+    @abstractmethod
+    def image_url(self, image_path: str, image: bytes) -> str:
+        """Returns the URL of a page, `image` holds the file's bytes."""
+
+    def close(self) -> None:
+        """Releases whatever the transport created for this run."""
+
+
+class InlineTransport(ImageTransport):
+    """Base64 data URLs embedded in the request body."""
+
+    name = "inline"
+
+    def image_url(self, image_path: str, image: bytes) -> str:
+        encoded = base64.b64encode(image).decode("utf-8")
+        return f"data:{guess_mime_type(image_path)};base64,{encoded}"
+
+
+class PresignedTransport(ImageTransport):
+    """Pages uploaded to MinIO and referenced by presigned GET URLs."""
+
+    name = "presigned"
+
+    def __init__(
+        self,
+        client: Minio,
+        bucket: str,
+        prefix: str = PRESIGNED_PREFIX,
+        expires: timedelta = PRESIGNED_EXPIRY,
+    ):
+        """
+        Args:
+            client (Minio): MinIO client, its endpoint is the one the URLs point at.
+            bucket (str): Bucket receiving the pages.
+            prefix (str): Object prefix of the uploaded pages, each transport uploads
+                under its own sub-prefix.
+            expires (timedelta): Lifetime of the presigned URLs.
+        """
+        self.client = client
+        self.bucket = bucket
+        self.prefix = f"{prefix}/{uuid.uuid4().hex}"
+        self.expires = expires
+        self._uploaded: set[str] = set()
+
+    def image_url(self, image_path: str, image: bytes) -> str:
+        object_name = f"{self.prefix}/{hash_bytes(image)}{Path(image_path).suffix}"
+        if object_name not in self._uploaded:
+            put_object_bytes(
+                self.client,
+                self.bucket,
+                object_name,
+                image,
+                content_type=guess_mime_type(image_path),
+            )
+            self._uploaded.add(object_name)
+        return self.client.presigned_get_object(
+            self.bucket, object_name, expires=self.expires
+        )
+
+    def close(self) -> None:
+        """Deletes the pages uploaded by this transport."""
+        delete_objects(self.client, self.bucket, list(self._uploaded))
+        self._uploaded.clear()
+
+
+class SharedVolumeTransport(ImageTransport):
+    """Pages copied to a volume the vLLM pods mount, referenced by file:// URLs."""
+
+    name = "shared_volume"
+
+    def __init__(self, root: str = SHARED_PAGES_DIR):
+        """
+        Args:
+            root (str): Directory on the shared volume, identical in both pods. Each
+                transport writes to a directory of its own below it.
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._remove_stale_runs()
+        self.run_dir = self.root / uuid.uuid4().hex
+        self.run_dir.mkdir()
+
+    def _remove_stale_runs(self) -> None:
+        cutoff = time.time() - SHARED_PAGES_MAX_AGE.total_seconds()
+        for run_dir in self.root.iterdir():
+            if run_dir.is_dir() and run_dir.stat().st_mtime < cutoff:
+                logger.info(f"Removing pages of an unfinished run in {run_dir}")
+                shutil.rmtree(run_dir, ignore_errors=True)
+
+    def image_url(self, image_path: str, image: bytes) -> str:
+        shared_path = self.run_dir / f"{hash_bytes(image)}{Path(image_path).suffix}"
+        if not shared_path.exists():
+            tmp_path = shared_path.with_suffix(f".{threading.get_ident()}.tmp")
+            shutil.copyfile(image_path, tmp_path)
+            # Rename so the engine never reads a partially written page
+            tmp_path.replace(shared_path)
+        return shared_path.as_uri()
+
+    def close(self) -> None:
+        """Deletes the pages written by this transport."""
+        shutil.rmtree(self.run_dir, ignore_errors=True)
+
+
+TRANSPORTS: dict[str, type[ImageTransport]] = {
+    InlineTransport.name: InlineTransport,
+    PresignedTransport.name: PresignedTransport,
+    SharedVolumeTransport.name: SharedVolumeTransport,
+}
+
+
+def get_transport(
+    name: str = DEFAULT_TRANSPORT,
+    client: Minio | None = None,
+    bucket: str | None = None,
+) -> ImageTransport:
+    """
+    Returns an instance of the named image transport.
+
+    Args:
+        name (str): One of the keys of `TRANSPORTS`.
+        client (Minio | None): MinIO client, required by the presigned transport.
+        bucket (str | None): Bucket, required by the presigned transport.
+
+    Returns:
+        ImageTransport: Transport instance.
+
+    Raises:
+        ValueError: If the transport is unknown or its requirements are missing.
+    """
+    if name not in TRANSPORTS:
+        raise ValueError(
+            f"Unknown image transport '{name}'. Choose from {sorted(TRANSPORTS)}"
+        )
+    if name == PresignedTransport.name:
+        if client is None or bucket is None:
+            raise ValueError("The presigned transport needs a MinIO client and bucket")
+        return PresignedTransport(client=client, bucket=bucket)
+    return TRANSPORTS[name]()
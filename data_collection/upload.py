@@ -1,80 +1,124 @@
-from zenml import step
+from zenml import log_metadata, step
 from helper.logger import setup_logger
-import os
-import tempfile
-from datasets import Dataset
+from helper.minio import get_minio_client
 from minio import Minio
+from minio.error import S3Error
 from zenml.client import Client
+from data_collection.artifacts import ParquetReference
 
 logger = setup_logger(__name__)
 
 
 @step(name="store_extracted_texts_to_minio", enable_step_logs=True, enable_cache=False)
 def store_extracted_texts_to_minio(
-    dataset: Dataset,
-    bucket_name: str,
+    results: ParquetReference,
     minio_endpoint: str,
     filename: str,
     secure=False,
 ):
     """
-    ZenML step to store OCR extraction results as Parquet files in MinIO using the MinIO client.
+    ZenML step that registers and announces the OCR results written by `ocr_images`.
+    The Parquet object is streamed to its final location by the OCR step and only a
+    reference is passed along, so nothing is downloaded or uploaded again here.
 
     Args:
-        dataset (Dataset): Hugging Face Dataset containing OCR results, typically with keys like 'image_path' and 'extracted_text'.
-        bucket_name (str): MinIO bucket name where the file will be stored.
+        results (ParquetReference): Reference to the Parquet results in MinIO.
         minio_endpoint (str): MinIO server endpoint (e.g., "localhost:9000").
-        filename (str): Filename (without extension) to use for the stored Parquet file.
+        filename (str): Book name, used in the announcement.
         secure (bool, optional): Use HTTPS if True. Defaults to False.
 
     Returns:
-        str: The full MinIO path (bucket/object) to the uploaded file.
+        str: The full MinIO path (bucket/object) of the results.
 
     Raises:
-        ValueError: If the dataset is empty or required AWS credentials are missing.
-        Exception: If upload to MinIO fails.
+        ValueError: If the results object is missing, empty or changed since it was
+            written, or AWS credentials are missing.
     """
-    if not dataset:
-        raise ValueError("extraction_results is empty")
-
-    access_key = os.environ.get("AWS_ACCESS_KEY_ID")
-    secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
-    if not access_key or not secret_key:
-        raise ValueError("AWS credentials not found in environment variables.")
-
-    # Create a temporary directory to store the Parquet file
-    with tempfile.TemporaryDirectory() as temp_dir:
-        parquet_filename = f"{filename}.parquet"
-        parquet_path = os.path.join(temp_dir, parquet_filename)
-
-        # Save to Parquet
-        dataset.to_parquet(parquet_path)
-
-        # Initialize MinIO client
-        minio_client = Minio(
-            minio_endpoint,
-            access_key=access_key,
-            secret_key=secret_key,
-            secure=secure,
-        )
+    minio_client = get_minio_client(minio_endpoint, secure=secure)
+    log_metadata(
+        metadata={"ocr_results": verify_results(minio_client, results, filename)}
+    )
+    Client().active_stack.alerter.post(
+        f"Successfully processed OCR for {filename} and stored results in MinIO."
+    )
+    return f"{results.bucket}/{results.object_name}"
+
+
+@step(name="store_batch_results_to_minio", enable_step_logs=True, enable_cache=False)
+def store_batch_results_to_minio(
+    results: list[ParquetReference],
+    minio_endpoint: str,
+    book_names: list[str],
+    secure=False,
+) -> list[str]:
+    """
+    ZenML step that registers and announces the OCR results of a batch of books, see
+    `store_extracted_texts_to_minio`.
+
+    Args:
+        results (list[ParquetReference]): References to every book's results.
+        minio_endpoint (str): MinIO server endpoint (e.g., "localhost:9000").
+        book_names (list[str]): Book names, in the order of `results`.
+        secure (bool, optional): Use HTTPS if True. Defaults to False.
+
+    Returns:
+        list[str]: The full MinIO path (bucket/object) of every book's results.
 
-        # Ensure the bucket exists
-        if not minio_client.bucket_exists(bucket_name):
-            minio_client.make_bucket(bucket_name)
-
-        # Upload the file
-        object_name = f"ocr_results/{parquet_filename}"
-        try:
-            minio_client.fput_object(
-                bucket_name=bucket_name,
-                object_name=object_name,
-                file_path=parquet_path,
-                content_type="application/octet-stream",
-            )
-        except Exception:
-            logger.exception("Failed to upload file to MinIO")
-            raise
-        logger.info(f"Uploaded {parquet_filename} to MinIO bucket {bucket_name}")
-        Client().active_stack.alerter.post(
-            f"Successfully processed OCR for {filename} and stored results in MinIO."
+    Raises:
+        ValueError: If a results object is missing, empty or changed since it was
+            written, or AWS credentials are missing.
+    """
+    minio_client = get_minio_client(minio_endpoint, secure=secure)
+    log_metadata(
+        metadata={
+            "ocr_results": {
+                book_name: verify_results(minio_client, book_results, book_name)
+                for book_name, book_results in zip(book_names, results, strict=True)
+            }
+        }
+    )
+    num_pages = sum(book_results.num_rows for book_results in results)
+    Client().active_stack.alerter.post(
+        f"Successfully processed OCR for {len(results)} books ({num_pages} pages) "
+        "and stored results in MinIO."
+    )
+    return [f"{r.bucket}/{r.object_name}" for r in results]
+
+
+def verify_results(client: Minio, results: ParquetReference, book_name: str) -> dict:
+    """
+    Checks that a results object is in place as written and summarizes it.
+
+    Args:
+        client (Minio): MinIO client.
+        results (ParquetReference): Reference to the Parquet results in MinIO.
+        book_name (str): Book name, used in the summary.
+
+    Returns:
+        dict: Run metadata describing the results.
+
+    Raises:
+        ValueError: If the results object is missing, empty or changed since it was
+            written.
+    """
+    try:
+        stat = client.stat_object(results.bucket, results.object_name)
+    except S3Error as e:
+        raise ValueError(f"OCR results {results.uri} not found") from e
+    if not stat.size or stat.size != results.size_bytes:
+        raise ValueError(
+            f"OCR results {results.uri} have {stat.size} bytes, "
+            f"expected {results.size_bytes}"
         )
+    logger.info(
+        f"OCR results for {book_name}: {results.num_rows} pages at {results.uri} "
+        f"({results.size_bytes / 1024:.1f} KiB, {results.status_counts})"
+    )
+    return {
+        "book": book_name,
+        "uri": results.uri,
+        "num_rows": results.num_rows,
+        "size_bytes": results.size_bytes,
+        "status_counts": results.status_counts,
+        "etag": stat.etag,
+    }
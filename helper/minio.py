@@ -1,22 +1,118 @@
 from minio import Minio
+from minio.deleteobjects import DeleteObject
+import hashlib
+import io
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import certifi
+import urllib3
+
+from helper.logger import setup_logger
+
+logger = setup_logger(__name__)
+
+# Connections kept per MinIO host, sized for the parallel helpers below plus the
+# OCR step's cache, checkpoint and result-upload threads
+MINIO_POOL_SIZE = 32
+MINIO_TIMEOUT = urllib3.Timeout(connect=10, read=300)
+MINIO_RETRIES = urllib3.Retry(
+    total=5,
+    backoff_factor=0.2,
+    status_forcelist=[500, 502, 503, 504],
+)
+BULK_WORKERS = 16
+# Objects are downloaded as byte ranges of this size, several at a time
+RANGE_PART_SIZE = 32 * 1024 * 1024
+RANGE_WORKERS = 8
+# hostPath directory the step pods mount, shared by every run on a node
+DOWNLOAD_CACHE_DIR = "/var/cache/dharma/downloads"
+DOWNLOAD_CACHE_MAX_BYTES = 20 * 1024 * 1024 * 1024
+
+_clients: dict[tuple[str, bool], Minio] = {}
+_clients_lock = threading.Lock()
+
+
+def build_http_client(pool_size: int = MINIO_POOL_SIZE) -> urllib3.PoolManager:
+    """
+    Builds the urllib3 pool shared by every request of a MinIO client.
+
+    Args:
+        pool_size (int): Keep-alive connections per host.
+
+    Returns:
+        urllib3.PoolManager: Connection pool.
+    """
+    return urllib3.PoolManager(
+        num_pools=4,
+        maxsize=pool_size,
+        # Wait for a free connection instead of opening throwaway ones
+        block=True,
+        timeout=MINIO_TIMEOUT,
+        retries=MINIO_RETRIES,
+        cert_reqs="CERT_REQUIRED",
+        ca_certs=certifi.where(),
+    )
+
+
+def get_minio_client(endpoint: str, secure: bool = False) -> Minio:
+    """
+    Returns the process-wide MinIO client of an endpoint, built on first use from the
+    AWS credentials in the environment. The client is thread-safe and reuses one
+    pooled set of keep-alive connections.
+
+    Args:
+        endpoint (str): MinIO server endpoint (e.g., "localhost:9000").
+        secure (bool, optional): Use HTTPS if True. Defaults to False.
+
+    Returns:
+        Minio: Configured MinIO client.
+
+    Raises:
+        ValueError: If AWS credentials are missing in environment variables.
+    """
+    with _clients_lock:
+        client = _clients.get((endpoint, secure))
+        if client is not None:
+            return client
+        access_key = os.environ.get("AWS_ACCESS_KEY_ID")
+        secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
+        if not access_key or not secret_key:
+            raise ValueError("AWS credentials not found in environment variables.")
+        client = Minio(
+            endpoint=endpoint,
+            access_key=access_key,
+            secret_key=secret_key,
+            secure=secure,
+            http_client=build_http_client(),
+        )
+        _clients[(endpoint, secure)] = client
+        return client
+
 
 def download_from_minio(
     endpoint: str,
     bucket: str,
     minio_path: str,
     local_path: str,
+    cache_dir: str | None = None,
 ) -> str:
     """
-    Downloads a file from MinIO object storage to a local path.
+    Downloads a file from MinIO object storage to a local path. Large objects are
+    fetched as parallel byte ranges.
+
+    With `cache_dir` set the object is kept in that node-local cache, keyed by its
+    ETag: an unchanged object is not transferred again and the cached copy's path
+    is returned instead of `local_path`.
 
     Args:
         endpoint (str): MinIO server endpoint (e.g., "localhost:9000").
         bucket (str): Name of the MinIO bucket.
         minio_path (str): Object key (path) in the bucket.
         local_path (str): Local file path to save the downloaded file.
+        cache_dir (str | None): Node-local cache directory, None to always download.
 
     Returns:
         str: The local file path where the object was saved.
@@ -24,19 +120,239 @@ def download_from_minio(
     Raises:
         ValueError: If AWS credentials are missing in environment variables.
     """
-    access_key = os.environ.get("AWS_ACCESS_KEY_ID")
-    secret_key = os.environ.get("AWS_SECRET_ACCESS_KEY")
-    if not access_key or not secret_key:
-        raise ValueError("AWS credentials not found in environment variables.")
-    client = Minio(
-        endpoint=endpoint,
-        access_key=access_key,
-        secret_key=secret_key,
-        secure=False,
-    )
+    client = get_minio_client(endpoint)
+    stat = client.stat_object(bucket, minio_path)
+    etag = stat.etag.strip('"')
+
+    if cache_dir is not None:
+        entry_dir = (
+            Path(cache_dir)
+            / hashlib.sha256(f"{bucket}/{minio_path}".encode()).hexdigest()
+        )
+        local_path = entry_dir / f"{etag}{Path(minio_path).suffix}"
+        if local_path.exists():
+            # Refresh the access time, the cache is evicted LRU
+            os.utime(local_path)
+            logger.info(f"Download cache hit for {bucket}/{minio_path} ({etag})")
+            return str(local_path)
+    else:
+        local_path = Path(local_path)
 
-    local_path = Path(local_path)
     local_path.parent.mkdir(parents=True, exist_ok=True)
-    client.fget_object(bucket, minio_path, str(local_path))
+    # Download next to the destination and rename, so neither a crashed download nor
+    # another pod on the node ever sees a partial file
+    tmp_path = local_path.with_name(
+        f".{local_path.name}.{os.getpid()}.{threading.get_ident()}.tmp"
+    )
+    try:
+        ranged_download(client, bucket, minio_path, tmp_path, stat.size, etag)
+        tmp_path.replace(local_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
 
+    if cache_dir is not None:
+        # Older versions of the same object are never hit again
+        for stale in local_path.parent.iterdir():
+            if stale != local_path and not stale.name.startswith("."):
+                stale.unlink(missing_ok=True)
+        evict_download_cache(cache_dir)
     return str(local_path)
+
+
+def ranged_download(
+    client: Minio,
+    bucket: str,
+    object_name: str,
+    local_path: Path,
+    size: int,
+    etag: str,
+    part_size: int = RANGE_PART_SIZE,
+    workers: int = RANGE_WORKERS,
+) -> None:
+    """
+    Downloads an object with concurrent byte-range requests written in place.
+
+    Every range is requested with `If-Match` on the ETag, so an object overwritten
+    mid-download fails the download instead of mixing two versions.
+
+    Args:
+        client (Minio): MinIO client.
+        bucket (str): Bucket name.
+        object_name (str): Object to download.
+        local_path (Path): Destination file.
+        size (int): Object size in bytes.
+        etag (str): ETag the object must still have.
+        part_size (int): Bytes per range request.
+        workers (int): Number of concurrent range requests.
+    """
+    ranges = [
+        (offset, min(part_size, size - offset)) for offset in range(0, size, part_size)
+    ]
+    headers = {"If-Match": f'"{etag}"'}
+
+    with open(local_path, "wb") as f:
+        if not ranges:
+            # An empty object, the file is created empty and there is nothing to fetch
+            logger.info(f"Downloaded {bucket}/{object_name} (empty)")
+            return
+        f.truncate(size)
+        fd = f.fileno()
+
+        def fetch(byte_range: tuple[int, int]) -> None:
+            offset, length = byte_range
+            response = client.get_object(
+                bucket,
+                object_name,
+                offset=offset,
+                length=length,
+                request_headers=headers,
+            )
+            try:
+                position = offset
+                for data in response.stream(1024 * 1024):
+                    os.pwrite(fd, data, position)
+                    position += len(data)
+            finally:
+                response.close()
+                response.release_conn()
+            if position != offset + length:
+                raise OSError(
+                    f"Short read of {object_name} at {offset}: "
+                    f"{position - offset}/{length} bytes"
+                )
+
+        if len(ranges) == 1:
+            fetch(ranges[0])
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(workers, len(ranges)), thread_name_prefix="minio-range"
+            ) as pool:
+                list(pool.map(fetch, ranges))
+    logger.info(
+        f"Downloaded {bucket}/{object_name} ({size / 2**20:.1f} MiB) "
+        f"in {len(ranges)} ranges"
+    )
+
+
+def evict_download_cache(
+    cache_dir: str, max_bytes: int = DOWNLOAD_CACHE_MAX_BYTES
+) -> int:
+    """
+    Removes least recently used files until the download cache fits its budget.
+
+    Args:
+        cache_dir (str): Download cache directory.
+        max_bytes (int): Size budget of the cache.
+
+    Returns:
+        int: Number of evicted files.
+    """
+    entries = [
+        (p, p.stat()) for p in Path(cache_dir).glob("*/*") if not p.name.startswith(".")
+    ]
+    total_bytes = sum(st.st_size for _, st in entries)
+    evicted = 0
+    for path, st in sorted(entries, key=lambda e: e[1].st_mtime):
+        if total_bytes <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total_bytes -= st.st_size
+        evicted += 1
+    return evicted
+
+
+def get_object_bytes(client: Minio, bucket: str, object_name: str) -> bytes:
+    """Reads a whole object and returns its connection to the pool."""
+    response = client.get_object(bucket, object_name)
+    try:
+        return response.read()
+    finally:
+        response.close()
+        response.release_conn()
+
+
+def put_object_bytes(
+    client: Minio,
+    bucket: str,
+    object_name: str,
+    data: bytes,
+    content_type: str = "application/octet-stream",
+) -> None:
+    """Writes `data` as a single object."""
+    client.put_object(
+        bucket,
+        object_name,
+        io.BytesIO(data),
+        length=len(data),
+        content_type=content_type,
+    )
+
+
+def list_object_names(
+    client: Minio, bucket: str, prefix: str, recursive: bool = True
+) -> list[str]:
+    """
+    Lists the object names under a prefix.
+
+    Args:
+        client (Minio): MinIO client.
+        bucket (str): Bucket name.
+        prefix (str): Object prefix.
+        recursive (bool): List nested prefixes too.
+
+    Returns:
+        list[str]: Object names, in listing order.
+    """
+    return [
+        obj.object_name
+        for obj in client.list_objects(bucket, prefix=prefix, recursive=recursive)
+        if not obj.is_dir
+    ]
+
+
+def get_objects(
+    client: Minio,
+    bucket: str,
+    object_names: list[str],
+    workers: int = BULK_WORKERS,
+) -> dict[str, bytes]:
+    """
+    Reads many objects in parallel over the client's pooled connections.
+
+    Args:
+        client (Minio): MinIO client.
+        bucket (str): Bucket name.
+        object_names (list[str]): Objects to read.
+        workers (int): Number of concurrent requests.
+
+    Returns:
+        dict[str, bytes]: Object contents keyed by object name.
+    """
+    if not object_names:
+        return {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="minio") as pool:
+        contents = pool.map(
+            lambda name: get_object_bytes(client, bucket, name), object_names
+        )
+        return dict(zip(object_names, contents))
+
+
+def delete_objects(client: Minio, bucket: str, object_names: list[str]) -> int:
+    """
+    Deletes objects with batched multi-object delete requests.
+
+    Args:
+        client (Minio): MinIO client.
+        bucket (str): Bucket name.
+        object_names (list[str]): Objects to delete.
+
+    Returns:
+        int: Number of objects that could not be deleted.
+    """
+    failed = 0
+    for error in client.remove_objects(
+        bucket, (DeleteObject(name) for name in object_names)
+    ):
+        logger.warning(f"Failed to delete {error.name}: {error.message}")
+        failed += 1
+    return failed
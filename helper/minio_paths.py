@@ -1,2 +1,33 @@
 def get_books_path(book_name: str):
     return f"raw_data/{book_name}.pdf"
+
+
+def get_checkpoint_path(book_name: str, run_id: str):
+    return f"ocr_checkpoints/{book_name}/{run_id}"
+
+
+def get_ocr_results_path(book_name: str):
+    return f"ocr_results/{book_name}.parquet"
+
+
+def get_page_store_path(pdf_sha256: str, settings_key: str):
+    return f"page_store/{pdf_sha256}/{settings_key}"
+
+
+def get_ocr_shard_path(book_name: str, shard_index: int, num_shards: int):
+    return (
+        f"ocr_results/{book_name}/shard_{shard_index:03d}_of_{num_shards:03d}.parquet"
+    )
+
+
+def get_books_prefix():
+    return "raw_data/"
+
+
+def get_ocr_results_prefix():
+    return "ocr_results/"
+
+
+def get_book_name(books_path: str):
+    """Inverse of `get_books_path`."""
+    return books_path.removeprefix(get_books_prefix()).removesuffix(".pdf")
@@ -9,6 +9,34 @@ step_pod_settings = KubernetesPodSettings(
     },
     env_from=[{"secretRef": {"name": "aws-credentials"}}],
     labels={"app": "ocr_pipelines", "component": "step"},
+    # Same volume vLLM mounts, used by the shared_volume image transport
+    volumes=[
+        {"name": "pages-vol", "persistentVolumeClaim": {"claimName": "pages-pvc"}}
+    ],
+    volume_mounts=[{"name": "pages-vol", "mountPath": "/shared/pages"}],
+)
+
+# CPU-only pod of the rasterize step, it never talks to vLLM
+rasterize_pod_settings = KubernetesPodSettings(
+    resources={
+        "requests": {"cpu": "4", "memory": "4Gi"},
+        "limits": {"cpu": "6", "memory": "6Gi"},
+    },
+    env_from=[{"secretRef": {"name": "aws-credentials"}}],
+    labels={"app": "ocr_pipelines", "component": "rasterize"},
+    # Node-local cache of downloaded books, outlives the step pods
+    volumes=[
+        {
+            "name": "download-cache",
+            "hostPath": {
+                "path": "/var/cache/dharma/downloads",
+                "type": "DirectoryOrCreate",
+            },
+        }
+    ],
+    volume_mounts=[
+        {"name": "download-cache", "mountPath": "/var/cache/dharma/downloads"}
+    ],
 )
 
 orchestrator_pod_settings = KubernetesPodSettings(
@@ -27,6 +55,9 @@ k8s_operator_settings = KubernetesOrchestratorSettings(
     ttl_seconds_after_finished=180,
     pod_startup_timeout=1200,  # 20 minutes
 )
+rasterize_operator_settings = KubernetesOrchestratorSettings(
+    pod_settings=rasterize_pod_settings,
+)
 docker_settings = DockerSettings(
     parent_image="ghcr.io/atharva-phatak/data_collection:latest", skip_build=True
 )
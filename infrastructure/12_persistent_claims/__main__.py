@@ -18,3 +18,12 @@ model_pv_claims = deploy_persistent_volume_claims(
     storage_capacity=cfg.model_storage_capacity,
     storage_path=cfg.model_storage_path,
 )
+# Deploy pv shared by the OCR step pods and vLLM for page images
+pages_pv_claims = deploy_persistent_volume_claims(
+    namespace=namespace_name,
+    provider=provider,
+    pv_name=cfg.pages_pv_name,
+    pvc_name=cfg.pages_pvc_name,
+    storage_capacity=cfg.pages_storage_capacity,
+    storage_path=cfg.pages_storage_path,
+)
@@ -0,0 +1,28 @@
+import pulumi
+
+from infrastructure.components.ingest.deploy_ingest import deploy_ingest
+from infrastructure.components.persistent_claims.pv import (
+    deploy_persistent_volume_claims,
+)
+from infrastructure.helper.config import load_config
+from infrastructure.helper.provider import get_k8s_provider
+
+cfg = load_config()
+provider = get_k8s_provider()
+pconfig = pulumi.Config()
+namespace_name = pconfig.require("namespace")
+# Deploy pv holding the ingestion queue
+ingest_pv_claim = deploy_persistent_volume_claims(
+    namespace=namespace_name,
+    provider=provider,
+    pv_name=cfg.ingest_pv_name,
+    pvc_name=cfg.ingest_pvc_name,
+    storage_capacity=cfg.ingest_storage_capacity,
+    storage_path=cfg.ingest_storage_path,
+)
+_ = deploy_ingest(
+    provider=provider,
+    namespace=namespace_name,
+    pvc_name=ingest_pv_claim.metadata["name"],
+    depends_on=[ingest_pv_claim],
+)
@@ -0,0 +1,110 @@
+import pulumi
+import pulumi_kubernetes as k8s
+
+INGEST_PORT = 8080
+
+
+def deploy_ingest(
+    provider: k8s.Provider,
+    namespace: str,
+    pvc_name: str,
+    image: str = "ghcr.io/atharva-phatak/data_collection:latest",
+    depends_on: list | None = None,
+):
+    depends_on = depends_on or []
+    labels = {"app.kubernetes.io/name": "dharma-ingest"}
+
+    ingest_deployment = k8s.apps.v1.Deployment(
+        "ingest-deployment",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="dharma-ingest",
+            namespace=namespace,
+        ),
+        spec=k8s.apps.v1.DeploymentSpecArgs(
+            # The SQLite queue has a single writer, never run two pods at once
+            replicas=1,
+            strategy=k8s.apps.v1.DeploymentStrategyArgs(type="Recreate"),
+            selector=k8s.meta.v1.LabelSelectorArgs(match_labels=labels),
+            template=k8s.core.v1.PodTemplateSpecArgs(
+                metadata=k8s.meta.v1.ObjectMetaArgs(labels=labels),
+                spec=k8s.core.v1.PodSpecArgs(
+                    restart_policy="Always",
+                    volumes=[
+                        k8s.core.v1.VolumeArgs(
+                            name="queue",
+                            persistent_volume_claim=k8s.core.v1.PersistentVolumeClaimVolumeSourceArgs(
+                                claim_name=pvc_name
+                            ),
+                        )
+                    ],
+                    containers=[
+                        k8s.core.v1.ContainerArgs(
+                            name="ingest",
+                            image=image,
+                            image_pull_policy="Always",
+                            command=["python", "-m", "data_collection.ingest_service"],
+                            args=["--port", str(INGEST_PORT)],
+                            resources=k8s.core.v1.ResourceRequirementsArgs(
+                                limits={"cpu": "1", "memory": "1Gi"},
+                                requests={"cpu": "100m", "memory": "256Mi"},
+                            ),
+                            env_from=[
+                                k8s.core.v1.EnvFromSourceArgs(
+                                    secret_ref=k8s.core.v1.SecretEnvSourceArgs(
+                                        name="aws-credentials"
+                                    )
+                                ),
+                                # ZENML_STORE_URL and ZENML_STORE_API_KEY of a service
+                                # account, used to launch and stop the pipeline runs
+                                k8s.core.v1.EnvFromSourceArgs(
+                                    secret_ref=k8s.core.v1.SecretEnvSourceArgs(
+                                        name="zenml-client"
+                                    )
+                                ),
+                            ],
+                            ports=[
+                                k8s.core.v1.ContainerPortArgs(
+                                    name="http", container_port=INGEST_PORT
+                                )
+                            ],
+                            liveness_probe=k8s.core.v1.ProbeArgs(
+                                http_get=k8s.core.v1.HTTPGetActionArgs(
+                                    path="/healthz", port=INGEST_PORT
+                                ),
+                                period_seconds=30,
+                            ),
+                            volume_mounts=[
+                                k8s.core.v1.VolumeMountArgs(
+                                    name="queue",
+                                    mount_path="/var/lib/dharma/ingest",
+                                )
+                            ],
+                        )
+                    ],
+                ),
+            ),
+        ),
+        opts=pulumi.ResourceOptions(provider=provider, depends_on=depends_on),
+    )
+
+    # MinIO posts bucket notifications here and Prometheus scrapes /metrics
+    ingest_service = k8s.core.v1.Service(
+        "ingest-service",
+        metadata=k8s.meta.v1.ObjectMetaArgs(
+            name="dharma-ingest",
+            namespace=namespace,
+            labels={"environment": "dev", "service": "dharma_ingest"},
+        ),
+        spec=k8s.core.v1.ServiceSpecArgs(
+            selector=labels,
+            ports=[
+                k8s.core.v1.ServicePortArgs(
+                    name="http", protocol="TCP", port=INGEST_PORT, target_port="http"
+                )
+            ],
+            type="ClusterIP",
+        ),
+        opts=pulumi.ResourceOptions(provider=provider, depends_on=[ingest_deployment]),
+    )
+    pulumi.export("ingest_service", ingest_service.metadata["name"])
+    return ingest_service
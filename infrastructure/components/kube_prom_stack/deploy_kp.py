@@ -92,6 +92,17 @@ def deploy_kp_stack(
                             "namespaceSelector": {"matchNames": ["zenml"]},
                             "endpoints": [{"port": "router-sport", "path": "/metrics"}],
                         },
+                        {
+                            "name": "dharma-ingest-monitor",
+                            "selector": {
+                                "matchLabels": {
+                                    "environment": "dev",
+                                    "service": "dharma_ingest",
+                                }
+                            },
+                            "namespaceSelector": {"matchNames": ["zenml"]},
+                            "endpoints": [{"port": "http", "path": "/metrics"}],
+                        },
                     ],
                 },
                 # --- PROMETHEUS ADAPTER FOR CUSTOM METRICS (HPA) ---
@@ -71,6 +71,8 @@ def deploy_minio(
                 ),
                 spec=k8s.core.v1.PodSpecArgs(
                     host_network=True,
+                    # Resolve the ingestion service for bucket notifications
+                    dns_policy="ClusterFirstWithHostNet",
                     restart_policy="Always",
                     volumes=[
                         k8s.core.v1.VolumeArgs(
@@ -96,6 +98,20 @@ def deploy_minio(
                                 k8s.core.v1.EnvVarArgs(
                                     name="MINIO_SECRET_KEY", value=minio_secret_key
                                 ),
+                                # Webhook target of the book upload notifications
+                                k8s.core.v1.EnvVarArgs(
+                                    name="MINIO_NOTIFY_WEBHOOK_ENABLE_DHARMA",
+                                    value="on",
+                                ),
+                                k8s.core.v1.EnvVarArgs(
+                                    name="MINIO_NOTIFY_WEBHOOK_ENDPOINT_DHARMA",
+                                    value=f"http://dharma-ingest.{namespace}.svc.cluster.local:8080/minio/events",
+                                ),
+                                # Keeps undelivered events while the service is down
+                                k8s.core.v1.EnvVarArgs(
+                                    name="MINIO_NOTIFY_WEBHOOK_QUEUE_DIR_DHARMA",
+                                    value="/data/.notify-queue",
+                                ),
                             ],
                             ports=[k8s.core.v1.ContainerPortArgs(container_port=9000)],
                             volume_mounts=[
@@ -202,12 +218,60 @@ def deploy_minio_buckets(
         minio_user=minio_access_key,
         minio_password=minio_secret_key,
     )
+    minio_buckets = {}
     for bucket in buckets:
-        pm.S3Bucket(
+        minio_buckets[bucket] = pm.S3Bucket(
             bucket,
             bucket=bucket,
             opts=pulumi.ResourceOptions(depends_on=depends_on, provider=minio_provider),
         )
+    return minio_provider, minio_buckets
+
+
+def deploy_book_notifications(
+    minio_provider: pm.Provider,
+    bucket: pm.S3Bucket,
+):
+    # Every PDF uploaded under raw_data/ is queued by the ingestion service
+    return pm.S3BucketNotification(
+        "book-upload-notification",
+        bucket=bucket.bucket,
+        queues=[
+            pm.S3BucketNotificationQueueArgs(
+                queue_arn="arn:minio:sqs::DHARMA:webhook",
+                events=["s3:ObjectCreated:*"],
+                filter_prefix="raw_data/",
+                filter_suffix=".pdf",
+            )
+        ],
+        opts=pulumi.ResourceOptions(depends_on=[bucket], provider=minio_provider),
+    )
+
+
+def deploy_bucket_lifecycle(
+    minio_provider: pm.Provider,
+    bucket: pm.S3Bucket,
+):
+    # OCR cache entries expire in MinIO itself, so runs never list the whole cache.
+    # Matches REMOTE_CACHE_MAX_AGE_DAYS in data_collection/cache.py
+    return pm.IlmPolicy(
+        "data-bucket-lifecycle",
+        bucket=bucket.bucket,
+        rules=[
+            pm.IlmPolicyRuleArgs(
+                id="expire-ocr-cache",
+                expiration="30d",
+                filter="ocr_cache/",
+            ),
+            # Pages of presigned transports that were never closed, e.g. a killed step
+            pm.IlmPolicyRuleArgs(
+                id="expire-ocr-pages",
+                expiration="1d",
+                filter="ocr_pages/",
+            ),
+        ],
+        opts=pulumi.ResourceOptions(depends_on=[bucket], provider=minio_provider),
+    )
 
 
 def deploy_minio_components(
@@ -251,7 +315,7 @@ def deploy_minio_components(
         environment_slug="dev",
     )
     # Deploy MinIO buckets
-    deploy_minio_buckets(
+    minio_provider, minio_buckets = deploy_minio_buckets(
         access_key_identifier=SecretNames.MINIO_ACCESS_KEY.value,
         secret_key_identifier=SecretNames.MINIO_SECRET_KEY.value,
         infiscal_project_id=cfg.infiscal_project_id,
@@ -260,4 +324,12 @@ def deploy_minio_components(
         buckets=[cfg.data_bucket, cfg.zenml_bucket],
         ingress_host=cfg.minio_ingress_host,
     )
+    deploy_book_notifications(
+        minio_provider=minio_provider,
+        bucket=minio_buckets[cfg.data_bucket],
+    )
+    deploy_bucket_lifecycle(
+        minio_provider=minio_provider,
+        bucket=minio_buckets[cfg.data_bucket],
+    )
     return minio_chart
@@ -60,6 +60,9 @@ def deploy_vllm(provider: k8s.Provider, namespace: str):
                                     '{"image": 5, "video": 0}',
                                     "--max-model-len",
                                     "48000",
+                                    # Pages sent as file:// URLs by the shared_volume transport
+                                    "--allowed-local-media-path",
+                                    "/shared/pages",
                                 ],
                             },
                             "keda": {
@@ -68,6 +71,18 @@ def deploy_vllm(provider: k8s.Provider, namespace: str):
                                 "maxReplicaCount": 1,
                                 "idleReplicaCount": 0,
                                 "triggers": [
+                                    # Backlog-based pre-scaling, wakes the engine as soon as a
+                                    # book is uploaded, see data_collection/ingest_service.py
+                                    {
+                                        "type": "prometheus",
+                                        "metadata": {
+                                            "serverAddress": "http://prometheus-stack-kube-prom-prometheus.monitoring.svc:9090",
+                                            "metricName": "dharma_ingest_backlog_pages",
+                                            "query": "sum(dharma_ingest_backlog_pages)",
+                                            "threshold": "500",
+                                            "activationThreshold": "0",
+                                        },
+                                    },
                                     # Queue-based scaling
                                     {
                                         "type": "prometheus",
@@ -95,7 +110,11 @@ def deploy_vllm(provider: k8s.Provider, namespace: str):
                                 {
                                     "name": "model-vol",
                                     "persistentVolumeClaim": {"claimName": "model-pvc"},
-                                }
+                                },
+                                {
+                                    "name": "pages-vol",
+                                    "persistentVolumeClaim": {"claimName": "pages-pvc"},
+                                },
                             ],
                             # 📂 Mount it inside container
                             "extraVolumeMounts": [
@@ -103,7 +122,12 @@ def deploy_vllm(provider: k8s.Provider, namespace: str):
                                     "name": "model-vol",
                                     "mountPath": "/models",
                                     "readOnly": True,
-                                }
+                                },
+                                {
+                                    "name": "pages-vol",
+                                    "mountPath": "/shared/pages",
+                                    "readOnly": True,
+                                },
                             ],
                             "env": [
                                 {"name": "HUGGING_FACE_HUB_TOKEN", "value": hf_token},
@@ -8,5 +8,6 @@ stack_dependencies = {
     "7_arc_runner": ["1_cluster"],
     "12_persistent_claims": ["2_namespace"],
     "13_prometheus": ["1_cluster"],
+    "17_ingest": ["4_minio", "6_orchestrator"],
     # "14_grafana": ["13_prometheus"],
 }
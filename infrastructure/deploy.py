@@ -113,6 +113,12 @@ def deploy_sequentially():
         },
     )
     print("✅ VLLM deployed.")
+    deploy_stack(
+        name="ingest",
+        path=Path(infra_base_path) / "17_ingest",
+        config={"namespace": zenml_namespace_name},
+    )
+    print("✅ Ingestion service deployed.")
 
     print("Cleaning up downloaded charts...")
     charts_path = Path(infra_base_path) / "11_annotator/charts"
@@ -166,6 +172,11 @@ def refresh_sequentially():
         path=Path(infra_base_path) / "16_additional_secrets",
     )
 
+    refresh_stack(
+        name="17_ingest",
+        path=Path(infra_base_path) / "17_ingest",
+    )
+
 
 def destroy_singular_stack(stack_name: str):
     infra_base_path = get_base_path()
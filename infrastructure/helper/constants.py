@@ -13,6 +13,14 @@ class InfrastructureConfig(BaseModel):
     model_storage_capacity: str
     storage_path: str
     model_storage_path: str
+    pages_pv_name: str
+    pages_pvc_name: str
+    pages_storage_capacity: str
+    pages_storage_path: str
+    ingest_pv_name: str
+    ingest_pvc_name: str
+    ingest_storage_capacity: str
+    ingest_storage_path: str
     sql_host_path: str
     minikube_cpus: int
     minikube_memory: str
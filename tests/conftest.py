@@ -0,0 +1,70 @@
+import io
+import threading
+from types import SimpleNamespace
+
+import pytest
+from minio.error import S3Error
+
+
+class FakeResponse(io.BytesIO):
+    def stream(self, amt):
+        while data := self.read(amt):
+            yield data
+
+    def release_conn(self):
+        pass
+
+
+class FakeMinio:
+    """In-memory stand-in for the `Minio` calls the data collection code makes."""
+
+    def __init__(self):
+        self.objects: dict[tuple[str, str], bytes] = {}
+        self._lock = threading.Lock()
+
+    def put_object(self, bucket, object_name, data, length, **kwargs):
+        content = data.read() if length < 0 else data.read(length)
+        with self._lock:
+            self.objects[(bucket, object_name)] = content
+
+    def _get(self, bucket, object_name):
+        with self._lock:
+            if (bucket, object_name) not in self.objects:
+                raise S3Error(
+                    None, "NoSuchKey", "Object does not exist", object_name, "", ""
+                )
+            return self.objects[(bucket, object_name)]
+
+    def get_object(self, bucket, object_name, offset=0, length=0, **kwargs):
+        content = self._get(bucket, object_name)
+        end = offset + length if length else len(content)
+        return FakeResponse(content[offset:end])
+
+    def stat_object(self, bucket, object_name, **kwargs):
+        content = self._get(bucket, object_name)
+        return SimpleNamespace(
+            object_name=object_name, size=len(content), etag=str(hash(content))
+        )
+
+    def list_objects(self, bucket, prefix="", recursive=False, **kwargs):
+        with self._lock:
+            names = sorted(
+                name
+                for b, name in self.objects
+                if b == bucket and name.startswith(prefix)
+            )
+        return [SimpleNamespace(object_name=name, is_dir=False) for name in names]
+
+    def remove_objects(self, bucket, delete_object_list, **kwargs):
+        with self._lock:
+            for delete in delete_object_list:
+                self.objects.pop((bucket, delete.name), None)
+        return iter([])
+
+    def names(self, bucket, prefix=""):
+        return [obj.object_name for obj in self.list_objects(bucket, prefix)]
+
+
+@pytest.fixture
+def minio():
+    return FakeMinio()
@@ -0,0 +1,170 @@
+import io
+from concurrent.futures import Future
+
+import pyarrow.parquet as pq
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+
+from data_collection import book_run
+from data_collection.book_run import BookRun, ocr_books
+from data_collection.checkpoint import ChunkCheckpointer
+from data_collection.ocr import chunk_result
+from data_collection.page_store import PageManifest, PageStore
+from data_collection.preprocess import preprocess_page
+from data_collection.rasterize import page_image_path, page_number_from_path
+from data_collection.records import PAGE_BREAK
+from helper.minio_paths import get_checkpoint_path, get_ocr_results_path
+
+BUCKET = "data"
+RUN_ID = "run"
+# A4 rendered at 150 DPI
+PAGE_SIZE = (1240, 1754)
+
+
+def render(text):
+    page = Image.new("RGB", PAGE_SIZE, "white")
+    if text:
+        font = ImageFont.load_default(size=36)
+        ImageDraw.Draw(page).text((300, 700), text, fill="black", font=font)
+    return preprocess_page(page)
+
+
+@pytest.fixture
+def book_name(tmp_path):
+    return f"book_{tmp_path.name}"
+
+
+def build_store(minio, tmp_path, texts, text_layers=None):
+    """
+    Uploads one rendered page per text, an empty text gives a blank page. Pages in
+    `text_layers` come after them and are not rendered.
+    """
+    paths = []
+    for page_number, text in enumerate(texts, start=1):
+        path = page_image_path(tmp_path, page_number)
+        render(text).save(path, "JPEG", quality=90)
+        paths.append(str(path))
+    store = PageStore(minio, BUCKET)
+    manifest = PageManifest(
+        prefix="page_store/book",
+        pdf_sha256="0" * 64,
+        settings={},
+        num_pages=len(texts) + len(text_layers or {}),
+        pages=store.upload_pages(paths, "page_store/book"),
+        text_layers=text_layers or {},
+    )
+    store.save_manifest(manifest)
+    return store, manifest
+
+
+def new_run(minio, store, manifest, book_name, **kwargs):
+    return BookRun(
+        client=minio,
+        bucket=BUCKET,
+        book_name=book_name,
+        store=store,
+        manifest=manifest,
+        run_id=RUN_ID,
+        results_path=get_ocr_results_path(book_name),
+        **kwargs,
+    )
+
+
+def checkpoint(minio, book_name, pages, texts):
+    local = f"/tmp/{book_name}_images"
+    ChunkCheckpointer(minio, BUCKET, get_checkpoint_path(book_name, RUN_ID)).save(
+        chunk_result(
+            [str(page_image_path(local, page)) for page in pages],
+            ocr_result=PAGE_BREAK.join(texts),
+        )
+    )
+
+
+def read_results(minio, book_name):
+    data = minio.objects[(BUCKET, get_ocr_results_path(book_name))]
+    return pq.read_table(io.BytesIO(data)).to_pylist()
+
+
+def test_resume_with_only_a_blank_page_left(minio, tmp_path, book_name, monkeypatch):
+    store, manifest = build_store(minio, tmp_path, ["Chapter One", "Chapter Two", ""])
+    checkpoint(minio, book_name, [1, 2], ["Chapter One", "Chapter Two"])
+    # Nothing is sent, so the model is never waited for
+    monkeypatch.setattr(book_run, "start_model_warmup", Future)
+
+    book = new_run(minio, store, manifest, book_name)
+    assert book.missing_pages == [3]
+    (reference,) = ocr_books([book], client=minio, bucket=BUCKET, use_cache=False)
+
+    assert reference.num_rows == 3
+    rows = read_results(minio, book_name)
+    assert [(row["page"], row["status"]) for row in rows] == [
+        (1, "success"),
+        (2, "success"),
+        (3, "blank"),
+    ]
+    # The blank page is checkpointed, the next resume has nothing left to do
+    resumed = new_run(minio, store, manifest, book_name)
+    assert resumed.missing_pages == []
+    ocr_books([resumed], client=minio, bucket=BUCKET, use_cache=False)
+    assert read_results(minio, book_name) == rows
+
+
+def test_results_are_written_in_page_order_with_filtered_pages(
+    minio, tmp_path, book_name
+):
+    store, manifest = build_store(
+        minio,
+        tmp_path,
+        ["Chapter One", "", "Chapter Three", "Chapter One"],
+        text_layers={5: "Index"},
+    )
+    book = new_run(minio, store, manifest, book_name)
+    sent = list(book.image_paths())
+    assert [page_number_from_path(path) for path in sent] == [1, 3]
+
+    # Later pages may finish first
+    book.on_result(chunk_result([sent[1]], ocr_result="Chapter Three"))
+    assert book.reference is None
+    book.on_result(chunk_result([sent[0]], ocr_result="Chapter One"))
+
+    assert book.reference.num_rows == 5
+    rows = read_results(minio, book_name)
+    assert [
+        (row["page"], row["status"], row["text"], row["duplicate_of"]) for row in rows
+    ] == [
+        (1, "success", "Chapter One", None),
+        (2, "blank", "", None),
+        (3, "success", "Chapter Three", None),
+        (4, "duplicate", "Chapter One", 1),
+        (5, "success", "Index", None),
+    ]
+    # Filtered pages are checkpointed along with the OCR'd ones
+    assert new_run(minio, store, manifest, book_name).missing_pages == []
+
+
+def test_resume_only_keeps_the_checkpoints_of_its_page_range(
+    minio, tmp_path, book_name
+):
+    store, manifest = build_store(minio, tmp_path, ["One", "Two", "Three", "Four"])
+    checkpoint(minio, book_name, [1], ["One"])
+    checkpoint(minio, book_name, [3], ["Three"])
+
+    first_half = new_run(minio, store, manifest, book_name, page_range=(1, 2))
+    assert first_half.missing_pages == [2]
+    assert first_half.pages == [1, 2]
+    second_half = new_run(minio, store, manifest, book_name, page_range=(3, 4))
+    assert second_half.missing_pages == [4]
+    fresh = new_run(minio, store, manifest, book_name, resume=False)
+    assert fresh.missing_pages == [1, 2, 3, 4]
+
+
+def test_missing_results_fail_the_book(minio, tmp_path, book_name):
+    store, manifest = build_store(minio, tmp_path, ["One", "Two"])
+    book = new_run(minio, store, manifest, book_name)
+    _, second = book.image_paths()
+    book.on_result(chunk_result([second], ocr_result="Two"))
+
+    with pytest.raises(ValueError, match="first missing page 1"):
+        book.finish()
+    book.abort(ValueError("missing pages"))
+    assert (BUCKET, get_ocr_results_path(book_name)) not in minio.objects
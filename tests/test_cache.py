@@ -0,0 +1,71 @@
+import os
+
+import pytest
+
+from data_collection.cache import OCRResultCache, hash_bytes
+
+BUCKET = "data"
+
+
+def new_cache(tmp_path, client=None, prompt="Transcribe the page", **kwargs):
+    return OCRResultCache(
+        client=client,
+        bucket=BUCKET,
+        model_name="model",
+        prompt=prompt,
+        generation_params={"temperature": 0.0},
+        local_dir=str(tmp_path / "ocr_cache"),
+        **kwargs,
+    )
+
+
+@pytest.fixture
+def key(tmp_path):
+    return new_cache(tmp_path).key(hash_bytes(b"page"))
+
+
+def test_miss_then_local_hit(tmp_path, key):
+    cache = new_cache(tmp_path)
+    assert cache.get(key) is None
+    cache.put(key, "page text")
+    assert cache.get(key) == "page text"
+    assert cache.stats() == {
+        "hits": 1,
+        "local_hits": 1,
+        "remote_hits": 0,
+        "misses": 1,
+        "evictions": 0,
+        "hit_rate": 0.5,
+    }
+
+
+def test_remote_hit_fills_the_local_tier(tmp_path, minio, key):
+    new_cache(tmp_path / "writer", client=minio).put(key, "page text")
+
+    reader = new_cache(tmp_path / "reader", client=minio)
+    assert reader.get(key) == "page text"
+    assert reader.get(key) == "page text"
+    assert (reader.remote_hits, reader.local_hits) == (1, 1)
+
+
+def test_key_depends_on_the_prompt(tmp_path):
+    page_hash = hash_bytes(b"page")
+    assert new_cache(tmp_path).key(page_hash) != new_cache(
+        tmp_path, prompt="Describe the page"
+    ).key(page_hash)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    cache = new_cache(tmp_path)
+    keys = [cache.key(hash_bytes(bytes([n]))) for n in range(3)]
+    for age, key in enumerate(keys):
+        cache.put(key, "page text")
+        # Oldest first
+        os.utime(cache._local_path(key), (age, age))
+    # Room for the two most recent entries
+    cache.max_local_bytes = sum(cache._local_path(k).stat().st_size for k in keys[1:])
+
+    assert cache.evict_local() == 1
+    assert cache.get(keys[0]) is None
+    assert cache.get(keys[1]) == cache.get(keys[2]) == "page text"
+    assert cache.stats()["evictions"] == 1
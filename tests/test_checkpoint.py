@@ -0,0 +1,53 @@
+from data_collection.checkpoint import ChunkCheckpointer, completed_pages
+from data_collection.ocr import chunk_result
+from data_collection.rasterize import page_image_path
+
+BUCKET = "data"
+PREFIX = "ocr_checkpoints/book/run"
+
+
+def result(pages, **kwargs):
+    paths = [str(page_image_path("/tmp/book_images", page)) for page in pages]
+    return chunk_result(paths, **kwargs)
+
+
+def test_checkpoints_round_trip_in_page_order(minio):
+    checkpointer = ChunkCheckpointer(minio, BUCKET, PREFIX)
+    later = result([11, 12], ocr_result="eleven<page_break>twelve")
+    earlier = result([2, 3], ocr_result="two<page_break>three")
+    checkpointer.save(later)
+    checkpointer.save(earlier)
+
+    assert minio.names(BUCKET, PREFIX) == [
+        f"{PREFIX}/chunk_000002.json",
+        f"{PREFIX}/chunk_000011.json",
+    ]
+    assert checkpointer.load() == [earlier, later]
+
+
+def test_failed_chunks_are_not_checkpointed(minio):
+    checkpointer = ChunkCheckpointer(minio, BUCKET, PREFIX)
+    checkpointer.save(result([1], error="timeout"))
+    checkpointer.save(result([2], ocr_result="cut off", status="truncated"))
+    assert checkpointer.load() == []
+
+
+def test_clear_only_removes_its_run(minio):
+    checkpointer = ChunkCheckpointer(minio, BUCKET, PREFIX)
+    other_run = ChunkCheckpointer(minio, BUCKET, f"{PREFIX}_2")
+    checkpointer.save(result([1], ocr_result="one"))
+    other_run.save(result([1], ocr_result="one"))
+
+    checkpointer.clear()
+    assert checkpointer.load() == []
+    assert len(other_run.load()) == 1
+
+
+def test_completed_pages_include_filtered_pages_but_not_failures():
+    results = [
+        result([1, 2], ocr_result="one<page_break>two"),
+        result([3], ocr_result="", status="blank"),
+        result([4], ocr_result="one", status="duplicate"),
+        result([5, 6], error="timeout"),
+    ]
+    assert completed_pages(results) == {1, 2, 3, 4}
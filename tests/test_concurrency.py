@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from data_collection.concurrency import (
+    LATENCY_SMOOTHING,
+    AdaptiveLimiter,
+    AIMDController,
+    QueueMetrics,
+)
+
+IDLE = QueueMetrics(waiting=0, running=4)
+QUEUED = QueueMetrics(waiting=10, running=8)
+
+
+def controller(limit=8, max_limit=16, saturated=True, **kwargs):
+    limiter = AdaptiveLimiter(limit)
+    limiter.saturated = saturated
+    return AIMDController(limiter, max_limit=max_limit, prometheus_url=None, **kwargs)
+
+
+def test_grows_by_one_while_requests_wait_for_a_slot():
+    aimd = controller()
+    assert aimd.update(IDLE) == 9
+    aimd.limiter.saturated = True
+    assert aimd.update(None) == 10
+
+
+def test_holds_without_demand():
+    assert controller(saturated=False).update(IDLE) == 8
+
+
+def test_never_grows_past_max_limit():
+    assert controller(limit=16, max_limit=16).update(IDLE) == 16
+
+
+def test_engine_queue_cuts_the_window():
+    assert controller().update(QUEUED) == 6
+
+
+def test_slow_tokens_cut_the_window():
+    aimd = controller(interval=0)
+    aimd.observe(latency=1.0, completion_tokens=100)
+    assert aimd.update(IDLE) == 9
+    aimd.observe(latency=100.0, completion_tokens=100)
+    assert aimd.update(IDLE) == 6
+
+
+def test_decreases_once_per_interval():
+    aimd = controller(interval=60)
+    assert aimd.update(QUEUED) == 6
+    aimd.backoff()
+    assert aimd.update(QUEUED) == 6
+
+
+def test_never_shrinks_below_min_limit():
+    aimd = controller(limit=2, min_limit=1, interval=0)
+    assert [aimd.update(QUEUED) for _ in range(3)] == [1, 1, 1]
+
+
+def test_observe_smooths_latency_per_token():
+    aimd = controller()
+    aimd.observe(latency=2.0, completion_tokens=100)
+    aimd.observe(latency=4.0, completion_tokens=100)
+    assert aimd.latency == pytest.approx(
+        LATENCY_SMOOTHING * 0.04 + (1 - LATENCY_SMOOTHING) * 0.02
+    )
+
+
+def test_observe_ignores_requests_without_output():
+    aimd = controller()
+    aimd.observe(latency=5.0, completion_tokens=0)
+    assert aimd.latency is None
+
+
+def test_lowered_limit_lets_requests_in_flight_finish():
+    async def run():
+        limiter = AdaptiveLimiter(2)
+        await limiter.acquire()
+        await limiter.acquire()
+        limiter.set_limit(1)
+        waiter = asyncio.create_task(limiter.acquire())
+        limiter.release()
+        await asyncio.sleep(0)
+        assert not waiter.done()
+        limiter.release()
+        await asyncio.wait_for(waiter, timeout=1)
+        return limiter.in_flight
+
+    assert asyncio.run(run()) == 1
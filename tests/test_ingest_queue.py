@@ -0,0 +1,70 @@
+import pytest
+
+from data_collection.ingest_queue import BYTES_PER_PAGE, BookQueue
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = BookQueue(str(tmp_path / "queue.db"), max_attempts=2)
+    yield queue
+    queue.close()
+
+
+def enqueue(queue, book_name, bucket="data", etag="etag", pages=10):
+    return queue.enqueue(
+        bucket=bucket,
+        object_name=f"raw_data/{book_name}.pdf",
+        etag=etag,
+        book_name=book_name,
+        size=pages * BYTES_PER_PAGE,
+    )
+
+
+def test_notification_delivered_twice_is_queued_once(queue):
+    assert enqueue(queue, "a")
+    assert not enqueue(queue, "a")
+    assert queue.counts()["queued"] == 1
+
+
+def test_new_upload_replaces_the_queued_version(queue):
+    enqueue(queue, "a", etag="v1")
+    assert enqueue(queue, "a", etag="v2")
+    (job,) = queue.claim("worker")
+    assert queue.counts()["queued"] == 0
+    assert job.book_name == "a"
+
+
+def test_claim_takes_the_oldest_books_of_one_bucket(queue):
+    enqueue(queue, "a")
+    enqueue(queue, "b", bucket="other")
+    enqueue(queue, "c")
+
+    jobs = queue.claim("worker", limit=3)
+    assert [job.book_name for job in jobs] == ["a", "c"]
+    assert [job.book_name for job in queue.claim("worker", limit=3)] == ["b"]
+    assert queue.claim("worker") == []
+
+
+def test_failed_books_are_retried_until_max_attempts(queue):
+    enqueue(queue, "a")
+    queue.fail(queue.claim("worker"), error="timeout")
+    assert queue.counts()["queued"] == 1
+
+    (job,) = queue.claim("worker")
+    assert job.attempts == 2
+    queue.fail([job], error="timeout")
+    assert queue.counts()["failed"] == 1
+    assert queue.claim("worker") == []
+
+
+def test_complete_and_requeue_running(queue):
+    enqueue(queue, "a")
+    enqueue(queue, "b")
+    first, second = queue.claim("worker", limit=2)
+    queue.complete([first])
+    assert queue.backlog_pages() == 10
+
+    # A restarted service queues what the previous process was running
+    assert queue.requeue_running() == 1
+    assert [job.book_name for job in queue.claim("worker")] == [second.book_name]
+    assert queue.counts() == {"queued": 0, "running": 1, "done": 1, "failed": 0}
@@ -0,0 +1,64 @@
+import subprocess
+
+import pytest
+
+from data_collection.ingest_queue import BookQueue
+from data_collection.ingest_service import RunNotStoppedError, render_metrics, run_jobs
+
+
+@pytest.fixture
+def queue(tmp_path):
+    queue = BookQueue(str(tmp_path / "queue.db"))
+    queue.enqueue("data", "raw_data/a.pdf", "etag", "a", size=1024)
+    yield queue
+    queue.close()
+
+
+def fake_run(commands, pipeline_error=None, stop_error=None):
+    """Records the commands and times the pipeline out, or fails it."""
+
+    def run(command, **kwargs):
+        commands.append(command)
+        error = stop_error if command[0] == "zenml" else pipeline_error
+        if error is not None:
+            raise error
+        return subprocess.CompletedProcess(command, 0)
+
+    return run
+
+
+def test_timed_out_run_is_stopped_before_the_book_is_queued_again(queue, monkeypatch):
+    commands = []
+    timeout = subprocess.TimeoutExpired("pipeline", 1)
+    monkeypatch.setattr(subprocess, "run", fake_run(commands, pipeline_error=timeout))
+
+    run_jobs(queue, "worker-0", queue.claim("worker-0"), run_timeout=1)
+
+    pipeline, stop = commands
+    run_name = pipeline[pipeline.index("--run_name") + 1]
+    assert stop[:4] == ["zenml", "pipeline", "runs", "stop"]
+    assert stop[4] == run_name
+    assert queue.counts()["queued"] == 1
+
+
+def test_run_that_cannot_be_stopped_keeps_its_books_claimed(queue, monkeypatch):
+    timeout = subprocess.TimeoutExpired("pipeline", 1)
+    unreachable = subprocess.CalledProcessError(1, "zenml", "", "connection refused")
+    monkeypatch.setattr(
+        subprocess,
+        "run",
+        fake_run([], pipeline_error=timeout, stop_error=unreachable),
+    )
+
+    with pytest.raises(RunNotStoppedError, match="connection refused"):
+        run_jobs(queue, "worker-0", queue.claim("worker-0"), run_timeout=1)
+    assert queue.counts()["running"] == 1
+    # The next start of the service queues it again
+    assert queue.requeue_running() == 1
+
+
+def test_successful_run_completes_the_book(queue, monkeypatch):
+    monkeypatch.setattr(subprocess, "run", fake_run([]))
+    run_jobs(queue, "worker-0", queue.claim("worker-0"), run_timeout=1)
+    assert queue.counts()["done"] == 1
+    assert "dharma_ingest_backlog_pages 0" in render_metrics(queue)
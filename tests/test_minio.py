@@ -0,0 +1,21 @@
+from helper.minio import ranged_download
+
+BUCKET = "data"
+
+
+def test_ranged_download_reassembles_the_object(minio, tmp_path):
+    content = bytes(range(256)) * 40
+    minio.objects[(BUCKET, "book.pdf")] = content
+    local_path = tmp_path / "book.pdf"
+    ranged_download(
+        minio, BUCKET, "book.pdf", local_path, len(content), "etag", part_size=1000
+    )
+    assert local_path.read_bytes() == content
+
+
+def test_ranged_download_of_an_empty_object(minio, tmp_path):
+    minio.objects[(BUCKET, "empty.pdf")] = b""
+    local_path = tmp_path / "empty.pdf"
+    local_path.write_bytes(b"stale")
+    ranged_download(minio, BUCKET, "empty.pdf", local_path, 0, "etag")
+    assert local_path.read_bytes() == b""
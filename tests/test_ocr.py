@@ -0,0 +1,155 @@
+import asyncio
+import threading
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from data_collection.ocr import PreparedChunk, dispatch_chunks_async, ocr_batch
+from data_collection.rasterize import page_image_path
+from data_collection.readiness import ReadinessResult
+
+
+def write_pages(directory, num_pages):
+    paths = []
+    for page_number in range(1, num_pages + 1):
+        path = page_image_path(directory, page_number)
+        Image.new("L", (64, 64), "white").save(path, "JPEG")
+        paths.append(str(path))
+    return paths
+
+
+def test_pages_are_prepared_while_the_model_warms_up(tmp_path):
+    paths = write_pages(tmp_path, 4)
+    pulled = []
+    all_pulled = threading.Event()
+
+    def page_stream():
+        for path in paths:
+            pulled.append(path)
+            yield path
+        all_pulled.set()
+
+    model_ready = Future()
+    errors = []
+
+    def run():
+        try:
+            ocr_batch(
+                page_stream(),
+                images_per_request=1,
+                pack=False,
+                model_ready=model_ready,
+                show_progress=False,
+            )
+        except ValueError as e:
+            errors.append(e)
+
+    batch = threading.Thread(target=run)
+    batch.start()
+    # Every chunk is prepared while the warm-up is still pending
+    assert all_pulled.wait(timeout=10)
+    assert not model_ready.done()
+    assert pulled == paths
+
+    model_ready.set_result(ReadinessResult(ready=False))
+    batch.join(timeout=10)
+    assert not batch.is_alive()
+    assert "not ready" in str(errors[0])
+
+
+def test_empty_stream_returns_no_results():
+    model_ready = Future()
+    assert ocr_batch(iter([]), model_ready=model_ready, show_progress=False) == []
+    # Nothing to send, the model is never waited on
+    assert not model_ready.done()
+
+
+class FakeAsyncClient:
+    """Answers every request with the page numbers of its images, after `delays`."""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.requests = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    async def create(self, messages, **kwargs):
+        urls = [
+            part["image_url"]["url"]
+            for part in messages[-1]["content"]
+            if part["type"] == "image_url"
+        ]
+        self.requests.append(urls)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.delays.get(urls[0], 0))
+        finally:
+            self.in_flight -= 1
+        return SimpleNamespace(
+            choices=[
+                SimpleNamespace(
+                    message=SimpleNamespace(content=f"text of {urls[0]}"),
+                    finish_reason="stop",
+                )
+            ],
+            usage=SimpleNamespace(prompt_tokens=10, completion_tokens=5),
+        )
+
+
+def page_chunk(page_number, cached_text=None):
+    path = f"/tmp/book_images/page_{page_number}.jpg"
+    if cached_text is not None:
+        return PreparedChunk(paths=[], cached_pages=[(path, cached_text)])
+    return PreparedChunk(paths=[path], image_urls=[f"page-{page_number}"])
+
+
+def dispatch(chunks, client, **kwargs):
+    return asyncio.run(
+        dispatch_chunks_async(
+            chunks, model_name="model", client=client, show_progress=False, **kwargs
+        )
+    )
+
+
+def test_dispatch_keeps_page_order_and_the_in_flight_limit():
+    # Earlier pages finish last
+    client = FakeAsyncClient({f"page-{n}": 0.05 / n for n in range(1, 7)})
+    results = dispatch([page_chunk(n) for n in range(1, 7)], client, max_in_flight=2)
+
+    assert [r["ocr_result"] for r in results] == [
+        f"text of page-{n}" for n in range(1, 7)
+    ]
+    assert all(r["status"] == "success" for r in results)
+    assert client.max_in_flight == 2
+
+
+def test_dispatch_never_sends_cached_pages():
+    client = FakeAsyncClient()
+    chunks = [page_chunk(1), page_chunk(2, cached_text="cached"), page_chunk(3)]
+    results = dispatch(chunks, client)
+
+    assert client.requests == [["page-1"], ["page-3"]]
+    assert [(r["ocr_result"], r["cached"]) for r in results] == [
+        ("text of page-1", False),
+        ("cached", True),
+        ("text of page-3", False),
+    ]
+
+
+def test_failing_callback_stops_the_dispatch():
+    def on_result(result):
+        raise OSError("checkpoint failed")
+
+    client = FakeAsyncClient()
+    with pytest.raises(OSError, match="checkpoint failed"):
+        dispatch(
+            [page_chunk(n) for n in range(1, 21)],
+            client,
+            max_in_flight=1,
+            on_result=on_result,
+        )
+    assert len(client.requests) < 20
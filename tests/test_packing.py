@@ -0,0 +1,103 @@
+from PIL import Image
+
+from data_collection.packing import (
+    IMAGE_OVERHEAD_TOKENS,
+    MAX_MODEL_LEN,
+    MAX_PIXELS,
+    OUTPUT_TOKENS_PER_PAGE,
+    PATCH_FACTOR,
+    PROMPT_TOKENS,
+    fits,
+    output_budget,
+    pack_pages,
+    vision_tokens,
+)
+
+# 1000x1000 is resized to 1008x1008, i.e. 36x36 patches
+SMALL_PAGE = (1000, 1000)
+SMALL_PAGE_TOKENS = 1296
+# A context holding two small pages and their reserved output, but not three
+TWO_SMALL_PAGES_LEN = PROMPT_TOKENS + 2 * (
+    SMALL_PAGE_TOKENS + IMAGE_OVERHEAD_TOKENS + OUTPUT_TOKENS_PER_PAGE
+)
+
+
+def write_pages(directory, sizes):
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for page, size in enumerate(sizes, start=1):
+        path = directory / f"page_{page:04d}.png"
+        Image.new("L", size, 255).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def test_vision_tokens_rounds_to_patches():
+    assert vision_tokens(*SMALL_PAGE) == SMALL_PAGE_TOKENS
+
+
+def test_vision_tokens_caps_large_pages_at_max_pixels():
+    tokens = vision_tokens(5000, 7000)
+    assert tokens * PATCH_FACTOR**2 <= MAX_PIXELS
+    assert tokens > 0.9 * MAX_PIXELS / PATCH_FACTOR**2
+
+
+def test_vision_tokens_of_tiny_page_is_one_patch():
+    assert vision_tokens(10, 10) == 1
+
+
+def test_output_budget_is_what_the_pages_leave_in_the_context():
+    assert output_budget([SMALL_PAGE_TOKENS]) == (
+        MAX_MODEL_LEN - PROMPT_TOKENS - SMALL_PAGE_TOKENS - IMAGE_OVERHEAD_TOKENS
+    )
+
+
+def test_output_budget_never_drops_below_one_token():
+    assert output_budget([MAX_MODEL_LEN]) == 1
+
+
+def test_fits_up_to_the_exact_context_length():
+    page_tokens = [SMALL_PAGE_TOKENS] * 2
+    assert fits(page_tokens, max_model_len=TWO_SMALL_PAGES_LEN)
+    assert not fits(page_tokens, max_model_len=TWO_SMALL_PAGES_LEN - 1)
+
+
+def test_pack_pages_respects_max_images(tmp_path):
+    paths = write_pages(tmp_path / "book", [SMALL_PAGE] * 7)
+    assert [len(pack) for pack in pack_pages(paths, max_images=3)] == [3, 3, 1]
+
+
+def test_pack_pages_respects_the_context_budget(tmp_path):
+    paths = write_pages(tmp_path / "book", [SMALL_PAGE] * 5)
+    packs = list(pack_pages(paths, max_model_len=TWO_SMALL_PAGES_LEN))
+    assert [len(pack) for pack in packs] == [2, 2, 1]
+    assert [path for pack in packs for path in pack] == paths
+
+
+def test_pack_pages_sends_a_page_too_large_to_share_alone(tmp_path):
+    paths = write_pages(
+        tmp_path / "book", [SMALL_PAGE, (2000, 2800), SMALL_PAGE, SMALL_PAGE]
+    )
+    packs = list(pack_pages(paths, max_model_len=TWO_SMALL_PAGES_LEN))
+    assert packs == [paths[:1], paths[1:2], paths[2:]]
+
+
+def test_pack_pages_never_mixes_books(tmp_path):
+    first = write_pages(tmp_path / "first", [SMALL_PAGE] * 2)
+    second = write_pages(tmp_path / "second", [SMALL_PAGE] * 2)
+    assert list(pack_pages(first + second)) == [first, second]
+
+
+def test_pack_pages_consumes_a_stream_lazily(tmp_path):
+    paths = write_pages(tmp_path / "book", [SMALL_PAGE] * 4)
+    consumed = []
+
+    def stream():
+        for path in paths:
+            consumed.append(path)
+            yield path
+
+    packs = pack_pages(stream(), max_images=2)
+    assert next(packs) == paths[:2]
+    # The third page closed the first request, the fourth is not read yet
+    assert consumed == paths[:3]
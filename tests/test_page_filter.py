@@ -0,0 +1,139 @@
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+from data_collection.page_filter import (
+    BLANK_INK_RATIO,
+    HASH_SIZE,
+    PageFilter,
+    component_ink,
+    ink_ratio,
+    load_for_analysis,
+)
+from data_collection.preprocess import preprocess_page
+from data_collection.rasterize import JPEG_QUALITY
+
+# A4 rendered at 150 DPI
+PAGE_SIZE = (1240, 1754)
+
+
+def blank_page():
+    return Image.new("RGB", PAGE_SIZE, "white")
+
+
+def text_page(lines, font_size=36, top=700):
+    page = blank_page()
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=font_size)
+    for number, line in enumerate(lines):
+        draw.text((300, top + number * 2 * font_size), line, fill="black", font=font)
+    return page
+
+
+def save_page(page, directory, number, preprocess=True, quality=JPEG_QUALITY):
+    path = directory / f"page_{number:04d}.jpg"
+    output = preprocess_page(page) if preprocess else page
+    output.save(path, "JPEG", quality=quality)
+    return str(path)
+
+
+def measure(path):
+    return ink_ratio(*load_for_analysis(path))
+
+
+def test_components_below_the_minimum_size_are_not_counted():
+    ink = np.zeros((20, 20), dtype=bool)
+    ink[2:4, 2:4] = True  # 4 pixel speck
+    ink[10:13, 5:15] = True  # 30 pixel blob
+    assert component_ink(ink, min_size=10) == 30
+    assert component_ink(ink, min_size=1) == 34
+
+
+def test_nearby_ink_is_linked_into_one_component():
+    # Dots two pixels apart, too small alone
+    ink = np.zeros((5, 30), dtype=bool)
+    ink[2, ::3] = True
+    assert component_ink(ink, min_size=5) == 0
+    assert component_ink(ink, min_size=5, link_radius=1) == 10
+
+
+def test_dust_speck_on_a_blank_page_is_not_ink(tmp_path):
+    page = blank_page()
+    ImageDraw.Draw(page).rectangle((600, 870, 607, 877), fill="black")
+    assert measure(save_page(page, tmp_path, 1)) < BLANK_INK_RATIO
+
+
+def test_gutter_shadow_on_a_blank_page_is_not_ink(tmp_path):
+    page = blank_page()
+    ImageDraw.Draw(page).rectangle((0, 0, 40, PAGE_SIZE[1]), fill=(60, 60, 60))
+    assert measure(save_page(page, tmp_path, 1)) < BLANK_INK_RATIO
+
+
+def test_dedication_page_is_not_blank(tmp_path):
+    path = save_page(text_page(["For my parents"], font_size=24), tmp_path, 1)
+    assert measure(path) > BLANK_INK_RATIO
+
+
+def test_pages_without_a_recorded_crop_are_measured_whole(tmp_path):
+    page = blank_page()
+    ImageDraw.Draw(page).rectangle((600, 870, 607, 877), fill="black")
+    assert measure(save_page(page, tmp_path, 1, preprocess=False)) < BLANK_INK_RATIO
+    text = text_page(["For my parents"], font_size=24)
+    assert measure(save_page(text, tmp_path, 2, preprocess=False)) > BLANK_INK_RATIO
+
+
+def test_filter_skips_blank_pages_and_keeps_sparse_ones(tmp_path):
+    speck = blank_page()
+    ImageDraw.Draw(speck).rectangle((600, 870, 607, 877), fill="black")
+    paths = [
+        save_page(text_page(["Chapter One", "It was a dark night."]), tmp_path, 1),
+        save_page(speck, tmp_path, 2),
+        save_page(text_page(["For my parents"], font_size=24), tmp_path, 3),
+    ]
+    page_filter = PageFilter()
+    assert list(page_filter(paths)) == [paths[0], paths[2]]
+    assert page_filter.blank == [paths[1]]
+    assert page_filter.record(2, book="book", text_by_page={})["status"] == "blank"
+
+
+def test_distinct_sparse_pages_are_not_duplicates(tmp_path):
+    titles = ["Part One", "Part Two", "Part Six", "Notes", "Index"]
+    paths = [
+        save_page(text_page([title]), tmp_path, number)
+        for number, title in enumerate(titles, start=1)
+    ]
+    page_filter = PageFilter()
+    assert list(page_filter(paths)) == paths
+    assert page_filter.duplicates == {}
+
+
+def test_pixel_comparison_rejects_pages_whose_hashes_match(tmp_path):
+    paths = [
+        save_page(text_page([title]), tmp_path, number)
+        for number, title in enumerate(["Part One", "Part Two"], start=1)
+    ]
+    page_filter = PageFilter(max_distance=HASH_SIZE**2)
+    assert list(page_filter(paths)) == paths
+
+
+def test_reencoded_page_is_a_duplicate_of_the_first_copy(tmp_path):
+    page = text_page(["Chapter One", "It was a dark night.", "The end."])
+    first = save_page(page, tmp_path, 1)
+    other = save_page(text_page(["Chapter Two"]), tmp_path, 2)
+    again = save_page(page, tmp_path, 3, quality=85)
+    page_filter = PageFilter()
+    assert list(page_filter([first, other, again])) == [first, other]
+    assert page_filter.duplicates == {again: first}
+
+
+def test_duplicate_records_reuse_the_text_of_the_first_copy(tmp_path):
+    page = text_page(["Chapter One"])
+    first, again = save_page(page, tmp_path, 1), save_page(page, tmp_path, 2)
+    page_filter = PageFilter()
+    list(page_filter([first, again]))
+    record = page_filter.record(2, book="book", text_by_page={1: "Chapter One"})
+    assert (record["page"], record["status"], record["duplicate_of"]) == (
+        2,
+        "duplicate",
+        1,
+    )
+    assert record["text"] == "Chapter One"
@@ -0,0 +1,47 @@
+import threading
+
+import pytest
+
+from data_collection.prefetch import prefetch
+
+
+def test_producer_starts_before_the_first_item_is_asked_for():
+    produced = threading.Event()
+
+    def producer():
+        produced.set()
+        yield 1
+
+    items = prefetch(producer(), max_buffered=1)
+    assert produced.wait(timeout=5)
+    assert list(items) == [1]
+
+
+def test_items_keep_their_order():
+    assert list(prefetch(iter(range(10)), max_buffered=2)) == list(range(10))
+
+
+def test_producer_errors_reach_the_consumer():
+    def producer():
+        yield 1
+        raise RuntimeError("render failed")
+
+    items = prefetch(producer(), max_buffered=2)
+    assert next(items) == 1
+    with pytest.raises(RuntimeError, match="render failed"):
+        next(items)
+
+
+def test_closing_early_stops_the_producer():
+    stopped = threading.Event()
+
+    def producer():
+        try:
+            yield from range(100)
+        finally:
+            stopped.set()
+
+    items = prefetch(producer(), max_buffered=1)
+    assert next(items) == 0
+    items.close()
+    assert stopped.wait(timeout=5)
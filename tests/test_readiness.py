@@ -0,0 +1,40 @@
+import pytest
+from openai import OpenAI
+
+from data_collection import readiness
+from data_collection.readiness import wait_for_model_ready
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(readiness, "send_warmup_request", lambda *args: None)
+    monkeypatch.setattr(readiness, "probe_health", lambda base_url: True)
+    monkeypatch.setattr(readiness, "probe_models", lambda base_url, model: True)
+    return OpenAI(base_url="http://router/v1", api_key="dummy")
+
+
+def test_ocr_probe_output_is_kept(client):
+    result = wait_for_model_ready(
+        client, "model", ocr_probe=lambda: ("page text", "stop")
+    )
+    assert result.ready
+    assert result.probe == "ocr"
+    assert result.ocr_result == "page text"
+
+
+def test_truncated_ocr_probe_output_is_discarded(client):
+    result = wait_for_model_ready(
+        client, "model", ocr_probe=lambda: ("page te", "length")
+    )
+    assert result.ready
+    assert result.ocr_result is None
+
+
+def test_failing_probe_is_retried_until_the_deadline(client):
+    def ocr_probe():
+        raise ConnectionError("engine not up")
+
+    result = wait_for_model_ready(
+        client, "model", max_wait=0.05, check_interval=0.01, ocr_probe=ocr_probe
+    )
+    assert not result.ready
@@ -0,0 +1,94 @@
+from data_collection.records import PAGE_BREAK, page_records, split_page_text
+
+FIRST = "It was a dark and stormy night; the rain fell in torrents, except at occasional intervals."
+SECOND = "when it was checked by a violent gust of wind which swept up the streets of London."
+THIRD = "for it is in London that our scene lies, rattling along the housetops, and fiercely agitating the scanty flame of the lamps."
+
+
+def footer(text, number):
+    return f"{text}\n<page_number>{number}</page_number>"
+
+
+def header(text, number):
+    return f"<page_number>{number}</page_number>\n{text}"
+
+
+def test_single_page_is_returned_whole():
+    assert split_page_text(FIRST, 1) == [FIRST]
+    assert split_page_text(f"{FIRST}\n{PAGE_BREAK}\n", 1) == [FIRST]
+
+
+def test_pages_split_on_breaks():
+    text = f"{FIRST}\n{PAGE_BREAK}\n{SECOND}\n{PAGE_BREAK}\n{THIRD}\n{PAGE_BREAK}\n"
+    assert split_page_text(text, 3) == [FIRST, SECOND, THIRD]
+
+
+def test_break_after_the_last_page_is_optional():
+    assert split_page_text(f"{FIRST}{PAGE_BREAK}{SECOND}", 2) == [FIRST, SECOND]
+
+
+def test_page_without_a_number_splits_on_breaks():
+    text = PAGE_BREAK.join([footer(FIRST, 7), SECOND, footer(THIRD, 9)])
+    assert split_page_text(text, 3) == [footer(FIRST, 7), SECOND, footer(THIRD, 9)]
+
+
+def test_empty_page_has_no_text():
+    text = PAGE_BREAK.join([FIRST, "  ", THIRD])
+    assert split_page_text(text, 3) == [FIRST, None, THIRD]
+
+
+def test_missing_break_is_recovered_from_footers():
+    text = f"{footer(FIRST, 7)}\n{footer(SECOND, 8)}{PAGE_BREAK}{THIRD}"
+    assert split_page_text(text, 3) == [footer(FIRST, 7), footer(SECOND, 8), THIRD]
+
+
+def test_output_without_breaks_splits_on_footers():
+    text = "\n".join([footer(FIRST, 7), footer(SECOND, 8)])
+    assert split_page_text(text, 2) == [footer(FIRST, 7), footer(SECOND, 8)]
+
+
+def test_output_without_breaks_splits_on_headers():
+    text = "\n".join([header(FIRST, 7), header(SECOND, 8)])
+    assert split_page_text(text, 2) == [header(FIRST, 7), header(SECOND, 8)]
+
+
+def test_tags_in_the_middle_of_pages_are_not_trusted():
+    text = f"{FIRST}\n<page_number>7</page_number>\n{SECOND}\n<page_number>8</page_number>\n{THIRD}"
+    assert split_page_text(text, 2) is None
+
+
+def test_fewer_pages_than_requested_cannot_be_split():
+    text = "\n".join([footer(FIRST, 7), footer(SECOND, 8)])
+    assert split_page_text(text, 3) is None
+    assert split_page_text(FIRST, 2) is None
+
+
+def test_more_pieces_than_pages_cannot_be_split():
+    assert split_page_text(PAGE_BREAK.join([FIRST, SECOND, THIRD]), 2) is None
+
+
+def test_missing_text_cannot_be_split():
+    assert split_page_text(None, 2) is None
+    assert split_page_text("", 2) is None
+
+
+def test_page_records_mark_pages_without_text_unsplit():
+    result = {
+        "image_paths": [
+            "book/page_0001.jpg",
+            "book/page_0002.jpg",
+            "book/page_0003.jpg",
+        ],
+        "ocr_result": PAGE_BREAK.join([FIRST, "", THIRD]),
+        "status": "success",
+        "error": None,
+        "cached": False,
+        "completion_tokens": 10,
+    }
+    records = page_records(result, book="book")
+    assert [(r["page"], r["status"]) for r in records] == [
+        (1, "success"),
+        (2, "unsplit"),
+        (3, "success"),
+    ]
+    assert records[0]["text"] == FIRST
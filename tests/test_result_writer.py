@@ -0,0 +1,75 @@
+import io
+import threading
+
+import pyarrow.parquet as pq
+import pytest
+
+from data_collection.records import page_record
+from data_collection.result_writer import ParquetResultWriter, upload_stream
+
+BUCKET = "data"
+
+
+def records(pages):
+    return [
+        page_record(book="book", page=page, text=f"text {page}", status="success")
+        for page in pages
+    ]
+
+
+def test_records_are_streamed_to_minio(minio):
+    with upload_stream(minio, BUCKET, "results.parquet") as sink:
+        writer = ParquetResultWriter(sink, row_group_size=2)
+        writer.write(records([1, 2, 3]))
+        writer.write(records([4, 5]))
+        writer.close()
+
+    parquet = pq.ParquetFile(io.BytesIO(minio.objects[(BUCKET, "results.parquet")]))
+    assert parquet.read().column("page").to_pylist() == [1, 2, 3, 4, 5]
+    assert parquet.metadata.num_row_groups == 3
+    assert writer.num_rows == 5
+    assert writer.status_counts == {"success": 5}
+
+
+def test_failed_writer_leaves_no_object(minio):
+    with (
+        pytest.raises(RuntimeError, match="OCR failed"),
+        upload_stream(minio, BUCKET, "results.parquet") as sink,
+    ):
+        sink.write(b"PAR1")
+        raise RuntimeError("OCR failed")
+    assert (BUCKET, "results.parquet") not in minio.objects
+
+
+def test_upload_error_is_raised_to_the_writer(minio, monkeypatch):
+    def put_object(*args, **kwargs):
+        raise OSError("bucket unreachable")
+
+    monkeypatch.setattr(minio, "put_object", put_object)
+    with (
+        pytest.raises(OSError, match="bucket unreachable"),
+        upload_stream(minio, BUCKET, "results.parquet") as sink,
+    ):
+        writer = ParquetResultWriter(sink, row_group_size=1)
+        writer.write(records(range(1, 100)))
+        writer.close()
+
+
+def test_concurrent_writers_lose_no_records(minio):
+    with upload_stream(minio, BUCKET, "results.parquet") as sink:
+        writer = ParquetResultWriter(sink, row_group_size=7)
+        threads = [
+            threading.Thread(
+                target=writer.write, args=(records(range(start, start + 25)),)
+            )
+            for start in range(1, 101, 25)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        writer.close()
+
+    table = pq.read_table(io.BytesIO(minio.objects[(BUCKET, "results.parquet")]))
+    assert sorted(table.column("page").to_pylist()) == list(range(1, 101))
+    assert writer.num_rows == 100
@@ -0,0 +1,114 @@
+import asyncio
+
+import httpx
+import pytest
+from openai import APIConnectionError, BadRequestError, RateLimitError
+
+from data_collection.retry_policy import (
+    CircuitBreaker,
+    ErrorKind,
+    classify_error,
+    retry_after,
+)
+
+REQUEST = httpx.Request("POST", "http://router/v1/chat/completions")
+
+
+def status_error(error_type, status_code, headers=None):
+    response = httpx.Response(status_code, headers=headers, request=REQUEST)
+    return error_type("error", response=response, body=None)
+
+
+TRANSIENT = APIConnectionError(request=REQUEST)
+OVERLOAD = status_error(RateLimitError, 429, {"retry-after": "7"})
+PERMANENT = status_error(BadRequestError, 400)
+
+
+def acquired(breaker, timeout=0.1):
+    """True if `acquire` lets a request through within `timeout` seconds."""
+
+    async def run():
+        try:
+            await asyncio.wait_for(breaker.acquire(), timeout)
+        except TimeoutError:
+            return False
+        return True
+
+    return asyncio.run(run())
+
+
+def open_breaker(reset_timeout=0.0, **kwargs):
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=reset_timeout, **kwargs)
+    breaker.record_failure(TRANSIENT)
+    breaker.record_failure(OVERLOAD)
+    return breaker
+
+
+def test_errors_are_classified_by_kind():
+    assert classify_error(TRANSIENT) is ErrorKind.TRANSIENT
+    assert classify_error(OVERLOAD) is ErrorKind.OVERLOAD
+    assert classify_error(PERMANENT) is ErrorKind.PERMANENT
+    assert classify_error(ValueError("too many images")) is ErrorKind.PERMANENT
+
+
+def test_retry_after_header_is_honoured():
+    assert retry_after(OVERLOAD) == 7
+    assert retry_after(TRANSIENT) is None
+
+
+def test_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure(TRANSIENT)
+    assert breaker.state == "closed"
+    breaker.record_failure(TRANSIENT)
+    assert breaker.state == "open"
+    assert not acquired(breaker)
+
+
+def test_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2)
+    breaker.record_failure(TRANSIENT)
+    breaker.record_success()
+    breaker.record_failure(TRANSIENT)
+    assert breaker.state == "closed"
+
+
+def test_permanent_errors_never_open_the_circuit():
+    breaker = CircuitBreaker(failure_threshold=2)
+    for _ in range(5):
+        breaker.record_failure(PERMANENT)
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_a_single_probe_through():
+    breaker = open_breaker()
+    assert acquired(breaker)
+    assert breaker.state == "half_open"
+    assert not acquired(breaker)
+
+
+def test_successful_probe_closes_the_circuit():
+    breaker = open_breaker()
+    assert acquired(breaker)
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert acquired(breaker)
+
+
+def test_failed_probe_reopens_with_twice_the_timeout():
+    breaker = open_breaker(reset_timeout=30, max_reset_timeout=45)
+    breaker._opened_at -= 30
+    assert acquired(breaker)
+    breaker.record_failure(TRANSIENT)
+    assert breaker.state == "open"
+    assert breaker._timeout == 45
+    assert not acquired(breaker)
+
+
+@pytest.mark.parametrize("error", [PERMANENT, ValueError("too many images")])
+def test_permanent_error_on_the_probe_closes_the_circuit(error):
+    breaker = open_breaker()
+    assert acquired(breaker)
+    breaker.record_failure(error)
+    assert breaker.state == "closed"
+    assert acquired(breaker)
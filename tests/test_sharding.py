@@ -0,0 +1,45 @@
+import pytest
+
+from data_collection.sharding import shard_range
+
+
+def shard_ranges(num_pages, num_shards):
+    return [shard_range(num_pages, index, num_shards) for index in range(num_shards)]
+
+
+def test_pages_split_evenly():
+    assert shard_ranges(12, 4) == [(1, 3), (4, 6), (7, 9), (10, 12)]
+
+
+def test_first_shards_take_the_remainder():
+    assert shard_ranges(10, 4) == [(1, 3), (4, 6), (7, 8), (9, 10)]
+
+
+def test_single_shard_covers_the_book():
+    assert shard_ranges(7, 1) == [(1, 7)]
+
+
+def test_shards_beyond_the_last_page_are_empty():
+    assert shard_ranges(2, 4) == [(1, 1), (2, 2), None, None]
+
+
+def test_empty_book_has_no_shards():
+    assert shard_ranges(0, 3) == [None, None, None]
+
+
+@pytest.mark.parametrize("num_pages", [1, 5, 99, 100, 101, 1000])
+@pytest.mark.parametrize("num_shards", [1, 2, 3, 7])
+def test_shards_cover_every_page_once(num_pages, num_shards):
+    pages = [
+        page
+        for page_range in shard_ranges(num_pages, num_shards)
+        if page_range is not None
+        for page in range(page_range[0], page_range[1] + 1)
+    ]
+    assert pages == list(range(1, num_pages + 1))
+
+
+@pytest.mark.parametrize("shard_index", [-1, 4])
+def test_shard_index_out_of_range(shard_index):
+    with pytest.raises(ValueError):
+        shard_range(10, shard_index, 4)